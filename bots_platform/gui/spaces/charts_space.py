@@ -1,16 +1,21 @@
 from nicegui import ui
 from typing import Union
 import traceback
+import asyncio
+import time
 
 from bots_platform.gui.chart import StockChartUiComponent
 from bots_platform.gui.utils import Notification
 from bots_platform.model.workers import ChartsWorker
-from bots_platform.model import TimeStamp
+from bots_platform.model import TimeStamp, ChartExpression
 
 
 class ChartsSpace:
     UPDATE_CHARTS_CHECKBOX = 'UPDATE_CHARTS_CHECKBOX'
     UPDATE_CHARTS_TIMER = 'UPDATE_CHARTS_TIMER'
+    LIVE_UPDATE_CHARTS_TIMER = 'LIVE_UPDATE_CHARTS_TIMER'
+    LIVE_UPDATE_SECONDS = 0.5  # charts with streamed candles are redrawn only when a candle changes
+    FULL_LIVE_UPDATE_SECONDS = 5  # charts recomputed from the first candle on every update, e.g. with ema
     CHARTS_BOX = 'CHARTS_BOX'
 
     def __init__(self):
@@ -20,6 +25,9 @@ class ChartsSpace:
         self._constructed = False
         self._charts = []
         self._auto_charts = dict()
+        self._chart_versions = dict()  # chart id: streamed candles version of the shown data
+        self._chart_update_times = dict()  # chart id: monotonic time of the last update
+        self._live_updating = False
         notification = ui.notification(timeout=None, close_button=False)
         notification.message = 'Updating custom charts...'
         notification.spinner = True
@@ -50,9 +58,7 @@ class ChartsSpace:
 
         with self._charts_space:
             try:
-                await self._charts_worker.fetch_exchange_contracts(
-                    number_of_seconds_to_update=10*60
-                )
+                await self._charts_worker.fetch_exchange_contracts()
             except:
                 pass
 
@@ -86,6 +92,8 @@ class ChartsSpace:
 
     def detach(self):
         try:
+            self._delete_update_charts_timer()
+            asyncio.ensure_future(self._charts_worker.unwatch_charts())
             self._charts_space.delete()
         except:
             pass
@@ -103,14 +111,47 @@ class ChartsSpace:
                                            callback=lambda *_: self.update(),
                                            once=True)
             self._elements[ChartsSpace.UPDATE_CHARTS_TIMER] = update_charts_timer
+            live_update_charts_timer = ui.timer(ChartsSpace.LIVE_UPDATE_SECONDS,
+                                                callback=lambda *_: self._live_update_charts())
+            self._elements[ChartsSpace.LIVE_UPDATE_CHARTS_TIMER] = live_update_charts_timer
+        else:
+            await self._charts_worker.unwatch_charts()
 
     def _delete_update_charts_timer(self):
-        if ChartsSpace.UPDATE_CHARTS_TIMER in self._elements:
-            try:
-                update_charts_timer = self._elements.pop(ChartsSpace.UPDATE_CHARTS_TIMER)
-                update_charts_timer.cancel()
-            except:
-                pass
+        for x in (ChartsSpace.UPDATE_CHARTS_TIMER, ChartsSpace.LIVE_UPDATE_CHARTS_TIMER):
+            if x in self._elements:
+                try:
+                    update_charts_timer = self._elements.pop(x)
+                    update_charts_timer.cancel()
+                except:
+                    pass
+
+    def _is_auto_update(self) -> bool:
+        update_charts_checkbox = self._elements.get(ChartsSpace.UPDATE_CHARTS_CHECKBOX)
+        return update_charts_checkbox is not None and update_charts_checkbox.value
+
+    async def _live_update_charts(self):
+        if not self._constructed or self._live_updating:
+            return
+        self._live_updating = True
+        try:
+            now = time.monotonic()
+            await asyncio.gather(*(self._update_chart(stock_chart, timer_update=True)
+                                   for stock_chart in self._charts if self._is_live_update_due(stock_chart, now)))
+        finally:
+            self._live_updating = False
+
+    def _is_live_update_due(self, stock_chart: StockChartUiComponent, now: float) -> bool:
+        chart_id = id(stock_chart)
+        if not stock_chart.is_custom() or not self._charts_worker.is_chart_streamed(chart_id) or \
+                self._charts_worker.get_chart_version(chart_id) == self._chart_versions.get(chart_id):
+            return False
+        try:
+            lookback = ChartExpression.compile(stock_chart.get_stock_data()['parameters']['contract']).lookback
+        except:
+            return True
+        return lookback is not None or \
+            now - self._chart_update_times.get(chart_id, 0.) >= ChartsSpace.FULL_LIVE_UPDATE_SECONDS
 
     def add_custom_chart(self, *, complex=False):
 
@@ -127,9 +168,12 @@ class ChartsSpace:
             except:
                 traceback.print_exc()
 
-        def delete_chart_triggered(*_, **__):
+        async def delete_chart_triggered(*_, **__):
             charts_box.remove(chart_col)
             self._charts.remove(stock_chart)
+            self._chart_versions.pop(id(stock_chart), None)
+            self._chart_update_times.pop(id(stock_chart), None)
+            await self._charts_worker.unwatch_chart(id(stock_chart))
 
         if ChartsSpace.CHARTS_BOX in self._elements:
             charts_box: ui.column = self._elements[ChartsSpace.CHARTS_BOX]
@@ -168,10 +212,9 @@ class ChartsSpace:
                 stock_chart.update()
         ui.timer(0.25, update, once=True)
 
-    async def update_custom_charts(self):
-        for stock_chart in self._charts:
-            if stock_chart.is_custom():
-                await self._update_chart(stock_chart, timer_update=True)
+    async def update_custom_charts(self):  # concurrently, so identical contracts are fetched once
+        await asyncio.gather(*(self._update_chart(stock_chart, timer_update=True)
+                               for stock_chart in self._charts if stock_chart.is_custom()))
 
     async def _update_chart(self,
                             stock_chart: StockChartUiComponent, *,
@@ -222,6 +265,7 @@ class ChartsSpace:
             data.clear()
             p_real_date_from = date_from_timestamp
 
+        chart_version = self._charts_worker.get_chart_version(id(stock_chart))
         try:
             chart_data = await self._charts_worker.update_chart_data(
                 contract=contract,
@@ -246,6 +290,14 @@ class ChartsSpace:
         parameters['price_type'] = price_type
         parameters['real_date_from'] = p_real_date_from
 
+        if stock_chart.is_custom() and self._is_auto_update() and stock_chart in self._charts:
+            await self._charts_worker.watch_chart(id(stock_chart),
+                                                  contract=contract,
+                                                  timeframe=timeframe,
+                                                  price_type=price_type)
+        self._chart_versions[id(stock_chart)] = chart_version
+        self._chart_update_times[id(stock_chart)] = time.monotonic()
+
         stock_chart.set_contracts(self._charts_worker.get_contracts())
         stock_chart.set_stock_data(stock_data, clear_auto_overlay=True)
 
@@ -3,7 +3,7 @@ from typing import Union
 
 from bots_platform.model.workers import MarketsWorker
 from bots_platform.gui.spaces import Columns
-from bots_platform.gui.utils import Notification
+from bots_platform.gui.utils import Notification, ServerTable
 from bots_platform.model.utils import get_exchange_trade_url, get_trading_view_url
 
 
@@ -14,6 +14,8 @@ class MarketsSpace:
     FILTER_INPUT = 'FILTER_INPUT'
     MARKETS_TABLE = 'MARKETS_TABLE'
     UPDATE_MARKETS_TIMER = 'UPDATE_MARKETS_TIMER'
+    UPDATE_MARKETS_TABLE_TIMER = 'UPDATE_MARKETS_TABLE_TIMER'
+    MARKETS_TABLE_UPDATE_SECONDS = 5  # the rows are a snapshot of the ticker streams
 
     def __init__(self):
         self._markets_worker: Union[MarketsWorker, None] = None
@@ -105,21 +107,11 @@ class MarketsSpace:
             else:
                 filter_input = self._elements[MarketsSpace.FILTER_INPUT]
 
-            autocomplete = {'spot', 'linear', 'inverse'}
-            markets_rows = []
-            try:
-                markets_rows: list = await self._markets_worker.fetch_exchange_market_info()
-                for x in markets_rows:
-                    x['key'] = f"{x['type']} {x['symbol']} {x['launch_timestamp']}"
-                    x['exchange_link'] = get_exchange_trade_url(x['symbol'])
-                    x['tv_link'] = get_trading_view_url(x['symbol'])
-                    autocomplete.add(x['symbol'])
-            except:
-                pass
-            filter_input.set_autocomplete(list(autocomplete))
+            markets_rows = await self._fetch_markets_rows()
+            filter_input.set_autocomplete(['spot', 'linear', 'inverse', *(x['symbol'] for x in markets_rows)])
 
             if MarketsSpace.MARKETS_TABLE not in self._elements:
-                table = ui.table(columns=Columns.MARKETS_TABLE_COLUMNS, rows=markets_rows, row_key='key',
+                table = ui.table(columns=Columns.MARKETS_TABLE_COLUMNS, rows=[], row_key='key',
                                  pagination=10).style("width: 1250px;")
                 table.add_slot('body-cell-symbol', '''
                      <q-td :props="props">
@@ -131,17 +123,38 @@ class MarketsSpace:
                          <a :href="props.row.tv_link" target="_blank">{{ props.row.type }}</a>
                      </q-td>
                  ''')
-                self._elements[MarketsSpace.MARKETS_TABLE] = table
+                self._elements[MarketsSpace.MARKETS_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[MarketsSpace.MARKETS_TABLE]
-                table.update_rows(markets_rows)
+            self._elements[MarketsSpace.MARKETS_TABLE].set_rows(markets_rows)
 
             self._elements[MarketsSpace.UPDATE_MARKETS_TIMER] = ui.timer(10 * 60,  # 10 minutes
                                                                          callback=lambda *_: update_markets_triggered(),
                                                                          once=True)
+            self._elements[MarketsSpace.UPDATE_MARKETS_TABLE_TIMER] = ui.timer(
+                MarketsSpace.MARKETS_TABLE_UPDATE_SECONDS,
+                callback=lambda *_: self._update_markets_table())
         self.__notification.hide()
 
+    async def _fetch_markets_rows(self) -> list:
+        markets_rows = []
+        try:
+            markets_rows: list = await self._markets_worker.fetch_exchange_market_info()
+            for x in markets_rows:
+                if 'key' not in x:  # rows of unchanged tickers are reused by the worker
+                    x['key'] = f"{x['type']} {x['symbol']} {x['launch_timestamp']}"
+                    x['exchange_link'] = get_exchange_trade_url(x['symbol'])
+                    x['tv_link'] = get_trading_view_url(x['symbol'])
+        except:
+            pass
+        return markets_rows
+
+    async def _update_markets_table(self):
+        if not self._constructed or MarketsSpace.MARKETS_TABLE not in self._elements:
+            return
+        markets_rows = await self._fetch_markets_rows()
+        if markets_rows and MarketsSpace.MARKETS_TABLE in self._elements:
+            self._elements[MarketsSpace.MARKETS_TABLE].set_rows(markets_rows)
+
     def check(self):
         if self._market_space is None or self._markets_worker is None:
             raise Exception(f'{type(self).__name__} is not initialized')
@@ -160,9 +173,10 @@ class MarketsSpace:
         self._market_space = None
 
     def _delete_update_markets_timer(self):
-        if MarketsSpace.UPDATE_MARKETS_TIMER in self._elements:
-            try:
-                update_markets_timer = self._elements.pop(MarketsSpace.UPDATE_MARKETS_TIMER)
-                update_markets_timer.cancel()
-            except:
-                pass
+        for x in (MarketsSpace.UPDATE_MARKETS_TIMER, MarketsSpace.UPDATE_MARKETS_TABLE_TIMER):
+            if x in self._elements:
+                try:
+                    update_markets_timer = self._elements.pop(x)
+                    update_markets_timer.cancel()
+                except:
+                    pass
@@ -4,9 +4,10 @@ from decimal import Decimal
 import traceback
 
 from bots_platform.model.workers import TradingWorker
-from bots_platform.model.utils import get_exchange_trade_url, TimeStamp, get_symbol
+from bots_platform.model.records import Record
+from bots_platform.model.utils import TimeStamp, get_symbol
 from bots_platform.gui.spaces import Columns, ChartsSpace
-from bots_platform.gui.utils import Notification
+from bots_platform.gui.utils import Notification, ServerTable
 
 
 class TradingSpace:
@@ -19,6 +20,7 @@ class TradingSpace:
     CANCELED_ORDERS_TABLE = 'CANCELED_ORDERS_TABLE'
     LEDGER_TABLE = 'LEDGER_TABLE'
     UPDATE_TRADING_TIMER = 'UPDATE_TRADING_TIMER'
+    AUTO_CHARTS_PERIOD = 7 * 24 * 60 * 60 * 1000  # ms, older closed orders stay in the history only
 
     def __init__(self):
         self._trading_worker: Union[TradingWorker, None] = None
@@ -101,115 +103,93 @@ class TradingSpace:
 
             # POSITIONS
             for x in positions:
-                x['key'] = f"{x['datetime']} {x['type']} {x['contract']} {x['side']}"
-                x['exchange_link'] = get_exchange_trade_url(x['contract'])
-                contract = x['contract']
-                autocomplete.add(contract)
-            positions.sort(key=lambda x: x['key'], reverse=True)
+                autocomplete.add(x['contract'])
+            positions = sorted(positions, key=lambda x: x.get_sort_key(), reverse=True)
             if TradingSpace.POSITIONS_TABLE not in self._elements:
                 ui.separator()
                 ui.label('Positions')
-                table = ui.table(columns=Columns.POSITION_COLUMNS, rows=positions, row_key='key',
+                table = ui.table(columns=Columns.POSITION_COLUMNS, rows=[], row_key='key',
                                  pagination=10).style("width: 1250px;")
                 table.add_slot('body-cell-contract', '''
                      <q-td :props="props">
                          <a :href="props.row.exchange_link" target="_blank">{{ props.row.contract }}</a>
                      </q-td>
                 ''')
-                self._elements[TradingSpace.POSITIONS_TABLE] = table
+                self._elements[TradingSpace.POSITIONS_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[TradingSpace.POSITIONS_TABLE]
-                table.update_rows(positions)
+            self._elements[TradingSpace.POSITIONS_TABLE].set_rows(positions, to_row=Record.to_row)
 
             # OPEN ORDERS
             for x in open_orders:
-                x['key'] = f"{x['datetime']} {x['type']} {x['contract']} {x['side']} {x['order']} {x['price']} {x['size']}"
-                x['exchange_link'] = get_exchange_trade_url(x['contract'])
-                contract = x['contract']
-                autocomplete.add(contract)
-            open_orders.sort(key=lambda x: x['key'], reverse=True)
+                autocomplete.add(x['contract'])
+            open_orders = sorted(open_orders, key=lambda x: x.get_sort_key(), reverse=True)
             if TradingSpace.OPEN_ORDERS_TABLE not in self._elements:
                 ui.separator()
                 ui.label('Open orders')
-                table = ui.table(columns=Columns.OPEN_ORDERS_COLUMNS, rows=open_orders, row_key='key',
+                table = ui.table(columns=Columns.OPEN_ORDERS_COLUMNS, rows=[], row_key='key',
                                  pagination=5).style("width: 1250px;")
                 table.add_slot('body-cell-contract', '''
                      <q-td :props="props">
                          <a :href="props.row.exchange_link" target="_blank">{{ props.row.contract }}</a>
                      </q-td>
                 ''')
-                self._elements[TradingSpace.OPEN_ORDERS_TABLE] = table
+                self._elements[TradingSpace.OPEN_ORDERS_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[TradingSpace.OPEN_ORDERS_TABLE]
-                table.update_rows(open_orders)
+            self._elements[TradingSpace.OPEN_ORDERS_TABLE].set_rows(open_orders, to_row=Record.to_row)
 
             # CLOSED ORDERS
             for x in closed_orders:
-                x['key'] = f"{x['datetime']} {x['type']} {x['contract']} {x['side']} {x['order']} {x['price']} {x['size']}"
-                x['exchange_link'] = get_exchange_trade_url(x['contract'])
                 autocomplete.add(x['contract'])
-            closed_orders.sort(key=lambda x: x['key'], reverse=True)
+            closed_orders = sorted(closed_orders, key=lambda x: x.get_sort_key(), reverse=True)
             if TradingSpace.CLOSED_ORDERS_TABLE not in self._elements:
                 ui.separator()
                 ui.label('Closed orders')
-                table = ui.table(columns=Columns.CLOSED_ORDERS_COLUMNS, rows=closed_orders, row_key='key',
+                table = ui.table(columns=Columns.CLOSED_ORDERS_COLUMNS, rows=[], row_key='key',
                                  pagination=5).style("width: 1250px;")
                 table.add_slot('body-cell-contract', '''
                      <q-td :props="props">
                          <a :href="props.row.exchange_link" target="_blank">{{ props.row.contract }}</a>
                      </q-td>
                 ''')
-                self._elements[TradingSpace.CLOSED_ORDERS_TABLE] = table
+                self._elements[TradingSpace.CLOSED_ORDERS_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[TradingSpace.CLOSED_ORDERS_TABLE]
-                table.update_rows(closed_orders)
+            self._elements[TradingSpace.CLOSED_ORDERS_TABLE].set_rows(closed_orders, to_row=Record.to_row)
 
             # CANCELED ORDERS
             for x in canceled_orders:
-                x['key'] = f"{x['datetime']} {x['type']} {x['contract']} {x['side']} {x['order']} {x['reason']} {x['size']}"
-                x['exchange_link'] = get_exchange_trade_url(x['contract'])
                 autocomplete.add(x['contract'])
-            canceled_orders.sort(key=lambda x: x['key'], reverse=True)
+            canceled_orders = sorted(canceled_orders, key=lambda x: x.get_sort_key(), reverse=True)
             if TradingSpace.CANCELED_ORDERS_TABLE not in self._elements:
                 ui.separator()
                 ui.label('Canceled orders')
-                table = ui.table(columns=Columns.CANCELED_ORDERS_COLUMNS, rows=canceled_orders, row_key='key',
+                table = ui.table(columns=Columns.CANCELED_ORDERS_COLUMNS, rows=[], row_key='key',
                                  pagination=5).style("width: 1250px;")
                 table.add_slot('body-cell-contract', '''
                      <q-td :props="props">
                          <a :href="props.row.exchange_link" target="_blank">{{ props.row.contract }}</a>
                      </q-td>
                 ''')
-                self._elements[TradingSpace.CANCELED_ORDERS_TABLE] = table
+                self._elements[TradingSpace.CANCELED_ORDERS_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[TradingSpace.CANCELED_ORDERS_TABLE]
-                table.update_rows(canceled_orders)
+            self._elements[TradingSpace.CANCELED_ORDERS_TABLE].set_rows(canceled_orders, to_row=Record.to_row)
 
             # LEDGER
             for x in ledger:
-                x['key'] = f"{x['datetime']} {x['contract']} {x['type']} {x['side']} {x['quantity']}"
-                x['exchange_link'] = get_exchange_trade_url(x['contract'])
                 autocomplete.add(x['contract'])
-            ledger.sort(key=lambda x: x['key'], reverse=True)
+            ledger = sorted(ledger, key=lambda x: x.get_sort_key(), reverse=True)
             if TradingSpace.LEDGER_TABLE not in self._elements:
                 ui.separator()
                 ui.label('Transactions')
-                table = ui.table(columns=Columns.LEDGER_COLUMNS, rows=ledger, row_key='key',
+                table = ui.table(columns=Columns.LEDGER_COLUMNS, rows=[], row_key='key',
                                  pagination=5).style("width: 1250px;")
                 table.add_slot('body-cell-contract', '''
                      <q-td :props="props">
                          <a :href="props.row.exchange_link" target="_blank">{{ props.row.contract }}</a>
                      </q-td>
                 ''')
-                self._elements[TradingSpace.LEDGER_TABLE] = table
+                self._elements[TradingSpace.LEDGER_TABLE] = ServerTable(table)
                 filter_input.bind_value_to(table, 'filter')
-            else:
-                table = self._elements[TradingSpace.LEDGER_TABLE]
-                table.update_rows(ledger)
+            self._elements[TradingSpace.LEDGER_TABLE].set_rows(ledger, to_row=Record.to_row)
 
             filter_input.set_autocomplete(list(autocomplete))
             await self._add_update_charts(trading_data)
@@ -259,7 +239,10 @@ class TradingSpace:
 
             positions = trading_data[TradingWorker.POSITIONS]
             open_orders = trading_data[TradingWorker.OPEN_ORDERS]
-            closed_orders = trading_data[TradingWorker.CLOSED_ORDERS]
+            # the backfilled history reaches a year back, charts are made for the recent window only
+            recent_timestamp = TimeStamp.get_utc_dt_from_now().timestamp() * 1000 - TradingSpace.AUTO_CHARTS_PERIOD
+            closed_orders = [x for x in trading_data[TradingWorker.CLOSED_ORDERS]
+                             if x['timestamp'] >= recent_timestamp]
             graphs = dict()
             first_timestamps = dict()
 
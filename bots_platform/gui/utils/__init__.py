@@ -1 +1,3 @@
 from bots_platform.gui.utils.notification import Notification
+from bots_platform.gui.utils.table_delta import get_rows_delta, update_table_rows
+from bots_platform.gui.utils.server_table import ServerTable
@@ -0,0 +1,106 @@
+from nicegui import ui
+from decimal import Decimal
+from typing import Union, Callable
+import re
+
+from bots_platform.gui.utils.table_delta import update_table_rows
+
+
+class ServerTable:
+    # sorting, filtering and pagination run on the server, the browser gets only the visible page
+
+    def __init__(self, nicegui_table_object: ui.table):
+        self._table = nicegui_table_object
+        self._rows: list = []
+        self._to_row: Callable = dict
+        self._sort_indexes: dict = dict()  # sort field: row indexes
+        self._search_index: Union[list, None] = None  # lowercase text of the row cells
+        columns = self._table._props['columns']
+        self._search_fields = [x['field'] for x in columns if isinstance(x.get('field'), str)]
+        self._sort_fields = {x['name']: ServerTable._get_sort_field(x) for x in columns}
+        pagination = self._table._props['pagination']
+        self._table._props['pagination'] = {
+            'sortBy': pagination.get('sortBy'),
+            'descending': pagination.get('descending', False),
+            'page': pagination.get('page', 1),
+            'rowsPerPage': pagination.get('rowsPerPage', 0),
+            'rowsNumber': 0,
+        }
+        self._table._props['rows'] = []
+        self._table.on('request', self._handle_request, ['pagination', 'filter'])
+
+    def get(self) -> ui.table:
+        return self._table
+
+    @staticmethod
+    def _get_sort_field(column: dict) -> str:
+        # columns sorted on the client by a hidden raw field keep using that field
+        match = re.search(r'rowA\.(\w+)', column.get(':sort', ''))
+        return match.group(1) if match else column['field']
+
+    @staticmethod
+    def _get_sort_value(value) -> tuple:
+        if isinstance(value, bool):
+            return 1, str(value)
+        if isinstance(value, (int, float, Decimal)):
+            return 0, value
+        if value is None:
+            return -1, ''
+        return 1, str(value)
+
+    def set_rows(self, rows: list, *, to_row: Callable = dict):
+        self._rows = list(rows)
+        self._to_row = to_row
+        self._sort_indexes.clear()
+        self._search_index = None
+        self._refresh(update=False)
+
+    def _get_sort_index(self, sort_by: str) -> list:
+        if sort_by not in self._sort_indexes:
+            field = self._sort_fields.get(sort_by, sort_by)
+            self._sort_indexes[sort_by] = sorted(
+                range(len(self._rows)),
+                key=lambda i: ServerTable._get_sort_value(self._rows[i].get(field)))
+        return self._sort_indexes[sort_by]
+
+    def _get_search_index(self) -> list:
+        if self._search_index is None:
+            self._search_index = ['\n'.join(str(x.get(field, '')) for field in self._search_fields).lower()
+                                  for x in self._rows]
+        return self._search_index
+
+    def _refresh(self, *, update: bool):
+        pagination = self._table._props['pagination']
+        sort_by = pagination.get('sortBy')
+        indexes = self._get_sort_index(sort_by) if sort_by else range(len(self._rows))
+        if sort_by and pagination.get('descending'):
+            indexes = reversed(indexes)
+        search = str(self._table._props.get('filter') or '').lower()
+        if search:
+            search_index = self._get_search_index()
+            indexes = [i for i in indexes if search in search_index[i]]
+        else:
+            indexes = list(indexes)
+        rows_number = len(indexes)
+        rows_per_page = pagination.get('rowsPerPage') or 0
+        page = max(1, pagination.get('page') or 1)
+        if rows_per_page:
+            page = min(page, max(1, -(-rows_number // rows_per_page)))
+            indexes = indexes[(page - 1) * rows_per_page:page * rows_per_page]
+        rows = [self._to_row(self._rows[i]) for i in indexes]
+        if update or page != pagination.get('page') or rows_number != pagination.get('rowsNumber'):
+            self._table._props['pagination'] = {**pagination, 'page': page, 'rowsNumber': rows_number}
+            self._table._props['rows'] = rows
+            self._table.update()
+        else:
+            update_table_rows(self._table, rows)
+
+    def _handle_request(self, e):
+        pagination = e.args.get('pagination') or dict()
+        self._table._props['pagination'] = {
+            **self._table._props['pagination'],
+            **{k: v for k, v in pagination.items() if k in ('sortBy', 'descending', 'page', 'rowsPerPage')},
+        }
+        if 'filter' in e.args:
+            self._table._props['filter'] = e.args['filter']
+        self._refresh(update=True)
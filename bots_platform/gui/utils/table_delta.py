@@ -0,0 +1,59 @@
+from nicegui import ui, json
+import nicegui
+
+# the public api sends every row on an update, the delta patches the props of the mounted element
+# on the client instead, which is an internal of these versions: [from, to)
+ROWS_DELTA_NICEGUI_VERSIONS = ((2, 0), (3, 0))
+
+
+def _get_nicegui_version() -> tuple:
+    try:
+        return tuple(int(x) for x in nicegui.__version__.split('.')[:2])
+    except ValueError:
+        return ()
+
+
+IS_ROWS_DELTA_SUPPORTED = ROWS_DELTA_NICEGUI_VERSIONS[0] <= _get_nicegui_version() < ROWS_DELTA_NICEGUI_VERSIONS[1]
+
+
+def get_rows_delta(old_rows: list, new_rows: list, row_key: str) -> tuple[list, list, bool]:
+    # (inserted or updated rows, removed keys, order changed)
+    old_rows_dict = {x[row_key]: x for x in old_rows}
+    upserted = [x for x in new_rows if old_rows_dict.get(x[row_key]) != x]
+    new_keys = set(x[row_key] for x in new_rows)
+    removed = [k for k in old_rows_dict if k not in new_keys]
+    order_changed = [k for k in old_rows_dict if k in new_keys] != [x[row_key] for x in new_rows]
+    return upserted, removed, order_changed
+
+
+def update_table_rows(table: ui.table, rows: list):
+    # sends only inserted, updated and removed rows instead of the whole table
+    if not IS_ROWS_DELTA_SUPPORTED:
+        table.rows = [dict(x) for x in rows]
+        return
+    row_key = table.row_key
+    upserted, removed, order_changed = get_rows_delta(table.rows, rows, row_key)
+    table.rows[:] = [dict(x) for x in rows]  # server state for newly connected clients, nothing is sent
+    if not upserted and not removed and not order_changed:
+        return
+    order = [x[row_key] for x in rows] if order_changed else None
+    table.client.run_javascript(f"""
+        const element = mounted_app.elements[{table.id}];
+        if (element) {{
+            const rowKey = {json.dumps(row_key)};
+            const removed = new Set({json.dumps(removed)});
+            const upserted = new Map({json.dumps(upserted)}.map((row) => [row[rowKey], row]));
+            const order = {json.dumps(order)};
+            const rows = element.props.rows.filter((row) => !removed.has(row[rowKey])).map((row) => {{
+                const newRow = upserted.get(row[rowKey]);
+                upserted.delete(row[rowKey]);
+                return newRow === undefined ? row : newRow;
+            }});
+            rows.push(...upserted.values());
+            if (order) {{
+                const index = new Map(order.map((key, i) => [key, i]));
+                rows.sort((a, b) => index.get(a[rowKey]) - index.get(b[rowKey]));
+            }}
+            element.props.rows = rows;
+        }}
+    """)
@@ -1,4 +1,12 @@
 from bots_platform.model.exchange_model import ExchangeModel
 from bots_platform.model.utils import (TimeStamp, get_symbol, get_trading_view_url, get_exchange_trade_url,
-                                       get_market_type, strip_tags, make_brownian_motion, ArithOHLCVList)
+                                       get_market_type, strip_tags, make_brownian_motion, OHLCVSeries)
+from bots_platform.model.chart_expression import ChartExpression
+from bots_platform.model.pnl_engine import PnLEngine
+from bots_platform.model.cache import TTLCache
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.request_scheduler import RequestScheduler, TokenBucket
+from bots_platform.model.records import (Record, PositionRecord, OpenOrderRecord, ClosedOrderRecord,
+                                         CanceledOrderRecord, LedgerRecord)
 from bots_platform.model.logger import Logger
+from bots_platform.model.storage import CandleStore, CandleCache, AccountStore
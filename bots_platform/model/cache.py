@@ -0,0 +1,238 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Union
+import asyncio
+import sys
+import time
+
+from bots_platform.model.utils import TimeStamp
+
+
+def estimate_size(value, *, max_depth: int = 4) -> int:  # rough deep size in bytes
+    size = sys.getsizeof(value)
+    if max_depth <= 0:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, max_depth=max_depth - 1) + estimate_size(v, max_depth=max_depth - 1)
+                    for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(x, max_depth=max_depth - 1) for x in value)
+    elif hasattr(type(value), '__slots__') and not isinstance(value, (str, bytes)):
+        size += sum(estimate_size(getattr(value, x, None), max_depth=max_depth - 1)
+                    for x in getattr(type(value), '__slots__', ()))
+    return size
+
+
+class CacheEntry:
+    __slots__ = ('value', 'timestamp', 'size')
+
+    def __init__(self, value, timestamp: float, size: int):
+        self.value = value
+        self.timestamp = timestamp
+        self.size = size
+
+
+class CacheMetrics:
+    __slots__ = ('hits', 'stale_hits', 'misses', 'refreshes', 'errors', 'evictions', 'invalidations',
+                 'refresh_seconds', 'max_refresh_seconds')
+
+    def __init__(self):
+        for x in CacheMetrics.__slots__:
+            setattr(self, x, 0)
+
+    def to_dict(self) -> dict:
+        metrics = {x: getattr(self, x) for x in CacheMetrics.__slots__}
+        metrics['average_refresh_seconds'] = self.refresh_seconds / self.refreshes if self.refreshes else 0.
+        return metrics
+
+
+class TTLCache:
+    # per-key TTLs, LRU eviction by entry count and memory, single-flight refreshes
+    # with stale-while-revalidate, invalidation hooks and hit/miss/latency metrics
+    TTL = 60  # seconds
+    STALE_TTL = 0  # seconds
+
+    def __init__(self, name: str = '', *,
+                 ttl: float = TTL,
+                 stale_ttl: float = STALE_TTL,
+                 max_size: Union[int, None] = None,
+                 memory_budget: Union[int, None] = None,
+                 size_func: Union[Callable, None] = None):
+        self._name = name
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._max_size = max_size
+        self._memory_budget = memory_budget
+        self._size_func = size_func if size_func is not None else estimate_size
+        self._lock: RLock = RLock()
+        self._entries: OrderedDict = OrderedDict()  # key: CacheEntry
+        self._ttls: dict = dict()  # key: (ttl, stale ttl)
+        self._in_flight: dict = dict()  # key: (asyncio.Task, invalidation generation at its start)
+        self._generation: int = 0  # incremented by every invalidation
+        self._invalidated: dict = dict()  # key: generation of its last invalidation
+        self._invalidated_all: int = 0  # generation of the last invalidation of the whole cache
+        self._invalidation_hooks: list = list()
+        self._size: int = 0
+        self._metrics: CacheMetrics = CacheMetrics()
+
+    @staticmethod
+    def _get_now() -> float:
+        return TimeStamp.get_local_dt_from_now().timestamp()
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_size(self) -> int:
+        return self._size
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            metrics = self._metrics.to_dict()
+            metrics['entries'] = len(self._entries)
+            metrics['size'] = self._size
+            return metrics
+
+    def set_ttl(self, key, *, ttl: float, stale_ttl: float = 0.):
+        with self._lock:
+            self._ttls[key] = (ttl, stale_ttl)
+
+    def get_ttl(self, key) -> tuple:  # (ttl, stale ttl)
+        with self._lock:
+            return self._ttls.get(key, (self._ttl, self._stale_ttl))
+
+    def add_invalidation_hook(self, func: Callable):  # func(key), key is None for the whole cache
+        with self._lock:
+            self._invalidation_hooks.append(func)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get_value(self, key, default=None):  # ignores expiration
+        with self._lock:
+            entry: Union[CacheEntry, None] = self._entries.get(key)
+            if entry is None:
+                self._metrics.misses += 1
+                return default
+            self._metrics.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def peek(self, key, default=None):  # no metrics, no LRU update
+        with self._lock:
+            entry: Union[CacheEntry, None] = self._entries.get(key)
+            return entry.value if entry is not None else default
+
+    def put(self, key, value, *,
+            size: Union[int, None] = None,
+            timestamp: Union[float, None] = None):  # timestamp of a value restored from disk
+        with self._lock:
+            old_entry: Union[CacheEntry, None] = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._size -= old_entry.size
+            if size is None:
+                size = self._size_func(value) if self._memory_budget is not None else 0
+            self._entries[key] = CacheEntry(value, TTLCache._get_now() if timestamp is None else timestamp, size)
+            self._size += size
+            self._evict()
+
+    def update(self, key, value):  # replaces the value, the age and so the next refresh stay the same
+        with self._lock:
+            entry: Union[CacheEntry, None] = self._entries.get(key)
+            self.put(key, value, timestamp=entry.timestamp if entry is not None else None)
+
+    def _evict(self):
+        while len(self._entries) > 1 and (
+                self._max_size is not None and len(self._entries) > self._max_size or
+                self._memory_budget is not None and self._size > self._memory_budget):
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self._metrics.evictions += 1
+
+    def remove(self, key):
+        with self._lock:
+            entry: Union[CacheEntry, None] = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def invalidate(self, key=None):  # the next get refreshes and waits, the old value is a fallback
+        # a refresh in flight may have read the old data, so the next get does not join it
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for x in keys:
+                if x in self._entries:
+                    self._entries[x].timestamp = float('-inf')
+            self._generation += 1
+            if key is None:
+                self._invalidated.clear()
+                self._invalidated_all = self._generation
+            else:
+                self._invalidated[key] = self._generation
+            self._metrics.invalidations += 1
+            hooks = list(self._invalidation_hooks)
+        for hook in hooks:
+            hook(key)
+
+    async def _refresh(self, refresh_func: Callable):
+        start_time = time.perf_counter()
+        try:
+            return await refresh_func()
+        except BaseException:
+            with self._lock:
+                self._metrics.errors += 1
+            raise
+        finally:
+            refresh_seconds = time.perf_counter() - start_time
+            with self._lock:
+                self._metrics.refreshes += 1
+                self._metrics.refresh_seconds += refresh_seconds
+                self._metrics.max_refresh_seconds = max(self._metrics.max_refresh_seconds, refresh_seconds)
+
+    def _get_refresh_task(self, key, refresh_func: Callable) -> asyncio.Task:
+        with self._lock:
+            task, generation = self._in_flight.get(key, (None, 0))
+            invalidated = max(self._invalidated.get(key, 0), self._invalidated_all)
+            if task is None or task.done() or generation < invalidated:  # started before an invalidation
+                task = asyncio.ensure_future(self._refresh(refresh_func))
+                self._in_flight[key] = (task, self._generation)
+                task.add_done_callback(lambda x: self._on_refresh_done(key, x))
+            return task
+
+    def _on_refresh_done(self, key, task: asyncio.Task):
+        with self._lock:
+            if self._in_flight.get(key, (None, 0))[0] is task:
+                self._in_flight.pop(key)
+        if not task.cancelled():
+            task.exception()  # already logged by the refresh function
+
+    async def get(self, key, refresh_func: Callable, *,
+                  ttl: Union[float, None] = None,
+                  stale_ttl: Union[float, None] = None,
+                  force: bool = False):
+        # refresh_func is an async function which stores the new value with put()
+        with self._lock:
+            key_ttl, key_stale_ttl = self.get_ttl(key)
+            ttl = key_ttl if ttl is None else ttl
+            stale_ttl = key_stale_ttl if stale_ttl is None else stale_ttl
+            entry: Union[CacheEntry, None] = self._entries.get(key)
+            if not force and entry is not None and entry.value:
+                self._entries.move_to_end(key)
+                age = TTLCache._get_now() - entry.timestamp
+                if age < ttl:
+                    self._metrics.hits += 1
+                    return entry.value
+                if age < ttl + stale_ttl:
+                    self._metrics.stale_hits += 1
+                    self._get_refresh_task(key, refresh_func)
+                    return entry.value
+            self._metrics.misses += 1
+            task = self._get_refresh_task(key, refresh_func)
+        await asyncio.wait([task])  # errors keep the previous value, cancelling a caller keeps the refresh
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
@@ -0,0 +1,153 @@
+from functools import lru_cache
+from typing import Union
+import numbers
+import ast
+import re
+
+import numpy as np
+
+from bots_platform.model.utils import OHLCVSeries
+
+
+class ChartExpression:
+    SYMBOL_PATTERN = re.compile(r'[A-Z0-9]+?/[A-Z0-9]+(?::[A-Z0-9]+(?:-[0-9]+)?)?|\bRANDOM\b',
+                                flags=re.IGNORECASE)
+    BINARY_OPERATORS = {
+        ast.Add: lambda x, y: x + y,
+        ast.Sub: lambda x, y: x - y,
+        ast.Mult: lambda x, y: x * y,
+        ast.Div: lambda x, y: x / y,
+        ast.FloorDiv: lambda x, y: x // y,
+        ast.Mod: lambda x, y: x % y,
+        ast.Pow: lambda x, y: x ** y,
+    }
+    UNARY_OPERATORS = {
+        ast.UAdd: lambda x: +x,
+        ast.USub: lambda x: -x,
+    }
+    FUNCTIONS = {  # name: (number of arguments, function)
+        'abs': (1, lambda x: abs(x)),
+        'log': (1, lambda x: x.log() if isinstance(x, OHLCVSeries) else float(np.log(x))),
+        'exp': (1, lambda x: x.exp() if isinstance(x, OHLCVSeries) else float(np.exp(x))),
+        'sqrt': (1, lambda x: x.sqrt() if isinstance(x, OHLCVSeries) else float(np.sqrt(x))),
+        'shift': (2, lambda x, n: x.shift(n)),
+        'sma': (2, lambda x, n: x.sma(n)),
+        'ema': (2, lambda x, n: x.ema(n)),
+        'rolling_max': (2, lambda x, n: x.rolling_max(n)),
+        'rolling_min': (2, lambda x, n: x.rolling_min(n)),
+    }
+    WINDOW_FUNCTIONS = frozenset({'shift', 'sma', 'ema', 'rolling_max', 'rolling_min'})
+    LOOKBACKS = {  # name: previous candles of the last value for a window n, None if all of them
+        'shift': lambda n: n,
+        'sma': lambda n: max(n - 1, 0),
+        'ema': lambda n: None if n > 1 else 0,
+        'rolling_max': lambda n: max(n - 1, 0),
+        'rolling_min': lambda n: max(n - 1, 0),
+    }
+
+    def __init__(self, expression: str):
+        self._expression = expression
+        self._symbols: list = list()
+        variables = dict()
+
+        def replace_symbol(match):
+            symbol = match.group(0).upper()
+            if symbol not in variables:
+                variables[symbol] = f'_s{len(variables)}'
+                self._symbols.append(symbol)
+            return variables[symbol]
+
+        source = ChartExpression.SYMBOL_PATTERN.sub(replace_symbol, expression)
+        try:
+            tree = ast.parse(source.lower(), mode='eval')
+        except SyntaxError:
+            raise Exception(f'Invalid expression: {expression}')
+        self._variables = {v: k for k, v in variables.items()}
+        self._plan = self._compile(tree.body)
+        self._lookback = ChartExpression._get_lookback(tree.body)
+
+    @staticmethod
+    def normalize(expression: str) -> str:
+        return ''.join(expression.upper().split())
+
+    @staticmethod
+    def compile(expression: str):
+        return ChartExpression._compile_cached(ChartExpression.normalize(expression))
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile_cached(expression: str):
+        return ChartExpression(expression)
+
+    @property
+    def expression(self) -> str:
+        return self._expression
+
+    @property
+    def symbols(self) -> list:
+        return list(self._symbols)
+
+    @property
+    def lookback(self) -> Union[int, None]:  # previous candles the last value depends on, None if all of them
+        return self._lookback
+
+    def evaluate(self, series: dict) -> OHLCVSeries:
+        r = self._plan(series)
+        if not isinstance(r, OHLCVSeries):
+            raise Exception(f'Expression has no contracts: {self._expression}')
+        return r
+
+    @staticmethod
+    def _get_lookback(node) -> Union[int, None]:  # of a compiled tree
+        if isinstance(node, ast.Call) and node.func.id in ChartExpression.WINDOW_FUNCTIONS:
+            lookback = ChartExpression._get_lookback(node.args[0])
+            n = ChartExpression.LOOKBACKS[node.func.id](node.args[1].value)
+            return None if lookback is None or n is None else lookback + n
+        lookbacks = [ChartExpression._get_lookback(x) for x in ast.iter_child_nodes(node)
+                     if isinstance(x, ast.expr)]
+        return None if None in lookbacks else max(lookbacks, default=0)
+
+    def _compile(self, node):
+        if isinstance(node, ast.BinOp) and type(node.op) in ChartExpression.BINARY_OPERATORS:
+            op = ChartExpression.BINARY_OPERATORS[type(node.op)]
+            left = self._compile(node.left)
+            right = self._compile(node.right)
+            if not any(isinstance(x, ast.Name) for x in ast.walk(node)):  # folded, e.g. 9 ** 9 ** 9 ** 9 fails here
+                try:
+                    value = op(left({}), right({}))
+                except (OverflowError, ZeroDivisionError):
+                    raise Exception(f'Invalid constant "{ast.unparse(node)}": {self._expression}')
+                return lambda series: value
+            return lambda series: op(left(series), right(series))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in ChartExpression.UNARY_OPERATORS:
+            op = ChartExpression.UNARY_OPERATORS[type(node.op)]
+            operand = self._compile(node.operand)
+            return lambda series: op(operand(series))
+        if isinstance(node, ast.Constant) and isinstance(node.value, numbers.Real) and \
+                not isinstance(node.value, bool):
+            try:  # floats overflow instead of unbounded integer arithmetic like 9 ** 9 ** 9 ** 9
+                value = float(node.value)
+            except OverflowError:
+                raise Exception(f'Number is too large: {self._expression}')
+            return lambda series: value
+        if isinstance(node, ast.Name) and node.id in self._variables:
+            symbol = self._variables[node.id]
+            return lambda series: series.get(symbol, OHLCVSeries())
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+                node.func.id in ChartExpression.FUNCTIONS and not node.keywords:
+            n_args, func = ChartExpression.FUNCTIONS[node.func.id]
+            if len(node.args) != n_args:
+                raise Exception(f'{node.func.id}() takes {n_args} argument(s): {self._expression}')
+            if node.func.id in ChartExpression.WINDOW_FUNCTIONS:
+                window = node.args[1]
+                if not isinstance(window, ast.Constant) or not isinstance(window.value, int) or \
+                        isinstance(window.value, bool) or window.value < 0:
+                    raise Exception(f'{node.func.id}() window must be a non-negative integer: {self._expression}')
+                if not any(isinstance(x, ast.Name) for x in ast.walk(node.args[0])):
+                    raise Exception(f'{node.func.id}() takes a contract expression: {self._expression}')
+                n = window.value
+                x = self._compile(node.args[0])
+                return lambda series: func(x(series), n)
+            args = [self._compile(x) for x in node.args]
+            return lambda series: func(*(x(series) for x in args))
+        raise Exception(f'Unsupported expression element "{ast.unparse(node)}": {self._expression}')
@@ -1,11 +1,15 @@
 from typing import Union
 from threading import RLock
 import ccxt
-import asyncio
+import hashlib
 import traceback
 
 from bots_platform.model.utils import TimeStamp
 from bots_platform.model.logger import Logger
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.request_scheduler import RequestScheduler
+from bots_platform.model.storage import CandleStore, CandleCache, AccountStore, MarketStore
+from bots_platform.model.streams import PrivateStream
 from bots_platform.model.workers import (BalanceWorker, ChartsWorker, MarketsWorker,
                                          TradingWorker, TradingBotsWorker)
 
@@ -13,6 +17,13 @@ from bots_platform.model.workers import (BalanceWorker, ChartsWorker, MarketsWor
 class ExchangeModel:
     def __init__(self):
         self._logger = Logger()
+        self._candle_store = CandleStore()
+        self._candle_cache = CandleCache()
+        self._http_client = HttpClient()
+        self._scheduler = RequestScheduler()
+        self._account_store: Union[AccountStore, None] = None
+        self._market_store: Union[MarketStore, None] = None
+        self._private_stream: Union[PrivateStream, None] = None
         self._exchange = None
         self._config = None
         self._api_key = None
@@ -45,10 +56,13 @@ class ExchangeModel:
                 }
                 self._config.update(config_parameters)
                 connection = self._new_connection()
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, connection.fetch_balance)
+                await self._scheduler.run(connection.fetch_balance)
                 self._connection = connection
+                account = hashlib.sha256(f'{exchange}:{api_key}:{is_testnet}'.encode()).hexdigest()[:16]
+                self._account_store = AccountStore(account=account)
+                self._market_store = MarketStore(name=f"{exchange}_{'testnet' if is_testnet else 'mainnet'}")
                 self._init_workers()
+                self._start_private_stream()
             except BaseException as e:
                 self._exchange = None
                 self._connection = None
@@ -75,9 +89,17 @@ class ExchangeModel:
             self._api_key = ''
             self._api_secret = ''
             self._is_testnet = False
+            self._stop_private_stream()
             self._detach_workers()
+            if self._account_store is not None:
+                self._account_store.close()
+            self._account_store = None
             self._logger.log('Disconnected!')
 
+    async def close(self):
+        await self._http_client.close()
+        self._scheduler.close()
+
     def check(self):
         with self.__lock:
             if self._connection is None or self._exchange is None:
@@ -101,10 +123,19 @@ class ExchangeModel:
     def get_logger(self):
         return self._logger
 
+    def get_cache_metrics(self) -> dict:
+        metrics = {'CandleCache': self._candle_cache.get_metrics()}
+        for worker in (self._balance_worker, self._markets_worker, self._trading_worker):
+            if worker is not None:
+                cache = worker.get_cache()
+                metrics[cache.get_name()] = cache.get_metrics()
+        return metrics
+
     def _new_connection(self):
         connection = getattr(ccxt, self._exchange)(self._config)
         if self._is_testnet:
             connection.enable_demo_trading(True)
+        self._scheduler.set_connection(connection)
         return connection
 
     def _init_workers(self):
@@ -124,8 +155,40 @@ class ExchangeModel:
         self._trading_worker.set_connection_aborted_callback(self.reconnect)
         self._charts_worker.set_connection_aborted_callback(self.reconnect)
         self._trading_bots_worker.set_connection_aborted_callback(self.reconnect)
+        self._trading_worker.set_candle_store(self._candle_store)
+        self._trading_worker.set_candle_cache(self._candle_cache)
+        self._trading_worker.set_account_store(self._account_store)
+        self._markets_worker.set_market_store(self._market_store)
+        self._markets_worker.set_http_client(self._http_client)
+        # one scheduler shares the exchange rate limits between the workers
+        self._balance_worker.set_scheduler(self._scheduler)
+        self._markets_worker.set_scheduler(self._scheduler)
+        self._trading_worker.set_scheduler(self._scheduler)
+        self._charts_worker.set_scheduler(self._scheduler)
+        self._trading_bots_worker.set_scheduler(self._scheduler)
         self._charts_worker.set_trading_worker(self._trading_worker)
         self._charts_worker.set_markets_worker(self._markets_worker)
+        self._charts_worker.set_candle_cache(self._candle_cache)
+        # orders and positions change the balance too
+        balance_cache = self._balance_worker.get_cache()
+        self._trading_worker.get_cache().add_invalidation_hook(lambda _: balance_cache.invalidate())
+
+    def _start_private_stream(self):
+        # positions, orders, executions and the wallet are pushed, REST only reconciles them
+        url = PrivateStream.DEMO_URL if self._is_testnet else PrivateStream.URL
+        self._private_stream = PrivateStream(self._api_key, self._api_secret, url, http_client=self._http_client)
+        self._private_stream.set_logger(self._logger)
+        self._balance_worker.set_private_stream(self._private_stream)
+        self._trading_worker.set_private_stream(self._private_stream)
+        self._private_stream.start()
+
+    def _stop_private_stream(self):
+        if self._private_stream is None:
+            return
+        self._private_stream.stop()
+        self._private_stream = None
+        self._balance_worker.set_private_stream(None)
+        self._trading_worker.set_private_stream(None)
 
     def _update_workers_connection(self):
         with self.__lock:
@@ -0,0 +1,110 @@
+from threading import RLock
+from typing import Union
+from urllib.parse import urlsplit
+import asyncio
+
+import aiohttp
+
+try:  # aiohttp decodes br responses only if one of the brotli packages is installed
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+
+class HttpClient:
+    # pooled keep-alive connections, compressed responses, per-host timeouts
+    # and conditional requests: an unchanged page costs one 304 and returns the cached text
+    TIMEOUT = 30  # seconds
+    CONNECT_TIMEOUT = 10  # seconds
+    HOST_TIMEOUTS = {  # host: seconds
+        'coinmarketcap.com': 20,
+        'www.blockchaincenter.net': 20,
+    }
+    MAX_CONNECTIONS = 16
+    MAX_CONNECTIONS_PER_HOST = 4
+    DNS_CACHE_TTL = 5 * 60  # seconds
+    ACCEPT_ENCODING = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
+
+    def __init__(self):
+        self._lock: RLock = RLock()
+        self._session: Union[aiohttp.ClientSession, None] = None
+        self._session_loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._ws_session: Union[aiohttp.ClientSession, None] = None
+        self._ws_session_loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._host_timeouts: dict = dict(HttpClient.HOST_TIMEOUTS)
+        self._validators: dict = dict()  # url: (etag, last modified, text)
+
+    def set_timeout(self, host: str, timeout: float):
+        with self._lock:
+            self._host_timeouts[host] = timeout
+
+    def _get_timeout(self, url: str) -> aiohttp.ClientTimeout:
+        with self._lock:
+            total = self._host_timeouts.get(urlsplit(url).hostname, HttpClient.TIMEOUT)
+        return aiohttp.ClientTimeout(total=total, connect=min(total, HttpClient.CONNECT_TIMEOUT))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # a session belongs to the event loop it was created in
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._session is None or self._session.closed or self._session_loop is not loop:
+                connector = aiohttp.TCPConnector(limit=HttpClient.MAX_CONNECTIONS,
+                                                 limit_per_host=HttpClient.MAX_CONNECTIONS_PER_HOST,
+                                                 ttl_dns_cache=HttpClient.DNS_CACHE_TTL)
+                self._session = aiohttp.ClientSession(connector=connector, auto_decompress=True)
+                self._session_loop = loop
+            return self._session
+
+    def _get_ws_session(self) -> aiohttp.ClientSession:
+        # websockets hold their connections, they would take the per-host slots of the pooled session
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._ws_session is None or self._ws_session.closed or self._ws_session_loop is not loop:
+                connector = aiohttp.TCPConnector(limit=0, limit_per_host=0, ttl_dns_cache=HttpClient.DNS_CACHE_TTL)
+                self._ws_session = aiohttp.ClientSession(connector=connector)
+                self._ws_session_loop = loop
+            return self._ws_session
+
+    async def get_text(self, url: str, headers: Union[dict, None] = None) -> str:
+        request_headers = {'Accept-Encoding': HttpClient.ACCEPT_ENCODING}
+        request_headers.update(headers or dict())
+        with self._lock:
+            etag, last_modified, text = self._validators.get(url, (None, None, None))
+        if text is not None:
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+        session = self._get_session()
+        async with session.get(url, headers=request_headers, timeout=self._get_timeout(url)) as response:
+            if response.status == 304 and text is not None:
+                return text
+            response.raise_for_status()
+            text = await response.text(errors='replace')
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            if etag or last_modified:
+                self._validators[url] = (etag, last_modified, text)
+            else:
+                self._validators.pop(url, None)
+        return text
+
+    def ws_connect(self, url: str, **kwargs):  # async context manager on the websocket session
+        return self._get_ws_session().ws_connect(url, **kwargs)
+
+    async def close(self):
+        with self._lock:
+            sessions = (self._session, self._ws_session)
+            self._session = None
+            self._session_loop = None
+            self._ws_session = None
+            self._ws_session_loop = None
+        for session in sessions:
+            if session is not None and not session.closed:
+                await session.close()
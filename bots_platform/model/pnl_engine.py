@@ -0,0 +1,140 @@
+from threading import RLock
+from decimal import Decimal
+from typing import Dict, Union
+import traceback
+import bisect
+
+
+class PnLEngine:
+    FILL_FIELDS = ('timestamp', 'is_stop_type', 'contract', 'side', 'contracts', 'real_price', 'commission',
+                   'real_size', 'symbol')
+
+    def __init__(self):
+        self._lock: RLock = RLock()
+        self._positions: Dict[Union[str, tuple], list] = dict()  # key: [average entry price, contracts]
+        self._realized_pnl: Dict[str, Decimal] = dict()
+        self._position_pnl: Dict[Union[str, tuple], Decimal] = dict()  # key: realized pnl
+        self._fills: Dict[Union[str, tuple], list] = dict()  # key: sorted sort keys of the applied fills
+        self._applied: dict = dict()  # fill id: [fill values, fill, result, sort key, position key]
+
+    def reset(self):
+        with self._lock:
+            self._positions.clear()
+            self._realized_pnl.clear()
+            self._position_pnl.clear()
+            self._fills.clear()
+            self._applied.clear()
+
+    @staticmethod
+    def _get_sort_key(fill: dict) -> tuple:
+        return fill['timestamp'], fill['is_stop_type'], fill['id']
+
+    @staticmethod
+    def _get_position_key(fill: dict) -> Union[str, tuple]:
+        if fill['symbol'][-1] == 'spot':
+            return fill['contract']
+        return fill['contract'], fill['side']
+
+    @staticmethod
+    def _get_fill_values(fill: dict) -> tuple:
+        return tuple(fill[x] for x in PnLEngine.FILL_FIELDS)
+
+    def apply(self, fills: list) -> list:  # returns [(fill, result)] for the fills applied right now
+        with self._lock:
+            results = dict()  # fill id: (fill, result)
+            changed_fills = []
+            for fill in fills:
+                applied = self._applied.get(fill['id'])
+                if applied is not None and applied[1] is fill:
+                    continue
+                fill_values = PnLEngine._get_fill_values(fill)
+                if applied is not None and applied[0] == fill_values:  # parsed again, the result is kept
+                    applied[1] = fill
+                    results[fill['id']] = (fill, applied[2])
+                    continue
+                changed_fills.append((fill_values, fill))
+            changed_fills.sort(key=lambda x: PnLEngine._get_sort_key(x[1]))
+            # positions are independent, only the ones with a changed or an older fill are replayed
+            replay_keys = set()
+            new_fills = []
+            for fill_values, fill in changed_fills:
+                applied = self._applied.get(fill['id'])
+                if applied is not None:
+                    _, _, _, old_sort_key, old_key = applied
+                    old_fills = self._fills[old_key]
+                    old_fills.pop(bisect.bisect_left(old_fills, old_sort_key))
+                    replay_keys.add(old_key)
+                key = PnLEngine._get_position_key(fill)
+                sort_key = PnLEngine._get_sort_key(fill)
+                key_fills = self._fills.setdefault(key, [])
+                if key_fills and sort_key < key_fills[-1]:
+                    replay_keys.add(key)
+                bisect.insort(key_fills, sort_key)
+                self._applied[fill['id']] = [fill_values, fill, None, sort_key, key]
+                new_fills.append(fill)
+            for key in replay_keys:
+                self._reset_position(key)
+                for sort_key in self._fills[key]:
+                    results[sort_key[-1]] = self._apply(self._applied[sort_key[-1]][1])
+            for fill in new_fills:
+                if self._applied[fill['id']][4] not in replay_keys:
+                    results[fill['id']] = self._apply(fill)
+            return list(results.values())
+
+    def _reset_position(self, key: Union[str, tuple]):
+        contract = key if isinstance(key, str) else key[0]
+        self._positions.pop(key, None)
+        self._realized_pnl[contract] = self._realized_pnl.get(contract, Decimal(0)) - \
+            self._position_pnl.pop(key, Decimal(0))
+
+    def _apply(self, fill: dict) -> tuple:
+        try:
+            result = self._apply_fill(fill)
+        except ArithmeticError:
+            traceback.print_exc()
+            result = None
+        self._applied[fill['id']][2] = result
+        return fill, result
+
+    def _apply_fill(self, fill: dict) -> Union[dict, None]:
+        key = PnLEngine._get_position_key(fill)
+        price = fill['real_price']
+        contracts = fill['contracts']
+        commission = fill['commission']
+        real_size = fill['real_size']
+        if fill['is_stop_type']:
+            old_price, old_contracts = self._positions.get(key, [0, 0])
+            if old_contracts == 0:
+                self._positions[key] = [0, 0]
+                return None
+            new_contracts = max(0, old_contracts - contracts)
+            if new_contracts > 0:
+                self._positions[key] = [old_price, new_contracts]
+            elif key in self._positions:
+                self._positions.pop(key)
+            real_size = min(real_size, price * old_contracts)
+            p = old_price / price
+            pnl = real_size * (1 - p) * (-1 if fill['side'] == 'Short' else 1) - commission
+        else:
+            old_price, old_contracts = self._positions.get(key, [0, 0])
+            new_price = (old_price * old_contracts + price * contracts) / (old_contracts + contracts)
+            self._positions[key] = [new_price, old_contracts + contracts]
+            pnl = -commission
+        contract = fill['contract']
+        self._realized_pnl[contract] = self._realized_pnl.get(contract, Decimal(0)) + pnl
+        self._position_pnl[key] = self._position_pnl.get(key, Decimal(0)) + pnl
+        return {
+            'pnl': pnl,
+            'real_size': real_size
+        }
+
+    def get_position(self, contract: str, side: Union[str, None] = None) -> tuple:  # (entry price, contracts)
+        with self._lock:
+            key = contract if side is None else (contract, side)
+            return tuple(self._positions.get(key, [0, 0]))
+
+    def get_realized_pnl(self, contract: Union[str, None] = None) -> Union[Decimal, Dict[str, Decimal]]:
+        with self._lock:
+            if contract is None:
+                return dict(self._realized_pnl)
+            return self._realized_pnl.get(contract, Decimal(0))
@@ -0,0 +1,130 @@
+from bots_platform.model.utils import TimeStamp, get_exchange_trade_url
+
+
+class Record:
+    # raw values live in __slots__, display strings are formatted on access
+    __slots__ = ()
+    FIELDS: tuple = ()
+    ROW_FIELDS: tuple = ()
+    KEY_FIELDS: tuple = ()
+
+    def __init__(self, **kwargs):
+        for name in type(self).FIELDS:
+            setattr(self, name, kwargs.get(name))
+
+    def __getitem__(self, name: str):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value):
+        if name not in type(self).FIELDS:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __contains__(self, name: str) -> bool:
+        return name in type(self).FIELDS or name in type(self).ROW_FIELDS
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{x}={getattr(self, x)!r}' for x in type(self).FIELDS)})"
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    @property
+    def datetime(self) -> str:
+        return TimeStamp.format_datetime(TimeStamp.get_local_dt_from_timestamp(self.timestamp))
+
+    @property
+    def exchange_link(self) -> str:
+        return get_exchange_trade_url(self.contract)
+
+    @property
+    def key(self) -> str:
+        return ' '.join(str(getattr(self, x)) for x in type(self).KEY_FIELDS)
+
+    def get_sort_key(self) -> tuple:  # orders like key without formatting the datetime
+        return tuple(self.timestamp // 1000 if x == 'datetime' else str(getattr(self, x))
+                     for x in type(self).KEY_FIELDS)
+
+    def to_row(self) -> dict:  # only for the rows sent to the table
+        return {x: getattr(self, x) for x in type(self).ROW_FIELDS}
+
+
+class PositionRecord(Record):
+    FIELDS = ('timestamp', 'contract', 'contracts', 'real_size', 'side', 'leverage', 'status', 'pnl',
+              'unrealized_pnl', 'realized_pnl', 'entry_price', 'mark_price', 'liquidation_price',
+              'take_profit_price', 'stop_loss_price', 'trailing_stop', 'type')
+    ROW_FIELDS = ('key', 'exchange_link', 'timestamp', 'datetime', 'contract', 'real_size', 'size', 'side',
+                  'leverage', 'status', 'pnl', 'unrealized_pnl', 'realized_pnl', 'entry_price', 'mark_price',
+                  'liquidation_price', 'tp_sl', 'trailing_stop', 'type')
+    KEY_FIELDS = ('datetime', 'type', 'contract', 'side')
+    __slots__ = FIELDS
+
+    @property
+    def size(self) -> str:
+        return f"{self.contracts}/{self.real_size}"
+
+    @property
+    def tp_sl(self) -> str:
+        return f'{self.take_profit_price or "-"}/{self.stop_loss_price or "-"}'
+
+
+class OrderRecord(Record):
+    __slots__ = ()
+
+    @property
+    def price(self) -> str:
+        return f"{self.real_price} ({self.trigger_by if self.trigger_by else 'Last'})"
+
+
+class OpenOrderRecord(OrderRecord):
+    FIELDS = ('timestamp', 'contract', 'contracts', 'real_size', 'side', 'order', 'status', 'real_price',
+              'trigger_by', 'tp_sl', 'reduce_only', 'time_in_force', 'type')
+    ROW_FIELDS = ('key', 'exchange_link', 'timestamp', 'datetime', 'contract', 'real_size', 'size', 'side',
+                  'order', 'status', 'real_price', 'price', 'tp_sl', 'reduce_only', 'time_in_force', 'type')
+    KEY_FIELDS = ('datetime', 'type', 'contract', 'side', 'order', 'price', 'size')
+    __slots__ = FIELDS
+
+    @property
+    def size(self) -> str:
+        return f"{self.contracts}/{round(self.real_size, 3)}"
+
+
+class ClosedOrderRecord(OrderRecord):
+    FIELDS = ('id', 'timestamp', 'contract', 'contracts', 'real_size', 'side', 'order', 'status', 'real_price',
+              'trigger_by', 'tp_sl', 'commission', 'reduce_only', 'time_in_force', 'is_stop_type', 'symbol',
+              'type')
+    ROW_FIELDS = ('key', 'exchange_link', 'timestamp', 'datetime', 'contract', 'real_size', 'size', 'side',
+                  'order', 'status', 'real_price', 'price', 'tp_sl', 'commission', 'reduce_only', 'time_in_force',
+                  'type')
+    KEY_FIELDS = ('datetime', 'type', 'contract', 'side', 'order', 'price', 'size')
+    __slots__ = FIELDS
+
+    @property
+    def size(self) -> str:
+        return f"{self.contracts}/{round(self.real_size, 2)}"
+
+
+class CanceledOrderRecord(OrderRecord):
+    FIELDS = ('timestamp', 'contract', 'contracts', 'real_size', 'side', 'order', 'reason', 'real_price',
+              'trigger_by', 'reduce_only', 'time_in_force', 'type')
+    ROW_FIELDS = ('key', 'exchange_link', 'timestamp', 'datetime', 'contract', 'real_size', 'size', 'side',
+                  'order', 'reason', 'real_price', 'price', 'reduce_only', 'time_in_force', 'type')
+    KEY_FIELDS = ('datetime', 'type', 'contract', 'side', 'order', 'reason', 'size')
+    __slots__ = FIELDS
+
+    @property
+    def size(self) -> str:
+        return f"{self.contracts}/{round(self.real_size, 2)}"
+
+
+class LedgerRecord(Record):
+    FIELDS = ('timestamp', 'contract', 'type', 'side', 'quantity', 'filled_price', 'funding', 'fee_paid',
+              'cash_flow', 'change', 'cash_balance')
+    ROW_FIELDS = ('key', 'exchange_link', 'timestamp', 'datetime', 'contract', 'type', 'side', 'quantity',
+                  'filled_price', 'funding', 'fee_paid', 'cash_flow', 'change', 'cash_balance')
+    KEY_FIELDS = ('datetime', 'contract', 'type', 'side', 'quantity')
+    __slots__ = FIELDS
+
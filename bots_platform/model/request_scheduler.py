@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import RLock, local
+from typing import Union, Callable
+from functools import partial
+import itertools
+import asyncio
+import heapq
+import time
+
+import ccxt
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self._rate = rate  # tokens per second, also the burst size
+        self._tokens = rate
+        self._timestamp = time.monotonic()
+        self._not_before = 0.0
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float, now: float):
+        self._refill(now)
+        self._rate = rate
+        self._tokens = min(self._tokens, rate)
+
+    def _refill(self, now: float):
+        self._tokens = min(self._rate, self._tokens + (now - self._timestamp) * self._rate)
+        self._timestamp = now
+
+    def take(self, now: float) -> float:  # seconds to wait, 0 if a token is taken
+        if now < self._not_before:
+            return self._not_before - now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def limit(self, remaining: int, reset_in: float, now: float):  # the budget left on the exchange side
+        self._refill(now)
+        self._tokens = min(self._tokens, remaining)
+        if remaining <= 0:
+            self._not_before = max(self._not_before, now + reset_in)
+
+    def pause(self, seconds: float, now: float):
+        self._refill(now)
+        self._tokens = 0
+        self._not_before = max(self._not_before, now + seconds)
+
+
+class RequestScheduler:
+    # every exchange call of the workers goes through one bounded executor,
+    # queued requests start by priority as soon as their endpoint group has a token
+    GROUPS = ('trade', 'account', 'history', 'market')  # by priority
+    RATE_LIMITS = {  # group: requests per second, bybit v5 limits of the slowest endpoint in the group
+        'trade': 10,
+        'account': 50,
+        'history': 30,
+        'market': 100,  # public endpoints, 600 requests per 5 seconds per IP
+    }
+    METHOD_GROUPS = {
+        'create_order': 'trade',
+        'create_orders': 'trade',
+        'edit_order': 'trade',
+        'cancel_order': 'trade',
+        'cancel_orders': 'trade',
+        'cancel_all_orders': 'trade',
+        'set_leverage': 'trade',
+        'set_margin_mode': 'trade',
+        'upgrade_unified_trade_account': 'trade',
+        'fetch_balance': 'account',
+        'fetch_positions': 'account',
+        'fetch_open_orders': 'account',
+        'is_unified_enabled': 'account',
+        'fetch_closed_orders': 'history',
+        'fetch_canceled_orders': 'history',
+        'fetch_my_trades': 'history',
+        'fetch_ledger': 'history',
+        'fetch_markets': 'market',
+        'fetch_tickers': 'market',
+        'fetch_ohlcv': 'market',
+        'fetch_mark_ohlcv': 'market',
+        'fetch_index_ohlcv': 'market',
+        'fetch_premium_index_ohlcv': 'market',
+    }
+    DEFAULT_GROUP = 'account'
+    MAX_WORKERS = 8
+    RESERVED_WORKERS = 2  # kept free for trade and account requests during chart or history backfills
+    BACKGROUND_GROUPS = frozenset({'history', 'market'})
+    RATE_LIMIT_PAUSE = 1  # seconds without requests of a group after a rate limit error
+
+    def __init__(self):
+        self._lock: RLock = RLock()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=RequestScheduler.MAX_WORKERS,
+                                                                thread_name_prefix='exchange')
+        self._buckets: dict = {x: TokenBucket(RequestScheduler.RATE_LIMITS[x]) for x in RequestScheduler.GROUPS}
+        self._queue: list = list()  # heap of (priority, sequence number, group, future, func, args)
+        self._counter = itertools.count()
+        self._running: int = 0
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._timer: Union[asyncio.TimerHandle, None] = None
+        self._local = local()  # the group of the request running in an executor thread
+
+    def set_connection(self, connection: ccxt.Exchange):
+        # the limit headers of every response adapt the bucket of the running request
+        on_rest_response = connection.on_rest_response
+
+        def hook(code, reason, url, method, response_headers, *args):
+            self._on_response(response_headers)
+            return on_rest_response(code, reason, url, method, response_headers, *args)
+        connection.on_rest_response = hook
+
+    @staticmethod
+    def get_group(func: Callable) -> str:
+        return RequestScheduler.METHOD_GROUPS.get(getattr(func, '__name__', ''), RequestScheduler.DEFAULT_GROUP)
+
+    def get_queue_size(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    async def run(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        group = RequestScheduler.get_group(func)
+        future = loop.create_future()
+        with self._lock:
+            self._loop = loop
+            heapq.heappush(self._queue, (RequestScheduler.GROUPS.index(group), next(self._counter),
+                                         group, future, func, args))
+        self._dispatch()
+        return await future
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for item in self._queue:
+                item[3].cancel()
+            self._queue.clear()
+        self._executor.shutdown(wait=False)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        with self._lock:
+            deferred = []
+            blocked = set()
+            wait = None
+            while self._queue and self._running < RequestScheduler.MAX_WORKERS:
+                item = heapq.heappop(self._queue)
+                _, _, group, future, func, args = item
+                if future.done():  # cancelled by the caller
+                    continue
+                if group in RequestScheduler.BACKGROUND_GROUPS and \
+                        self._running >= RequestScheduler.MAX_WORKERS - RequestScheduler.RESERVED_WORKERS:
+                    blocked.add(group)
+                delay = 0.0 if group in blocked else self._buckets[group].take(now)
+                if group in blocked or delay > 0:
+                    deferred.append(item)
+                    blocked.add(group)
+                    if delay > 0:
+                        wait = delay if wait is None else min(wait, delay)
+                    continue
+                self._running += 1
+                self._loop.run_in_executor(self._executor, self._call, group, func, args).add_done_callback(
+                    partial(self._on_done, group, future))
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if wait is not None:
+                self._timer = self._loop.call_later(wait, self._dispatch)
+
+    def _call(self, group: str, func: Callable, args: tuple):
+        self._local.group = group
+        try:
+            return func(*args)
+        finally:
+            self._local.group = None
+
+    def _on_done(self, group: str, future: asyncio.Future, result: asyncio.Future):
+        with self._lock:
+            self._running -= 1
+        if result.cancelled():
+            future.cancel()
+            self._dispatch()
+            return
+        e = result.exception()
+        if isinstance(e, ccxt.RateLimitExceeded):
+            with self._lock:
+                self._buckets[group].pause(RequestScheduler.RATE_LIMIT_PAUSE, time.monotonic())
+        if not future.done():
+            if e is not None:
+                future.set_exception(e)
+            else:
+                future.set_result(result.result())
+        self._dispatch()
+
+    def _on_response(self, headers):
+        group = getattr(self._local, 'group', None)
+        remaining = headers.get('X-Bapi-Limit-Status')
+        if group is None or not remaining:  # public endpoints have no limit headers
+            return
+        now = time.monotonic()
+        limit = headers.get('X-Bapi-Limit')
+        reset_timestamp = headers.get('X-Bapi-Limit-Reset-Timestamp')
+        reset_in = max(0.0, int(reset_timestamp) / 1000 - time.time()) if reset_timestamp else 1.0
+        with self._lock:
+            bucket: TokenBucket = self._buckets[group]
+            if limit and int(limit) < bucket.get_rate():  # accounts may have lower limits, never raised above
+                bucket.set_rate(int(limit), now)
+            bucket.limit(int(remaining), reset_in, now)
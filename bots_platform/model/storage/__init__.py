@@ -0,0 +1,4 @@
+from bots_platform.model.storage.candle_store import CandleStore
+from bots_platform.model.storage.candle_cache import CandleCache
+from bots_platform.model.storage.account_store import AccountStore
+from bots_platform.model.storage.market_store import MarketStore
@@ -0,0 +1,123 @@
+from pathlib import Path
+from threading import RLock
+from typing import Union
+import sqlite3
+import json
+import os
+
+
+class AccountStore:
+    FILENAME_PATTERN = 'account_{}.sqlite3'
+
+    def __init__(self, filepath: Union[str, Path, None] = None, *, account: str = ''):
+        if filepath is None:
+            filepath = Path(os.getcwd(), AccountStore.FILENAME_PATTERN.format(account or 'default'))
+        self._filepath = Path(filepath)
+        self._db: Union[sqlite3.Connection, None] = None
+        self._lock: RLock = RLock()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):  # no exception
+        try:
+            with self._lock:
+                if self._db is not None:
+                    self._db.close()
+                self._db = None
+        except:
+            pass
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._filepath.absolute(), check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS records (
+                    kind TEXT NOT NULL,
+                    cursor_key TEXT NOT NULL,
+                    record_id TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    contract TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (kind, cursor_key, record_id)
+                )
+            ''')
+            db.execute('''
+                CREATE INDEX IF NOT EXISTS records_timestamp ON records (kind, timestamp)
+            ''')
+            db.execute('''
+                CREATE INDEX IF NOT EXISTS records_contract ON records (kind, contract, timestamp)
+            ''')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS cursors (
+                    kind TEXT NOT NULL,
+                    cursor_key TEXT NOT NULL,
+                    cursor INTEGER,
+                    backfilled_from INTEGER,
+                    PRIMARY KEY (kind, cursor_key)
+                )
+            ''')
+            db.commit()
+            self._db = db
+        return self._db
+
+    def get_cursor(self, kind: str, cursor_key: str) -> tuple:
+        with self._lock:
+            row = self._connect().execute('''
+                SELECT cursor, backfilled_from FROM cursors WHERE kind = ? AND cursor_key = ?
+            ''', (kind, cursor_key)).fetchone()
+            return tuple(row) if row else (None, None)
+
+    def set_cursor(self, kind: str, cursor_key: str, *,
+                   cursor: Union[int, None] = None,
+                   backfilled_from: Union[int, None] = None):
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute('''
+                    INSERT OR IGNORE INTO cursors (kind, cursor_key) VALUES (?, ?)
+                ''', (kind, cursor_key))
+                if cursor is not None:
+                    db.execute('''
+                        UPDATE cursors SET cursor = MAX(COALESCE(cursor, 0), ?) WHERE kind = ? AND cursor_key = ?
+                    ''', (int(cursor), kind, cursor_key))
+                if backfilled_from is not None:
+                    db.execute('''
+                        UPDATE cursors SET backfilled_from = MIN(COALESCE(backfilled_from, ?), ?)
+                        WHERE kind = ? AND cursor_key = ?
+                    ''', (int(backfilled_from), int(backfilled_from), kind, cursor_key))
+
+    def get_records(self, kind: str, cursor_key: Union[str, None] = None, *,
+                    date_from: Union[int, None] = None,
+                    date_to: Union[int, None] = None,
+                    contract: Union[str, None] = None) -> list:
+        query = 'SELECT data FROM records WHERE kind = ?'
+        parameters = [kind]
+        if cursor_key is not None:
+            query += ' AND cursor_key = ?'
+            parameters.append(cursor_key)
+        if contract is not None:
+            query += ' AND contract = ?'
+            parameters.append(contract)
+        if date_from is not None:
+            query += ' AND timestamp >= ?'
+            parameters.append(int(date_from))
+        if date_to is not None:
+            query += ' AND timestamp <= ?'
+            parameters.append(int(date_to))
+        query += ' ORDER BY timestamp DESC'
+        with self._lock:
+            cursor = self._connect().execute(query, parameters)
+            return [json.loads(x[0]) for x in cursor.fetchall()]
+
+    def put_records(self, kind: str, cursor_key: str, records: list):  # [(record_id, timestamp, contract, data)]
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.executemany('''
+                    INSERT OR REPLACE INTO records (kind, cursor_key, record_id, timestamp, contract, data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', ((kind, cursor_key, str(record_id), int(timestamp), contract, json.dumps(data, default=str))
+                      for record_id, timestamp, contract, data in records))
@@ -0,0 +1,123 @@
+from threading import RLock
+from typing import Union
+
+import numpy as np
+
+from bots_platform.model.utils import OHLCVSeries, TimeStamp
+from bots_platform.model.cache import TTLCache
+from bots_platform.model.storage.candle_store import CandleStore
+
+
+class CandleCacheEntry:
+    MIN_CAPACITY = 64  # candles
+
+    def __init__(self):
+        # the arrays have spare capacity, so a streamed candle is written in place
+        self._timestamps: np.ndarray = np.empty(0, dtype=np.int64)
+        self._values: np.ndarray = np.empty((len(OHLCVSeries.COLUMNS), 0), dtype=np.float64)
+        self._size: int = 0
+        self.coverage: list = list()  # closed candles, never expire
+        self.open_coverage: tuple = tuple()  # (date_from, date_to, expiration timestamp)
+
+    @property
+    def series(self) -> OHLCVSeries:
+        return OHLCVSeries(self._timestamps[:self._size], self._values[:, :self._size])
+
+    def get_size(self) -> int:
+        return self._timestamps.nbytes + self._values.nbytes
+
+    def put_series(self, series: OHLCVSeries):  # a normalized series
+        if not len(series):
+            return
+        size = self._size
+        if size and series.timestamps[0] < self._timestamps[size - 1]:  # an older range is merged
+            merged = OHLCVSeries(np.concatenate([self.series.timestamps, series.timestamps]),
+                                 np.concatenate([self.series.values, series.values], axis=1)).normalized()
+            self._timestamps, self._values, self._size = merged.timestamps, merged.values, len(merged)
+            return
+        start = size - 1 if size and series.timestamps[0] == self._timestamps[size - 1] else size
+        end = start + len(series)
+        if end > len(self._timestamps):
+            capacity = max(end, 2 * len(self._timestamps), CandleCacheEntry.MIN_CAPACITY)
+            timestamps = np.empty(capacity, dtype=np.int64)
+            values = np.empty((len(OHLCVSeries.COLUMNS), capacity), dtype=np.float64)
+            timestamps[:start] = self._timestamps[:start]
+            values[:, :start] = self._values[:, :start]
+            self._timestamps, self._values = timestamps, values
+        self._timestamps[start:end] = series.timestamps
+        self._values[:, start:end] = series.values
+        self._size = end
+
+
+class CandleCache:
+    MEMORY_BUDGET = 128 * 1024 * 1024  # 128 MiB
+    OPEN_CANDLE_TTL = 5  # seconds
+
+    def __init__(self, *, memory_budget: int = MEMORY_BUDGET, open_candle_ttl: float = OPEN_CANDLE_TTL):
+        self._open_candle_ttl = open_candle_ttl
+        # closed candles never expire, the open candle expiration is tracked by the entry itself
+        self._entries: TTLCache = TTLCache('CandleCache', ttl=float('inf'), memory_budget=memory_budget,
+                                           size_func=CandleCacheEntry.get_size)
+        self._lock: RLock = RLock()
+
+    def get_size(self) -> int:
+        return self._entries.get_size()
+
+    def get_metrics(self) -> dict:
+        return self._entries.get_metrics()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_missing_intervals(self, key: tuple, date_from: int, date_to: int) -> list:
+        with self._lock:
+            entry: Union[CandleCacheEntry, None] = self._entries.get_value(key)
+            if entry is None:
+                return [(int(date_from), int(date_to))]
+            intervals = list(entry.coverage)
+            if entry.open_coverage:
+                open_from, open_to, expiration_timestamp = entry.open_coverage
+                if TimeStamp.get_utc_dt_from_now().timestamp() < expiration_timestamp:
+                    intervals.append((open_from, open_to))
+            return CandleStore.subtract_intervals(intervals, date_from, date_to, key[1])
+
+    def get_candles(self, key: tuple, date_from: int, date_to: int) -> list:
+        with self._lock:
+            entry: Union[CandleCacheEntry, None] = self._entries.get_value(key)
+            if entry is None:
+                return []
+            timestamps = entry.series.timestamps
+            start = np.searchsorted(timestamps, date_from, side='left')
+            end = np.searchsorted(timestamps, date_to, side='right')
+            return OHLCVSeries(timestamps[start:end], entry.series.values[:, start:end]).list()
+
+    def put_candles(self, key: tuple, candles: list, *,
+                    covered_from: int,
+                    covered_to: Union[int, None],  # None if only the candles are stored
+                    closed_to: int,
+                    open_candle_ttl: Union[float, None] = None):  # streamed candles stay fresh for longer
+        new_series = OHLCVSeries.from_rows(candles)
+        with self._lock:
+            entry: Union[CandleCacheEntry, None] = self._entries.peek(key)
+            if entry is None:
+                entry = CandleCacheEntry()
+            entry.put_series(new_series)  # in place unless older candles are merged
+            if covered_to is not None and covered_from <= min(covered_to, closed_to):
+                entry.coverage = CandleStore.merge_intervals(entry.coverage +
+                                                             [(int(covered_from), int(min(covered_to, closed_to)))])
+            if covered_to is not None and covered_to > closed_to:
+                if open_candle_ttl is None:
+                    open_candle_ttl = self._open_candle_ttl
+                expiration_timestamp = TimeStamp.get_utc_dt_from_now().timestamp() + open_candle_ttl
+                open_coverage = (int(max(covered_from, closed_to + 1)), int(covered_to))
+                if entry.open_coverage and entry.open_coverage[:2] == open_coverage:  # a streamed candle stays fresh
+                    expiration_timestamp = max(expiration_timestamp, entry.open_coverage[2])
+                entry.open_coverage = (*open_coverage, expiration_timestamp)
+            self._entries.put(key, entry)
+
+    def expire_open_candle(self, key: tuple):
+        with self._lock:
+            entry: Union[CandleCacheEntry, None] = self._entries.peek(key)
+            if entry is not None:
+                entry.open_coverage = tuple()
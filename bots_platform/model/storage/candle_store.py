@@ -0,0 +1,138 @@
+from pathlib import Path
+from threading import RLock
+from typing import Union
+import sqlite3
+import os
+
+from bots_platform.model.utils import TimeStamp
+
+
+class CandleStore:
+    FILENAME = 'candles.sqlite3'
+
+    def __init__(self, filepath: Union[str, Path, None] = None):
+        self._filepath = Path(filepath) if filepath is not None else Path(os.getcwd(), CandleStore.FILENAME)
+        self._db: Union[sqlite3.Connection, None] = None
+        self._lock: RLock = RLock()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):  # no exception
+        try:
+            with self._lock:
+                if self._db is not None:
+                    self._db.close()
+                self._db = None
+        except:
+            pass
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self._filepath.absolute(), check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS candles (
+                    contract TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    price_type TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume REAL NOT NULL,
+                    PRIMARY KEY (contract, timeframe, price_type, timestamp)
+                ) WITHOUT ROWID
+            ''')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS coverage (
+                    contract TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    price_type TEXT NOT NULL,
+                    date_from INTEGER NOT NULL,
+                    date_to INTEGER NOT NULL
+                )
+            ''')
+            db.execute('''
+                CREATE INDEX IF NOT EXISTS coverage_key ON coverage (contract, timeframe, price_type)
+            ''')
+            db.commit()
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _has_candle_open(date_from: int, date_to: int, timeframe: str) -> bool:
+        if date_from > date_to:
+            return False
+        return TimeStamp.ceil_timeframe_timestamp(timeframe, date_from) <= date_to
+
+    def get_candles(self, key: tuple, date_from: int, date_to: int) -> list:
+        with self._lock:
+            cursor = self._connect().execute('''
+                SELECT timestamp, open, high, low, close, volume FROM candles
+                WHERE contract = ? AND timeframe = ? AND price_type = ? AND timestamp BETWEEN ? AND ?
+                ORDER BY timestamp
+            ''', (*key, int(date_from), int(date_to)))
+            return [list(x) for x in cursor.fetchall()]
+
+    def get_coverage(self, key: tuple) -> list:
+        with self._lock:
+            cursor = self._connect().execute('''
+                SELECT date_from, date_to FROM coverage
+                WHERE contract = ? AND timeframe = ? AND price_type = ?
+                ORDER BY date_from
+            ''', key)
+            return [tuple(x) for x in cursor.fetchall()]
+
+    @staticmethod
+    def subtract_intervals(intervals: list, date_from: int, date_to: int, timeframe: str) -> list:
+        missing = []
+        current = int(date_from)
+        for covered_from, covered_to in sorted(intervals):
+            if covered_to < current:
+                continue
+            if covered_from > date_to:
+                break
+            if covered_from > current and CandleStore._has_candle_open(current, covered_from - 1, timeframe):
+                missing.append((current, covered_from - 1))
+            current = max(current, covered_to + 1)
+        if CandleStore._has_candle_open(current, int(date_to), timeframe):
+            missing.append((current, int(date_to)))
+        return missing
+
+    @staticmethod
+    def merge_intervals(intervals: list) -> list:
+        merged = []
+        for interval_from, interval_to in sorted(intervals):
+            if merged and interval_from <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], interval_to)
+            else:
+                merged.append([interval_from, interval_to])
+        return [tuple(x) for x in merged]
+
+    def get_missing_intervals(self, key: tuple, date_from: int, date_to: int) -> list:
+        return CandleStore.subtract_intervals(self.get_coverage(key), date_from, date_to, key[1])
+
+    def put_candles(self, key: tuple, candles: list, *,
+                    covered_from: Union[int, None] = None,
+                    covered_to: Union[int, None] = None):
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.executemany('''
+                    INSERT OR REPLACE INTO candles
+                    (contract, timeframe, price_type, timestamp, open, high, low, close, volume)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', ((*key, int(x[0]), *(float(v or 0) for v in x[1:6])) for x in candles))
+                if covered_from is None or covered_to is None or covered_from > covered_to:
+                    return
+                merged = CandleStore.merge_intervals(self.get_coverage(key) + [(int(covered_from), int(covered_to))])
+                db.execute('''
+                    DELETE FROM coverage WHERE contract = ? AND timeframe = ? AND price_type = ?
+                ''', key)
+                db.executemany('''
+                    INSERT INTO coverage (contract, timeframe, price_type, date_from, date_to)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', ((*key, x[0], x[1]) for x in merged))
@@ -0,0 +1,32 @@
+from pathlib import Path
+from threading import RLock
+from typing import Union
+import json
+import os
+
+
+class MarketStore:
+    FILENAME_PATTERN = 'markets_{}.json'
+
+    def __init__(self, filepath: Union[str, Path, None] = None, *, name: str = ''):
+        if filepath is None:
+            filepath = Path(os.getcwd(), MarketStore.FILENAME_PATTERN.format(name or 'default'))
+        self._filepath = Path(filepath)
+        self._lock: RLock = RLock()
+
+    def load(self) -> Union[dict, None]:  # no exception
+        try:
+            with self._lock:
+                if not self._filepath.exists():
+                    return None
+                with open(self._filepath, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except:
+            return None
+
+    def save(self, snapshot: dict):
+        with self._lock:
+            tmp_filepath = self._filepath.with_suffix('.tmp')
+            with open(tmp_filepath, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp_filepath, self._filepath)
@@ -0,0 +1,4 @@
+from bots_platform.model.streams.stream import WebSocketStream
+from bots_platform.model.streams.ticker_stream import TickerStream
+from bots_platform.model.streams.kline_stream import KlineStream
+from bots_platform.model.streams.private_stream import PrivateStream
@@ -0,0 +1,71 @@
+from typing import Union, Callable
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.streams.stream import WebSocketStream
+
+
+class KlineStream(WebSocketStream):
+    # bybit v5 public klines of one category (spot, linear or inverse),
+    # a topic is subscribed while at least one chart references it
+    URL = 'wss://stream.bybit.com/v5/public/{category}'
+    TOPIC = 'kline.'
+
+    def __init__(self, category: str, url: Union[str, None] = None, *,
+                 http_client: Union[HttpClient, None] = None):
+        super().__init__((url or KlineStream.URL).format(category=category), http_client=http_client)
+        self._category = category
+        self._references: dict = dict()  # topic: number of subscribers
+        self._candle_callback: Union[Callable, None] = None
+        self._disconnected_callback: Union[Callable, None] = None
+
+    def get_category(self) -> str:
+        return self._category
+
+    def set_candle_callback(self, func: Callable):  # func(market id, interval, bybit kline fields)
+        self._candle_callback = func
+
+    def set_disconnected_callback(self, func: Callable):  # func(), streamed candles are stale from now on
+        self._disconnected_callback = func
+
+    @staticmethod
+    def get_topic(market_id: str, interval: str) -> str:
+        return f'{KlineStream.TOPIC}{interval}.{market_id}'
+
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._references)
+
+    async def acquire(self, market_id: str, interval: str):
+        topic = KlineStream.get_topic(market_id, interval)
+        with self._lock:
+            self._references[topic] = self._references.get(topic, 0) + 1
+            is_first = self._references[topic] == 1
+        if is_first:
+            await self.subscribe([topic])
+
+    async def release(self, market_id: str, interval: str):
+        topic = KlineStream.get_topic(market_id, interval)
+        with self._lock:
+            if topic not in self._references:
+                return
+            self._references[topic] -= 1
+            is_last = self._references[topic] == 0
+            if is_last:
+                self._references.pop(topic)
+        if is_last:
+            await self.unsubscribe([topic])
+
+    def _on_message(self, message: dict):
+        topic: str = message.get('topic', '')
+        if not topic.startswith(KlineStream.TOPIC) or self._candle_callback is None:
+            return
+        interval, _, market_id = topic[len(KlineStream.TOPIC):].partition('.')
+        with self._lock:
+            if topic not in self._references:
+                return
+        for x in message.get('data') or []:
+            self._candle_callback(market_id, interval, x)
+
+    def _on_disconnected(self):
+        if self._disconnected_callback is not None:
+            self._disconnected_callback()
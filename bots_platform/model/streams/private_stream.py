@@ -0,0 +1,70 @@
+from typing import Union, Callable
+import traceback
+import hashlib
+import hmac
+import time
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.streams.stream import WebSocketStream
+
+
+class PrivateStream(WebSocketStream):
+    # bybit v5 private topics of one account, authenticated by an HMAC-SHA256 signature of 'GET/realtime{expires}'
+    URL = 'wss://stream.bybit.com/v5/private'
+    DEMO_URL = 'wss://stream-demo.bybit.com/v5/private'
+    TOPICS = ('position', 'order', 'execution', 'wallet')
+    AUTH_EXPIRATION = 10  # seconds
+    AUTH_TIMEOUT = 10  # seconds
+
+    def __init__(self, api_key: str, api_secret: str, url: Union[str, None] = None, *,
+                 http_client: Union[HttpClient, None] = None):
+        super().__init__(url or PrivateStream.URL, http_client=http_client)
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._authenticated = False
+        self._listeners: dict = dict()  # topic: functions
+        self._authenticated_callbacks: list = list()
+        self._topics.update(PrivateStream.TOPICS)
+
+    @staticmethod
+    def get_signature(api_secret: str, expires: int) -> str:
+        return hmac.new(api_secret.encode(), f'GET/realtime{expires}'.encode(), hashlib.sha256).hexdigest()
+
+    def add_listener(self, topic: str, func: Callable):  # func(list of bybit records)
+        with self._lock:
+            self._listeners.setdefault(topic, []).append(func)
+
+    def add_authenticated_callback(self, func: Callable):  # func(), events may have been missed before
+        with self._lock:
+            self._authenticated_callbacks.append(func)
+
+    def is_live(self) -> bool:
+        return self.is_connected() and self._authenticated
+
+    async def _on_connected(self):
+        expires = int((time.time() + PrivateStream.AUTH_EXPIRATION) * 1000)
+        await self._send({'op': 'auth',
+                          'args': [self._api_key, expires, PrivateStream.get_signature(self._api_secret, expires)]})
+        message = await self._ws.receive_json(timeout=PrivateStream.AUTH_TIMEOUT)
+        if not message.get('success'):
+            raise Exception(f"Auth failed ({message.get('ret_msg')})")
+        self._authenticated = True
+        with self._lock:
+            callbacks = list(self._authenticated_callbacks)
+        for func in callbacks:
+            func()
+
+    def _on_disconnected(self):
+        self._authenticated = False
+
+    def _on_message(self, message: dict):
+        topic = message.get('topic', '').split('.')[0]  # the category suffix is optional
+        with self._lock:
+            listeners = list(self._listeners.get(topic, []))
+        for func in listeners:
+            try:
+                func(message.get('data') or [])
+            except BaseException as e:
+                traceback.print_exc()
+                if self._logger is not None:
+                    self._logger.log(f'{type(self).__name__}:', *e.args)
@@ -0,0 +1,136 @@
+from threading import RLock
+from typing import Union
+import traceback
+import asyncio
+import json
+
+import aiohttp
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.logger import Logger
+
+
+class WebSocketStream:
+    # one bybit v5 websocket connection: reconnects with a backoff, sends keep-alive pings
+    # and subscribes the current topics again after every reconnect
+    PING_INTERVAL = 20  # seconds
+    RECONNECT_DELAY = 1  # seconds
+    MAX_RECONNECT_DELAY = 30  # seconds
+    MAX_TOPICS_PER_REQUEST = 10
+
+    def __init__(self, url: str, *, http_client: Union[HttpClient, None] = None):
+        self._url = url
+        self._http_client: HttpClient = http_client if http_client is not None else HttpClient()
+        self._logger: Union[Logger, None] = None
+        self._lock: RLock = RLock()
+        self._topics: set = set()
+        self._task: Union[asyncio.Task, None] = None
+        self._ws: Union[aiohttp.ClientWebSocketResponse, None] = None
+
+    def get_url(self) -> str:
+        return self._url
+
+    def set_url(self, url: str):
+        with self._lock:
+            if url == self._url:
+                return
+            self._url = url
+            ws = self._ws
+        if ws is not None:  # the run loop reconnects to the new url
+            asyncio.ensure_future(ws.close())
+
+    def set_logger(self, logger: Union[Logger, None]):
+        self._logger = logger
+
+    def get_topics(self) -> set:
+        with self._lock:
+            return set(self._topics)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def is_connected(self) -> bool:
+        ws = self._ws
+        return ws is not None and not ws.closed
+
+    def start(self):
+        if not self.is_running():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+
+    async def subscribe(self, topics: Union[list, set, tuple]):
+        with self._lock:
+            topics = set(topics).difference(self._topics)
+            self._topics.update(topics)
+        await self._send_topics('subscribe', topics)
+
+    async def unsubscribe(self, topics: Union[list, set, tuple]):
+        with self._lock:
+            topics = set(topics).intersection(self._topics)
+            self._topics.difference_update(topics)
+        await self._send_topics('unsubscribe', topics)
+
+    async def _send(self, message: dict):
+        ws = self._ws
+        if ws is not None and not ws.closed:
+            await ws.send_str(json.dumps(message))
+
+    async def _send_topics(self, op: str, topics: Union[list, set, tuple]):
+        topics = sorted(topics)
+        for i in range(0, len(topics), WebSocketStream.MAX_TOPICS_PER_REQUEST):
+            await self._send({'op': op, 'args': topics[i:i + WebSocketStream.MAX_TOPICS_PER_REQUEST]})
+
+    async def _ping(self):
+        while True:
+            await asyncio.sleep(WebSocketStream.PING_INTERVAL)
+            await self._send({'op': 'ping'})
+
+    async def _run(self):
+        delay = WebSocketStream.RECONNECT_DELAY
+        while True:
+            ping_task = None
+            try:
+                async with self._http_client.ws_connect(self._url) as ws:
+                    self._ws = ws
+                    await self._on_connected()
+                    await self._send_topics('subscribe', self.get_topics())
+                    delay = WebSocketStream.RECONNECT_DELAY
+                    ping_task = asyncio.ensure_future(self._ping())
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self._handle_message(json.loads(message.data))
+                        elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                traceback.print_exc()
+                if self._logger is not None:
+                    self._logger.log(f'{type(self).__name__}:', *e.args)
+            finally:
+                if ping_task is not None:
+                    ping_task.cancel()
+                self._ws = None
+                self._on_disconnected()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WebSocketStream.MAX_RECONNECT_DELAY)
+
+    def _handle_message(self, message: dict):
+        if 'topic' in message:
+            self._on_message(message)
+        elif message.get('success') is False and self._logger is not None:
+            self._logger.log(f"{type(self).__name__}: {message.get('op')} {message.get('ret_msg')}")
+
+    async def _on_connected(self):
+        pass
+
+    def _on_disconnected(self):
+        pass
+
+    def _on_message(self, message: dict):
+        pass
@@ -0,0 +1,71 @@
+from typing import Union
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.streams.stream import WebSocketStream
+
+
+class TickerStream(WebSocketStream):
+    # bybit v5 public tickers of one category (spot, linear or inverse) merged into an in-memory table,
+    # spot sends snapshots only, derivatives send a snapshot and then the changed fields
+    URL = 'wss://stream.bybit.com/v5/public/{category}'
+    TOPIC = 'tickers.'
+
+    def __init__(self, category: str, url: Union[str, None] = None, *,
+                 http_client: Union[HttpClient, None] = None):
+        super().__init__((url or TickerStream.URL).format(category=category), http_client=http_client)
+        self._category = category
+        self._tickers: dict = dict()  # market id: bybit ticker fields
+        self._changed: set = set()  # market ids changed since the last pop_changes
+
+    def get_category(self) -> str:
+        return self._category
+
+    async def set_market_ids(self, market_ids: Union[list, set, tuple]):
+        topics = {f'{TickerStream.TOPIC}{x}' for x in market_ids}
+        current_topics = self.get_topics()
+        with self._lock:
+            for x in set(self._tickers).difference(market_ids):
+                self._tickers.pop(x)
+                self._changed.discard(x)
+        await self.unsubscribe(current_topics.difference(topics))
+        await self.subscribe(topics.difference(current_topics))
+
+    def is_live(self) -> bool:  # connected and every subscribed market has a ticker
+        if not self.is_connected():
+            return False
+        with self._lock:
+            return all(x[len(TickerStream.TOPIC):] in self._tickers for x in self._topics)
+
+    def seed(self, tickers: dict):  # market id: bybit ticker fields from REST
+        connected = self.is_connected()
+        with self._lock:
+            for market_id, ticker in tickers.items():
+                if not connected or market_id not in self._tickers:
+                    self._tickers[market_id] = dict(ticker)
+                    self._changed.add(market_id)
+
+    def get_ticker(self, market_id: str) -> Union[dict, None]:
+        with self._lock:
+            ticker = self._tickers.get(market_id)
+            return dict(ticker) if ticker is not None else None
+
+    def pop_changes(self) -> set:
+        with self._lock:
+            changed = self._changed
+            self._changed = set()
+            return changed
+
+    def _on_message(self, message: dict):
+        topic: str = message.get('topic', '')
+        if not topic.startswith(TickerStream.TOPIC):
+            return
+        data: dict = message.get('data') or dict()
+        market_id = data.get('symbol') or topic[len(TickerStream.TOPIC):]
+        with self._lock:
+            if f'{TickerStream.TOPIC}{market_id}' not in self._topics:
+                return
+            if message.get('type') == 'snapshot' or market_id not in self._tickers:
+                self._tickers[market_id] = dict(data)
+            else:
+                self._tickers[market_id].update(data)
+            self._changed.add(market_id)
@@ -3,6 +3,9 @@ from decimal import Decimal
 from datetime import datetime, timezone, timedelta
 from math import ceil
 import random
+import json
+
+import numpy as np
 
 
 def decimal_number(number):
@@ -15,6 +18,7 @@ def decimal_number(number):
 
 class TimeStamp:
     UTC_LOCAL_TIME_DIFFERENCE = int(datetime.now().astimezone(None).utcoffset().total_seconds())
+    WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000  # 1970-01-01 is Thursday, weekly candles open on Monday
 
     @staticmethod
     def normalize_timestamp(timestamp):
@@ -104,6 +108,49 @@ class TimeStamp:
             (tf[-1] in 'M' and (365.2425 / 12) or 1)
         return q * s
 
+    @staticmethod
+    def floor_timeframe_timestamp(tf, timestamp):  # utc ms, calendar aware for weeks and months
+        timestamps = np.asarray(timestamp, dtype=np.int64)
+        q, unit = int(tf[:-1]), tf[-1]
+        if unit == 'M':
+            months = timestamps.astype('datetime64[ms]').astype('datetime64[M]').astype(np.int64)
+            months -= months % q
+            r = months.astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+        else:
+            step = int(TimeStamp.convert_timeframe_to_seconds(tf) * 1000)
+            offset = TimeStamp.WEEK_OFFSET_MS if unit == 'w' else 0
+            r = (timestamps - offset) // step * step + offset
+        return r if r.ndim else int(r)
+
+    @staticmethod
+    def shift_timeframe_timestamp(tf, timestamp, periods=1):  # timestamp must open a candle
+        timestamps = np.asarray(timestamp, dtype=np.int64)
+        q, unit = int(tf[:-1]), tf[-1]
+        if unit == 'M':
+            months = timestamps.astype('datetime64[ms]').astype('datetime64[M]').astype(np.int64)
+            r = (months + q * int(periods)).astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+        else:
+            r = timestamps + int(periods) * int(TimeStamp.convert_timeframe_to_seconds(tf) * 1000)
+        return r if r.ndim else int(r)
+
+    @staticmethod
+    def ceil_timeframe_timestamp(tf, timestamp):
+        floor_timestamp = TimeStamp.floor_timeframe_timestamp(tf, timestamp)
+        r = np.where(floor_timestamp < np.asarray(timestamp, dtype=np.int64),
+                     TimeStamp.shift_timeframe_timestamp(tf, floor_timestamp), floor_timestamp)
+        return r if r.ndim else int(r)
+
+    @staticmethod
+    def is_timeframe_divisible(tf, base_tf):  # every tf candle is made of whole base_tf candles
+        if tf == base_tf:
+            return False
+        if base_tf[-1] in 'wM':
+            return tf[-1] == base_tf[-1] and int(tf[:-1]) % int(base_tf[:-1]) == 0
+        base_tf_seconds = TimeStamp.convert_timeframe_to_seconds(base_tf)
+        if tf[-1] in 'wM':
+            return (24 * 60 * 60) % base_tf_seconds == 0
+        return TimeStamp.convert_timeframe_to_seconds(tf) % base_tf_seconds == 0
+
     @staticmethod
     def get_number_of_candles(tf, date_from_timestamp, date_to_timestamp):
         date_from_timestamp = TimeStamp.normalize_timestamp(date_from_timestamp)
@@ -164,95 +211,225 @@ class TimeStamp:
         return date_from_timestamp, date_to_timestamp
 
 
-class ArithOHLCVList:
-    def __init__(self, lst=None):
-        self._list = list() if lst is None else list(lst)
-
-    def __op(self, other, op_func):
-
-        def op(arg1, arg2):
-            try:
-                return op_func(arg1, arg2)
-            except:
-                return 0
-
-        if isinstance(other, ArithOHLCVList):
-            other = other._list
-        if isinstance(other, list):
-            this = self._list
-            r = []
-            s1, s2 = 0, 0
-            while s1 < len(this) and s2 < len(other):
-                if this[s1][0] < other[s2][0]:
-                    s1 += 1
-                elif this[s1][0] > other[s2][0]:
-                    s2 += 1
-                else:
-                    r.append([
-                        this[s1][0],
-                        op(this[s1][1], other[s2][1]),
-                        op(this[s1][2], other[s2][2]),
-                        op(this[s1][3], other[s2][3]),
-                        op(this[s1][4], other[s2][4]),
-                        op(this[s1][5], other[s2][5]),
-                    ])
-                    s1 += 1
-                    s2 += 1
-            return ArithOHLCVList(r)
+class OHLCVSeries:
+    COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+    ZERO_DIVISOR = 1e-9
+
+    def __init__(self, timestamps=None, values=None):
+        if timestamps is None:
+            timestamps = np.empty(0, dtype=np.int64)
+        self._timestamps: np.ndarray = np.asarray(timestamps, dtype=np.int64)
+        if values is None:
+            values = np.zeros((len(OHLCVSeries.COLUMNS), len(self._timestamps)), dtype=np.float64)
+        self._values: np.ndarray = np.asarray(values, dtype=np.float64).reshape(len(OHLCVSeries.COLUMNS), -1)
+
+    @staticmethod
+    def from_rows(rows):
+        rows = [x for x in rows if len(x) > 4]
+        if not rows:
+            return OHLCVSeries()
+        timestamps = np.fromiter((x[0] for x in rows), dtype=np.int64, count=len(rows))
+        values = np.empty((len(OHLCVSeries.COLUMNS), len(rows)), dtype=np.float64)
+        for i in range(4):
+            values[i] = np.fromiter((x[i + 1] for x in rows), dtype=np.float64, count=len(rows))
+        values[4] = np.fromiter((x[5] if len(x) > 5 else 0 for x in rows), dtype=np.float64, count=len(rows))
+        return OHLCVSeries(timestamps, values).normalized()
+
+    @staticmethod
+    def from_data(data: list):
+        return OHLCVSeries.from_rows([[x['timestamp'], x['open'], x['high'], x['low'], x['close'],
+                                       x.get('volume', 0)] for x in data])
+
+    def normalized(self):
+        if len(self._timestamps) < 2 or np.all(self._timestamps[1:] > self._timestamps[:-1]):
+            return self
+        timestamps, indices = np.unique(self._timestamps[::-1], return_index=True)  # keep the last duplicate
+        indices = len(self._timestamps) - 1 - indices
+        return OHLCVSeries(timestamps, self._values[:, indices])
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    def column(self, name: str) -> np.ndarray:
+        return self._values[OHLCVSeries.COLUMNS.index(name)]
+
+    def align(self, other):
+        indices = np.searchsorted(other._timestamps, self._timestamps)
+        indices_clipped = np.minimum(indices, max(len(other._timestamps) - 1, 0))
+        if len(other._timestamps):
+            mask = other._timestamps[indices_clipped] == self._timestamps
+        else:
+            mask = np.zeros(len(self._timestamps), dtype=bool)
+        return self._timestamps[mask], self._values[:, mask], other._values[:, indices_clipped[mask]]
+
+    def _op(self, other, op_func, *, zero_divisor: bool = False, reverse: bool = False):
+        if isinstance(other, OHLCVSeries):
+            timestamps, x, y = self.align(other)
+        elif isinstance(other, list):
+            return self._op(OHLCVSeries.from_rows(other), op_func, zero_divisor=zero_divisor, reverse=reverse)
         else:
-            return ArithOHLCVList([
-                [x[0],  # timestamp
-                 op(x[1], other),  # open
-                 op(x[2], other),  # high
-                 op(x[3], other),  # low
-                 op(x[4], other),  # close
-                 op(x[5], other),  # volume
-                 ] for x in self._list])
+            timestamps, x, y = self._timestamps, self._values, float(other)
+        if reverse:
+            x, y = y, x
+        with np.errstate(all='ignore'):
+            if zero_divisor:
+                y = np.where(y == 0, OHLCVSeries.ZERO_DIVISOR, y)
+            r = op_func(np.asarray(x, dtype=np.float64), y)
+        r = np.where(np.isfinite(r), r, 0.)
+        return OHLCVSeries(timestamps, r)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __neg__(self):
+        return OHLCVSeries(self._timestamps, -self._values)
+
+    def __pos__(self):
+        return self
 
     def __add__(self, other):
-        return self.__op(other, lambda x, y: x + y)
+        return self._op(other, np.add)
 
     def __sub__(self, other):
-        return self.__op(other, lambda x, y: x - y)
+        return self._op(other, np.subtract)
 
     def __mul__(self, other):
-        return self.__op(other, lambda x, y: x * y)
+        return self._op(other, np.multiply)
 
     def __truediv__(self, other):
-        return self.__op(other, lambda x, y: x / (y or decimal_number(1e-9)))
+        return self._op(other, np.true_divide, zero_divisor=True)
 
     def __floordiv__(self, other):
-        return self.__op(other, lambda x, y: x // (y or decimal_number(1e-9)))
+        return self._op(other, np.floor_divide, zero_divisor=True)
 
     def __mod__(self, other):
-        return self.__op(other, lambda x, y: x % (y or decimal_number(1e-9)))
+        return self._op(other, np.mod, zero_divisor=True)
 
     def __pow__(self, other):
-        return self.__op(other, lambda x, y: x ** y)
+        return self._op(other, np.power)
 
     def __radd__(self, other):
-        return self.__op(other, lambda x, y: y + x)
+        return self._op(other, np.add, reverse=True)
 
     def __rsub__(self, other):
-        return self.__op(other, lambda x, y: y - x)
+        return self._op(other, np.subtract, reverse=True)
 
     def __rmul__(self, other):
-        return self.__op(other, lambda x, y: y * x)
+        return self._op(other, np.multiply, reverse=True)
 
     def __rtruediv__(self, other):
-        return self.__op(other, lambda x, y: y / (x or decimal_number(1e-9)))
+        return self._op(other, np.true_divide, zero_divisor=True, reverse=True)
 
     def __rfloordiv__(self, other):
-        return self.__op(other, lambda x, y: y // (x or decimal_number(1e-9)))
+        return self._op(other, np.floor_divide, zero_divisor=True, reverse=True)
 
     def __rmod__(self, other):
-        return self.__op(other, lambda x, y: y % (x or decimal_number(1e-9)))
+        return self._op(other, np.mod, zero_divisor=True, reverse=True)
 
     def __rpow__(self, other):
-        return self.__op(other, lambda x, y: y ** x)
+        return self._op(other, np.power, reverse=True)
+
+    def _map(self, func):
+        with np.errstate(all='ignore'):
+            r = func(self._values)
+        return OHLCVSeries(self._timestamps, np.where(np.isfinite(r), r, 0.))
+
+    def _rolling(self, window: int, func):
+        window = int(window)
+        if window <= 1:
+            return self
+        if window > len(self):
+            return OHLCVSeries()
+        windows = np.lib.stride_tricks.sliding_window_view(self._values, window, axis=1)
+        return OHLCVSeries(self._timestamps[window - 1:], func(windows, axis=-1))
+
+    def __abs__(self):
+        return self._map(np.abs)
+
+    def log(self):
+        return self._map(np.log)
+
+    def exp(self):
+        return self._map(np.exp)
+
+    def sqrt(self):
+        return self._map(np.sqrt)
+
+    def shift(self, periods: int):
+        periods = int(periods)
+        if periods == 0:
+            return self
+        if abs(periods) >= len(self):
+            return OHLCVSeries()
+        if periods > 0:
+            return OHLCVSeries(self._timestamps[periods:], self._values[:, :-periods])
+        return OHLCVSeries(self._timestamps[:periods], self._values[:, -periods:])
+
+    def sma(self, window: int):
+        window = int(window)
+        if window <= 1:
+            return self
+        if window > len(self):
+            return OHLCVSeries()
+        cumsum = np.cumsum(np.pad(self._values, ((0, 0), (1, 0))), axis=1)
+        return OHLCVSeries(self._timestamps[window - 1:], (cumsum[:, window:] - cumsum[:, :-window]) / window)
+
+    def ema(self, window: int):
+        window = int(window)
+        if window <= 1 or not len(self):
+            return self
+        alpha = 2 / (window + 1)
+        w = 1 - alpha
+        block = 256  # w ** -block stays far from float64 overflow for any window > 1
+        r = np.empty_like(self._values)
+        prev = self._values[:, 0]
+        for start in range(0, len(self), block):
+            x = self._values[:, start:start + block]
+            k = np.arange(x.shape[1])
+            acc = np.cumsum(x * w ** -k, axis=1)
+            r[:, start:start + block] = w ** (k + 1) * prev[:, None] + alpha * w ** k * acc
+            prev = r[:, start + x.shape[1] - 1]
+        return OHLCVSeries(self._timestamps, r)
+
+    def rolling_max(self, window: int):
+        return self._rolling(window, np.max)
+
+    def rolling_min(self, window: int):
+        return self._rolling(window, np.min)
+
+    def resample(self, timeframe: str):  # utc timestamps
+        if not len(self):
+            return OHLCVSeries()
+        series = self.normalized()
+        buckets = TimeStamp.floor_timeframe_timestamp(timeframe, series._timestamps)
+        starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        ends = np.concatenate([starts[1:], [len(buckets)]]) - 1
+        open, high, low, close, volume = series._values
+        values = np.vstack([open[starts],
+                            np.maximum.reduceat(high, starts),
+                            np.minimum.reduceat(low, starts),
+                            close[ends],
+                            np.add.reduceat(volume, starts)])
+        return OHLCVSeries(buckets[starts], values)
 
     def list(self):
-        return list(self._list)
+        return [[timestamp, *values] for timestamp, values in zip(self._timestamps.tolist(), self._values.T.tolist())]
+
+    def to_data(self) -> list:
+        return [{
+            'timestamp': timestamp,
+            'open': open,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+        } for timestamp, (open, high, low, close, volume) in zip(self._timestamps.tolist(),
+                                                                  self._values.T.tolist())]
 
 
 quote_coins = frozenset({
@@ -336,6 +513,24 @@ def strip_tags(string: str):
     return result
 
 
+def extract_json_values(text: str, brackets: dict) -> dict:
+    # key: opening bracket of its value, the value is the first bracketed json after the first '"key"'
+    values = dict()
+    decoder = json.JSONDecoder()
+    for key, bracket in brackets.items():
+        p = text.find(f'"{key}"')
+        if p == -1:
+            continue
+        p = text.find(bracket, p + len(key) + 2)
+        if p == -1:
+            continue
+        try:
+            values[key], _ = decoder.raw_decode(text, p)
+        except ValueError:
+            continue
+    return values
+
+
 def format_si_number(number: Union[int, float, Decimal], *,
                      multiple_min: Union[int, float, Decimal, None, ...] = ...,
                      submultiple_max: Union[int, float, Decimal, None, ...] = ...,
@@ -1,21 +1,33 @@
-from typing import Union
+from typing import Union, Dict
 from threading import RLock
-import re
 import traceback
+import asyncio
 
 
-from bots_platform.model.utils import TimeStamp, ArithOHLCVList
+from bots_platform.model.utils import TimeStamp, OHLCVSeries, get_symbol
+from bots_platform.model.chart_expression import ChartExpression
+from bots_platform.model.storage import CandleCache
+from bots_platform.model.streams import KlineStream
 from bots_platform.model.workers import Worker, TradingWorker, MarketsWorker
 
 
 class ChartsWorker(Worker):
+    MAX_CONCURRENT_LEGS = 4
+    KLINE_OPEN_CANDLE_TTL = 60  # seconds, bybit pushes the open candle at least once a minute
+    STREAMED_PRICE_TYPES = ('OHLCV',)  # bybit streams no mark, index or premium index klines
+
     def __init__(self):
         super().__init__()
         self._lock: RLock = RLock()
         self._trading_worker: Union[TradingWorker, None] = None
         self._markets_worker: Union[MarketsWorker, None] = None
-        self.__symbol_pattern = re.compile(r'[A-Z0-9]+?/[A-Z0-9]+(?::[A-Z0-9]+(?:-[0-9]+)?)?|\bRANDOM\b',
-                                           flags=re.IGNORECASE)
+        self._legs_semaphore: asyncio.Semaphore = asyncio.Semaphore(ChartsWorker.MAX_CONCURRENT_LEGS)
+        self._legs_in_flight: Dict[tuple, asyncio.Future] = dict()
+        self._candle_cache: Union[CandleCache, None] = None
+        self._kline_streams: dict = dict()  # category: KlineStream
+        self._kline_stream_url: str = KlineStream.URL
+        self._watched_charts: dict = dict()  # chart id: set of (category, market id, interval, contract, timeframe)
+        self._candle_versions: dict = dict()  # (contract, timeframe, price type): number of streamed candles
 
     def set_trading_worker(self, trading_worker: TradingWorker):
         self._trading_worker = trading_worker
@@ -23,7 +35,121 @@ class ChartsWorker(Worker):
     def set_markets_worker(self, markets_worker: MarketsWorker):
         self._markets_worker = markets_worker
 
-    async def fetch_exchange_contracts(self, *, number_of_seconds_to_update: int = 60):
+    def set_candle_cache(self, candle_cache: CandleCache):
+        self._candle_cache = candle_cache
+
+    def set_kline_stream_url(self, url: str):  # '{category}' is replaced by spot, linear or inverse
+        self._kline_stream_url = url
+        with self._lock:
+            for category, kline_stream in self._kline_streams.items():
+                kline_stream.set_url(url.format(category=category))
+
+    def detach(self):
+        with self._lock:
+            kline_streams = list(self._kline_streams.values())
+            self._kline_streams.clear()
+            self._watched_charts.clear()
+        for x in kline_streams:
+            x.stop()
+        super().detach()
+
+    def _get_kline_stream(self, category: str) -> KlineStream:
+        with self._lock:
+            if category not in self._kline_streams:
+                kline_stream = KlineStream(category, self._kline_stream_url, http_client=self._get_http_client())
+                kline_stream.set_logger(self._logger)
+                kline_stream.set_candle_callback(
+                    lambda market_id, interval, kline: self._on_candle(category, market_id, interval, kline))
+                kline_stream.set_disconnected_callback(lambda: self._on_kline_stream_disconnected(category))
+                self._kline_streams[category] = kline_stream
+            kline_stream = self._kline_streams[category]
+        kline_stream.start()
+        return kline_stream
+
+    def _get_streamed_leg(self, category: str, market_id: str, interval: str) -> Union[tuple, None]:
+        with self._lock:
+            for legs in self._watched_charts.values():
+                for leg in legs:
+                    if leg[:3] == (category, market_id, interval):
+                        return leg
+        return None
+
+    def _on_candle(self, category: str, market_id: str, interval: str, kline: dict):
+        leg = self._get_streamed_leg(category, market_id, interval)
+        if leg is None or self._candle_cache is None:
+            return
+        key = (leg[3], leg[4], ChartsWorker.STREAMED_PRICE_TYPES[0])
+        start, end = int(kline['start']), int(kline['end'])
+        candle = [start, *(float(kline[x]) for x in ('open', 'high', 'low', 'close', 'volume'))]
+        self._candle_cache.put_candles(key, [candle],
+                                       covered_from=start,
+                                       covered_to=end,
+                                       closed_to=end if kline.get('confirm') else start - 1,
+                                       open_candle_ttl=ChartsWorker.KLINE_OPEN_CANDLE_TTL)
+        with self._lock:
+            self._candle_versions[key] = self._candle_versions.get(key, 0) + 1
+
+    def _on_kline_stream_disconnected(self, category: str):  # REST refreshes the open candles meanwhile
+        if self._candle_cache is None:
+            return
+        with self._lock:
+            keys = set((x[3], x[4], ChartsWorker.STREAMED_PRICE_TYPES[0])
+                       for legs in self._watched_charts.values() for x in legs if x[0] == category)
+        for key in keys:
+            self._candle_cache.expire_open_candle(key)
+
+    async def watch_chart(self, chart_id, *, contract: str, timeframe: str, price_type: str):
+        # streams the candles of a visible chart, the legs of a chart expression are streamed separately
+        legs = set()
+        try:
+            self.check()
+            interval = self._connection.timeframes.get(timeframe)
+            if interval and price_type in ChartsWorker.STREAMED_PRICE_TYPES and contract.lower() != 'random':
+                for symbol in ChartExpression.compile(contract).symbols:
+                    market_id = self._markets_worker.get_market_id(symbol)
+                    symbol_tuple = get_symbol(symbol)
+                    if market_id and symbol_tuple:
+                        legs.add((symbol_tuple[2], market_id, interval, symbol, timeframe))
+        except BaseException as e:
+            traceback.print_exc()
+            self._logger.log(*e.args)
+        await self._set_chart_legs(chart_id, legs)
+
+    async def unwatch_chart(self, chart_id):
+        await self._set_chart_legs(chart_id, set())
+
+    async def unwatch_charts(self):
+        with self._lock:
+            chart_ids = list(self._watched_charts)
+        for chart_id in chart_ids:
+            await self.unwatch_chart(chart_id)
+
+    async def _set_chart_legs(self, chart_id, legs: set):
+        with self._lock:
+            old_legs = self._watched_charts.pop(chart_id, set())
+            if legs:
+                self._watched_charts[chart_id] = legs
+        for category, market_id, interval, *_ in legs.difference(old_legs):
+            await self._get_kline_stream(category).acquire(market_id, interval)
+        for leg in old_legs.difference(legs):
+            category, market_id, interval, contract, timeframe = leg
+            with self._lock:
+                kline_stream = self._kline_streams.get(category)
+            if kline_stream is not None:
+                await kline_stream.release(market_id, interval)
+            if self._get_streamed_leg(category, market_id, interval) is None and self._candle_cache is not None:
+                self._candle_cache.expire_open_candle((contract, timeframe, ChartsWorker.STREAMED_PRICE_TYPES[0]))
+
+    def get_chart_version(self, chart_id) -> int:  # changes when a streamed candle of the chart changes
+        with self._lock:
+            return sum(self._candle_versions.get((x[3], x[4], ChartsWorker.STREAMED_PRICE_TYPES[0]), 0)
+                       for x in self._watched_charts.get(chart_id, set()))
+
+    def is_chart_streamed(self, chart_id) -> bool:
+        with self._lock:
+            return chart_id in self._watched_charts
+
+    async def fetch_exchange_contracts(self, *, number_of_seconds_to_update: Union[int, None] = None):
         await self._markets_worker.fetch_exchange_contracts(
             number_of_seconds_to_update=number_of_seconds_to_update
         )
@@ -44,61 +170,133 @@ class ChartsWorker(Worker):
                                 timeframe: str,
                                 price_type,
                                 data: list):
-        expression = contract.upper()
-        symbols = self.__symbol_pattern.findall(expression)
-        symbols.sort(key=lambda x: len(x), reverse=True)
-        trans = {
-            '/': '_', ':': '_', '-': '_',
-            '0': '_0', '1': '_1', '2': '_2',
-            '3': '_3', '4': '_4', '5': '_5',
-            '6': '_6', '7': '_7', '8': '_8', '9': '_9',
-        }
-        trans = str.maketrans(trans)
-        locals_dict = dict()
-        for symbol in symbols:
-            ts = data[-1]['timestamp'] if data else 0
-            tmp_ohlc_data = [[ts] for x in range(len(data))]
-            tmp_volume_data = [[ts] for x in range(len(data))]
-            try:
-                chart_data = await self._aux_update_chart_data(
-                    contract=symbol,
-                    date_from=date_from,
-                    date_to=date_to,
-                    timeframe=timeframe,
-                    price_type=price_type,
-                    ohlc_data=tmp_ohlc_data,
-                    volume_data=tmp_volume_data
-                )
-            except:
-                traceback.print_exc()
+        expression = ChartExpression.compile(contract)
+        lookback = expression.lookback
+        if lookback is None or len(data) <= lookback:  # e.g. ema depends on every previous candle
+            data = []
+        # the legs are fetched from the first candle the last value depends on, only the tail is evaluated
+        symbols = expression.symbols
+        results = await asyncio.gather(*(self._fetch_leg(
+            contract=symbol,
+            date_from=date_from,
+            date_to=date_to,
+            timeframe=timeframe,
+            price_type=price_type,
+            since=data[-lookback - 1]['timestamp'] if data else None,
+            refresh_from=data[-1]['timestamp'] if data else None
+        ) for symbol in symbols), return_exceptions=True)
+        series = dict()
+        real_dates_from = []
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, BaseException):
+                traceback.print_exception(result)
                 continue
-            date_from = chart_data['date_from']
-            ohlcv = []
-            for ohlc, volume in zip(chart_data['ohlc'], chart_data['volume']):
-                if len(ohlc) > 1 and len(volume) > 1:
-                    ohlcv.append([*ohlc, volume[-1]])
-            variable = symbol.translate(trans)
-            expression = expression.replace(symbol, variable)
-            locals_dict[variable] = ArithOHLCVList(ohlcv)
-        r = eval(expression, {}, locals_dict).list()
-        first_ts = r and r[0] and r[0][0] or 0
+            real_dates_from.append(result['date_from'])
+            series[symbol] = result['series']
+        if real_dates_from:
+            date_from = max(real_dates_from)
+        r = expression.evaluate(series)
+        first_ts = int(r.timestamps[0]) if len(r) else 0
         for i in range(len(data)):
             if data[i]['timestamp'] == first_ts:
                 data = data[:i]
                 break
-        data.extend({
-            'timestamp': x[0],
-            'open': x[1],
-            'high': x[2],
-            'low': x[3],
-            'close': x[4],
-            'volume': x[5] if len(x) >= 6 else 0,
-        } for x in r)
+        data.extend(r.to_data())
         return {
             'date_from': date_from,
             'data': data
         }
 
+    async def _fetch_leg(self, *,
+                         contract: str,
+                         date_from: int,
+                         date_to: int,
+                         timeframe: str,
+                         price_type,
+                         since: Union[int, None],  # the first candle the chart needs, None to load the range
+                         refresh_from: Union[int, None]) -> dict:  # the last candle of the chart
+        # the charts of a leg share one refresh of its last candles, each chart reads its own tail from the cache
+        range_from = date_from if refresh_from is None else refresh_from
+        key = (contract, timeframe, price_type, range_from, date_to)
+        future = self._legs_in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._aux_fetch_leg(contract=contract,
+                                                               date_from=range_from,
+                                                               date_to=date_to,
+                                                               timeframe=timeframe,
+                                                               price_type=price_type,
+                                                               is_tail=refresh_from is not None))
+            self._legs_in_flight[key] = future
+            future.add_done_callback(lambda *_: self._legs_in_flight.pop(key, None))
+        result = await asyncio.shield(future)
+        if refresh_from is None:
+            return result
+        series = result['series']
+        if since < refresh_from:
+            older_candles = self._get_cached_leg_candles(contract=contract,
+                                                         timeframe=timeframe,
+                                                         price_type=price_type,
+                                                         date_from=since,
+                                                         date_to=refresh_from - 1)
+            if older_candles is None:  # e.g. a derived timeframe, the tail is fetched for this chart alone
+                result = await self._aux_fetch_leg(contract=contract,
+                                                   date_from=since,
+                                                   date_to=date_to,
+                                                   timeframe=timeframe,
+                                                   price_type=price_type,
+                                                   is_tail=True)
+                series = result['series']
+            else:
+                series = OHLCVSeries.from_rows(older_candles + series.list())
+        return {
+            'date_from': date_from,
+            'series': series
+        }
+
+    def _get_cached_leg_candles(self, *,
+                                contract: str,
+                                timeframe: str,
+                                price_type,
+                                date_from: int,
+                                date_to: int) -> Union[list, None]:
+        if self._candle_cache is None:
+            return None
+        candles = self._candle_cache.get_candles((contract, timeframe, price_type),
+                                                 TimeStamp.convert_local_to_utc_timestamp(date_from),
+                                                 TimeStamp.convert_local_to_utc_timestamp(date_to))
+        if not candles or TimeStamp.convert_utc_to_local_timestamp(candles[0][0]) != date_from:
+            return None
+        for x in candles:
+            x[0] = TimeStamp.convert_utc_to_local_timestamp(x[0])
+        return candles
+
+    async def _aux_fetch_leg(self, *,
+                             contract: str,
+                             date_from: int,
+                             date_to: int,
+                             timeframe: str,
+                             price_type,
+                             is_tail: bool) -> dict:
+        # a tail starts at its first candle, a placeholder row makes the trading worker fetch from there
+        async with self._legs_semaphore:
+            chart_data = await self._aux_update_chart_data(
+                contract=contract,
+                date_from=date_from,
+                date_to=date_to,
+                timeframe=timeframe,
+                price_type=price_type,
+                ohlc_data=[[date_from]] if is_tail else [],
+                volume_data=[[date_from]] if is_tail else []
+            )
+        ohlcv = []
+        for ohlc, volume in zip(chart_data['ohlc'], chart_data['volume']):
+            if len(ohlc) > 1 and len(volume) > 1:
+                ohlcv.append([*ohlc, volume[-1]])
+        return {
+            'date_from': chart_data['date_from'],
+            'series': OHLCVSeries.from_rows(ohlcv)
+        }
+
     async def _aux_update_chart_data(self,
                                      contract: str,
                                      date_from: int,
@@ -3,46 +3,52 @@ from threading import RLock
 from collections import defaultdict
 from decimal import Decimal
 import traceback
-import json
+import asyncio
 import re
 
-from bots_platform.model.utils import TimeStamp, decimal_number, format_si_number, get_symbol
+from bots_platform.model.utils import (TimeStamp, decimal_number, format_si_number, get_symbol,
+                                       extract_json_values)
+from bots_platform.model.storage import MarketStore
+from bots_platform.model.streams import TickerStream
 from bots_platform.model.workers import Worker
 import ccxt
 
 
 class MarketsWorker(Worker):
+    GLOBAL_MARKET = 'global_market'
+    EXCHANGE_MARKET = 'exchange_market'
+    CONTRACTS = 'contracts'
+    MARKET_METADATA = 'market_metadata'
+    MARKET_TTL = 5 * 60  # seconds
+    MARKET_STALE_TTL = 10 * 60  # seconds
+    MARKET_METADATA_TTL = 12 * 60 * 60  # seconds
+    MARKET_METADATA_STALE_TTL = 7 * 24 * 60 * 60  # seconds, refreshed in the background meanwhile
+    MARKET_METADATA_VERSION = 2  # older snapshots on disk are fetched again
+    STREAM_MARKET_TTL = 1  # seconds, rows are rebuilt from the ticker streams
+    TICKER_CATEGORIES = ('spot', 'swap_linear', 'swap_inverse', 'future_linear', 'future_inverse')
+    TICKER_ENDPOINTS = {  # bybit returns swaps and futures of one settle type from the same endpoint
+        'spot': {'type': 'spot'},
+        'linear': {'type': 'swap', 'subType': 'linear'},
+        'inverse': {'type': 'swap', 'subType': 'inverse'},
+    }
+
     def __init__(self):
         super().__init__()
-        self._global_market_lock: RLock = RLock()
-        self._global_market_cache: dict = dict()
-        self._global_market_cache_ts: float = 0.
-        self._exchange_market_lock: RLock = RLock()
-        self._exchange_market_cache: list = list()
-        self._exchange_market_cache_ts: float = 0.
-        self._contracts_lock: RLock = RLock()
-        self._contracts_cache: set = set()
-        self._contracts_cache_ts: float = 0.
+        self._market_store: Union[MarketStore, None] = None
+        self._bad_symbols_lock: RLock = RLock()
+        self._bad_symbols: set = set()  # listed in the metadata, missing from the tickers
+        self._ticker_streams_lock: RLock = RLock()
+        self._ticker_streams: dict = dict()  # endpoint: TickerStream
+        self._ticker_stream_url: str = TickerStream.URL
+        self._market_rows: dict = dict()  # symbol: exchange market row
+        for key in (MarketsWorker.GLOBAL_MARKET, MarketsWorker.EXCHANGE_MARKET):
+            self._cache.set_ttl(key, ttl=MarketsWorker.MARKET_TTL, stale_ttl=MarketsWorker.MARKET_STALE_TTL)
+        self._cache.set_ttl(MarketsWorker.MARKET_METADATA, ttl=MarketsWorker.MARKET_METADATA_TTL,
+                            stale_ttl=MarketsWorker.MARKET_METADATA_STALE_TTL)
         self.__alt_coin_index_regex = re.compile(r'>\s*?(\d+?)\s*?<')
 
     async def force_update_global_market_info(self, *, only_reset=False):
 
-        def parse_json_line(string: str, *, is_array: bool = False) -> str:
-            b_start = '{['[is_array]
-            b_end = '}]'[is_array]
-            depth = 0
-            json_line = ''
-            for x in string:
-                if depth > 0 or x == b_start and depth == 0:
-                    json_line += x
-                if x == b_start:
-                    depth += 1
-                elif x == b_end:
-                    depth -= 1
-                    if depth == 0:
-                        break
-            return json_line
-
         def Fn(number: Union[int, float, Decimal]) -> str:  # number
             number = float(number)
             number, prefix = format_si_number(number, multiple_min=1_000_000, submultiple_max=None)
@@ -73,28 +79,36 @@ class MarketsWorker(Worker):
         statistics: defaultdict = defaultdict(str)
         try:
             if only_reset:
-                with self._global_market_lock:
-                    self._global_market_cache_ts = 0
+                self._cache.invalidate(MarketsWorker.GLOBAL_MARKET)
                 return
-            text = ''
+            main_statistics_url = 'https://coinmarketcap.com/charts/'
+            alt_coin_index_url = 'https://www.blockchaincenter.net/en/altcoin-season-index/'
+            texts = await asyncio.gather(self._load_text(main_statistics_url, headers),
+                                         self._load_text(alt_coin_index_url, headers),
+                                         return_exceptions=True)
+            main_statistics_text, alt_coin_index_text = [x if isinstance(x, str) else '' for x in texts]
+            json_values = extract_json_values(main_statistics_text, {
+                'topCryptos': '[',
+                'globalMetrics': '{',
+                'fearGreedIndexData': '{'
+            })
+
+            def get_json_value(key: str):
+                if key not in json_values:
+                    raise Exception(f'There is no "{key}" at {main_statistics_url}')
+                return json_values[key]
+
             try:
-                main_statistics_url = 'https://coinmarketcap.com/charts/'
-                text = await self._load_text(main_statistics_url, headers)
-                start_text = '"topCryptos"'
-                p = text.find(start_text)
-                p_text = text[p + len(start_text):]
                 data = [x['symbol']
-                        for x in json.loads(parse_json_line(p_text, is_array=True))
+                        for x in get_json_value('topCryptos')
                         if not x['symbol'].lower().startswith('other')]
                 statistics['top_cryptos'] = data
-            except:
-                pass
+            except BaseException as e:
+                traceback.print_exc()
+                self._logger.log(*e.args)
 
             try:
-                start_text = '"globalMetrics"'
-                p = text.find(start_text)
-                p_text = text[p + len(start_text):]
-                data = json.loads(parse_json_line(p_text))
+                data = get_json_value('globalMetrics')
                 statistics.update({
                     'cryptocurrencies': data.get('numCryptocurrencies', 0),
                     'markets': data.get('numMarkets', 0),
@@ -114,21 +128,18 @@ class MarketsWorker(Worker):
                     'btc_dominance_24h_change': data.get('btcDominanceChange', 0.),  # percents
                     'eth_dominance': data.get('ethDominance', 0.),  # percents
                 })
-                start_text = '"fearGreedIndexData"'
-                p = text.find(start_text)
-                p_text = text[p + len(start_text):]
-                data = json.loads(parse_json_line(p_text))
+                data = get_json_value('fearGreedIndexData')
                 statistics.update({
                     'fear_greed_index_value': data.get('currentIndex', dict()).get('score', 0.),
                     'fear_greed_index_name': data.get('currentIndex', dict()).get('name', 0.),
                     'fear_greed_index_date': data.get('currentIndex', dict()).get('updateTime', 0.)[:10],
                 })
-            except:
-                pass
+            except BaseException as e:
+                traceback.print_exc()
+                self._logger.log(*e.args)
 
             try:
-                alt_coin_index_url = 'https://www.blockchaincenter.net/en/altcoin-season-index/'
-                text = await self._load_text(alt_coin_index_url, headers)
+                text = alt_coin_index_text
                 p = text.find('tab-content altseasoncontent')
                 text = text[p:]
                 t1 = self.__alt_coin_index_regex.search(text)
@@ -182,173 +193,160 @@ class MarketsWorker(Worker):
                 'alt_coin_index_fstring': alt_coin_index_fstring,
                 'top_cryptos_fstring': top_cryptos_fstring,
             })
-            with self._global_market_lock:
-                self._global_market_cache = dict(statistics)
-                self._global_market_cache_ts = datetime_timestamp
+            self._cache.put(MarketsWorker.GLOBAL_MARKET, dict(statistics))
         except BaseException as e:
             traceback.print_exc()
             self._logger.log(*e.args)
             raise
 
+    @staticmethod
+    def _get_market_row(symbol: str, ticker: dict, symbol_info: Union[dict, None]) -> dict:
+        # ticker holds the raw bybit fields, the same for REST and the ticker streams
+        symbol_tuple = get_symbol(symbol)
+        close_price_24h = decimal_number(ticker.get('lastPrice') or 0)
+        open_price_24h = decimal_number(ticker.get('prevPrice24h') or 0)
+        high_price_24h = decimal_number(ticker.get('highPrice24h') or 0)
+        low_price_24h = decimal_number(ticker.get('lowPrice24h') or 0)
+        open_close_percent = round((close_price_24h / open_price_24h - 1) * 100, 6)
+        low_high_percent = round((high_price_24h / low_price_24h - 1) * 100, 6)
+        volume_24h = decimal_number(ticker.get('turnover24h') or 0)
+        base_volume_24h, quote_volume_24h = ticker.get('volume24h'), ticker.get('turnover24h')
+        if symbol_tuple[2] == 'inverse':
+            base_volume_24h, quote_volume_24h = quote_volume_24h, base_volume_24h
+        base_volume_24h = decimal_number(base_volume_24h or 0)
+        quote_volume_24h = decimal_number(quote_volume_24h or 0)
+        vwap = quote_volume_24h / base_volume_24h if base_volume_24h and quote_volume_24h else close_price_24h
+        last_trend = round((close_price_24h / vwap - 1) * 100, 6)
+        launch_timestamp = 0
+        min_leverage = decimal_number(0)
+        max_leverage = decimal_number(0)
+        min_qty = decimal_number(0)
+        min_notional = decimal_number(0)
+        maker = decimal_number(0)
+        taker = decimal_number(0)
+        if symbol_info is not None:
+            launch_timestamp = int(symbol_info['launch_timestamp'])
+            min_leverage = decimal_number(symbol_info['min_leverage'])
+            max_leverage = decimal_number(symbol_info['max_leverage'])
+            min_qty = decimal_number(symbol_info['min_qty'])
+            min_notional = decimal_number(symbol_info['min_notional'])
+            maker = decimal_number(symbol_info['maker'])
+            taker = decimal_number(symbol_info['taker'])
+        launch_datetime = ''
+        if launch_timestamp:
+            launch_datetime = TimeStamp.format_datetime(
+                TimeStamp.get_local_dt_from_timestamp(launch_timestamp))
+        leverage = ''
+        if min_leverage and max_leverage:
+            leverage = f'{min_leverage}-{max_leverage}'
+        min_size = ''
+        if min_qty and min_notional:
+            min_size = f'{min_qty} {symbol_tuple[0]}/{min_notional} {symbol_tuple[1]}'
+        maker_taker = ''
+        if maker and taker:
+            maker_taker = f'{maker}/{taker}'
+        volume_24h_fstring = '{0:.2f}{1}'.format(*format_si_number(volume_24h,
+                                                                   multiple_min=1000,
+                                                                   submultiple_max=None))
+        return {
+            'type': symbol_tuple[2],
+            'symbol': symbol,
+            'last_trend': last_trend,
+            'open_price_24h': open_price_24h,
+            'high_price_24h': high_price_24h,
+            'low_price_24h': low_price_24h,
+            'close_price_24h': close_price_24h,
+            'open_close_percent': open_close_percent,
+            'low_high_percent': low_high_percent,
+            'volume_24h_fstring': volume_24h_fstring,
+            'volume_24h': volume_24h,
+            'launch_timestamp': launch_timestamp,
+            'launch_datetime': launch_datetime,
+            'min_leverage': min_leverage,
+            'max_leverage': max_leverage,
+            'leverage': leverage,
+            'min_qty': min_qty,
+            'min_notional': min_notional,
+            'min_size': min_size,
+            'maker': maker,
+            'taker': taker,
+            'maker_taker': maker_taker,
+        }
+
+    def _get_ticker_stream(self, endpoint: str) -> TickerStream:
+        with self._ticker_streams_lock:
+            if endpoint not in self._ticker_streams:
+                ticker_stream = TickerStream(endpoint, self._ticker_stream_url, http_client=self._get_http_client())
+                ticker_stream.set_logger(self._logger)
+                self._ticker_streams[endpoint] = ticker_stream
+            ticker_stream = self._ticker_streams[endpoint]
+        ticker_stream.start()
+        return ticker_stream
+
+    def _is_streaming(self) -> bool:
+        with self._ticker_streams_lock:
+            ticker_streams = list(self._ticker_streams.values())
+        return bool(ticker_streams) and all(x.is_live() for x in ticker_streams)
+
+    def _stop_ticker_streams(self):
+        with self._ticker_streams_lock:
+            ticker_streams = list(self._ticker_streams.values())
+            self._ticker_streams.clear()
+        for x in ticker_streams:
+            x.stop()
+
     async def force_update_exchange_market_info(self, *, only_reset=False):
 
-        async def fetch_tickers(source_symbols: Union[list, set, tuple]) -> tuple[dict, set]:
-            source_symbols = set(source_symbols)
-            while True:
-                try:
-                    tickers = await self._async_run(self._connection.fetch_tickers, list(source_symbols))
-                    break
-                except ccxt.BadSymbol as e:
-                    s = f'{e}'
-                    p = 'market symbol'
-                    if p in s:
-                        source_symbols.discard(s[s.rfind(p) + len(p):].strip())
-            return tickers, source_symbols
+        async def fetch_tickers(endpoint: str, source_symbols: dict) -> dict:
+            # one request returns the whole category, symbols are filtered here
+            # so an unknown or delisted symbol never fails or repeats the request
+            tickers = await self._request(self._connection.fetch_tickers, None,
+                                          dict(MarketsWorker.TICKER_ENDPOINTS[endpoint]))
+            missing_symbols = set(source_symbols.values()).difference(tickers)
+            if missing_symbols:
+                with self._bad_symbols_lock:
+                    self._bad_symbols.update(missing_symbols)
+            return {k: tickers[v]['info'] for k, v in source_symbols.items() if v in tickers}
 
         self.check()
-        markets_data = []
         try:
             if only_reset:
-                with self._exchange_market_lock:
-                    self._exchange_market_cache_ts = 0
+                self._cache.invalidate(MarketsWorker.EXCHANGE_MARKET)
                 return
-            contracts = set()
-            spot_source_symbols = set()
-            swap_linear_source_symbols = set()
-            swap_inverse_source_symbols = set()
-            future_linear_source_symbols = set()
-            future_inverse_source_symbols = set()
-            markets = await self._async_run(self._connection.fetch_markets)
-            markets_info: dict = dict()
-            for x in markets:
-                if x['active'] and not x['option'] and (x['spot'] or x['linear'] or x['inverse']):
-                    source_symbol = x['symbol']
-                    contracts.add(source_symbol)
-                    if x['type'] == 'spot':
-                        spot_source_symbols.add(source_symbol)
-                    elif x['type'] == 'swap' and x['linear']:
-                        swap_linear_source_symbols.add(source_symbol)
-                    elif x['type'] == 'swap' and x['inverse']:
-                        swap_inverse_source_symbols.add(source_symbol)
-                    elif x['type'] == 'future' and x['linear']:
-                        future_linear_source_symbols.add(source_symbol)
-                    elif x['type'] == 'future' and x['inverse']:
-                        future_inverse_source_symbols.add(source_symbol)
-                    launch_timestamp = int(x['info'].get('launchTime', 0) or 0)
-                    min_leverage = decimal_number(
-                        x['info'].get('leverageFilter', dict()).get('minLeverage', 0) or 0)
-                    max_leverage = decimal_number(
-                        x['info'].get('leverageFilter', dict()).get('maxLeverage', 0) or 0)
-                    min_qty = decimal_number(x['info'].get('lotSizeFilter', dict()).get('minOrderQty', 0) or 0)
-                    min_notional = decimal_number(
-                        x['info'].get('lotSizeFilter', dict()).get('minNotionalValue', 0) or 0)
-                    maker = decimal_number(str(x.get('maker', 0)) or 0)
-                    taker = decimal_number(str(x.get('taker', 0)) or 0)
-                    markets_info[source_symbol] = {
-                        'launch_timestamp': launch_timestamp,
-                        'min_leverage': min_leverage,
-                        'max_leverage': max_leverage,
-                        'min_qty': min_qty,
-                        'min_notional': min_notional,
-                        'maker': maker,
-                        'taker': taker,
-                    }
-            if spot_source_symbols or swap_linear_source_symbols or swap_inverse_source_symbols or \
-                    future_linear_source_symbols or future_inverse_source_symbols:
-                tickers = dict()
-                if spot_source_symbols:
-                    tickers, spot_source_symbols = await fetch_tickers(
-                        spot_source_symbols)
-                if swap_linear_source_symbols:
-                    tmp_tickers, swap_linear_source_symbols = await fetch_tickers(
-                        swap_linear_source_symbols)
-                    tickers.update(tmp_tickers)
-                if swap_inverse_source_symbols:
-                    tmp_tickers, swap_inverse_source_symbols = await fetch_tickers(
-                        swap_inverse_source_symbols)
-                    tickers.update(tmp_tickers)
-                if future_linear_source_symbols:
-                    tmp_tickers, future_linear_source_symbols = await fetch_tickers(
-                        future_linear_source_symbols)
-                    tickers.update(tmp_tickers)
-                if future_inverse_source_symbols:
-                    tmp_tickers, future_inverse_source_symbols = await fetch_tickers(
-                        future_inverse_source_symbols)
-                    tickers.update(tmp_tickers)
-                for symbol, ticker in tickers.items():
-                    symbol_tuple = get_symbol(symbol)
-                    close_price_24h = decimal_number(ticker['info'].get('lastPrice') or 0)
-                    open_price_24h = decimal_number(ticker['info'].get('prevPrice24h') or 0)
-                    high_price_24h = decimal_number(ticker['info'].get('highPrice24h') or 0)
-                    low_price_24h = decimal_number(ticker['info'].get('lowPrice24h') or 0)
-                    open_close_percent = round((close_price_24h / open_price_24h - 1) * 100, 6)
-                    low_high_percent = round((high_price_24h / low_price_24h - 1) * 100, 6)
-                    volume_24h = decimal_number(ticker['info'].get('turnover24h') or 0)
-                    vwap = decimal_number(ticker.get('vwap', 0) or close_price_24h)
-                    last_trend = round((close_price_24h / vwap - 1) * 100, 6)
-                    launch_timestamp = 0
-                    min_leverage = decimal_number(0)
-                    max_leverage = decimal_number(0)
-                    min_qty = decimal_number(0)
-                    min_notional = decimal_number(0)
-                    maker = decimal_number(0)
-                    taker = decimal_number(0)
-                    if symbol in markets_info:
-                        symbol_info = markets_info[symbol]
-                        launch_timestamp = int(symbol_info['launch_timestamp'])
-                        min_leverage = decimal_number(symbol_info['min_leverage'])
-                        max_leverage = decimal_number(symbol_info['max_leverage'])
-                        min_qty = decimal_number(symbol_info['min_qty'])
-                        min_notional = decimal_number(symbol_info['min_notional'])
-                        maker = decimal_number(symbol_info['maker'])
-                        taker = decimal_number(symbol_info['taker'])
-                    launch_datetime = ''
-                    if launch_timestamp:
-                        launch_datetime = TimeStamp.format_datetime(
-                            TimeStamp.get_local_dt_from_timestamp(launch_timestamp))
-                    leverage = ''
-                    if min_leverage and max_leverage:
-                        leverage = f'{min_leverage}-{max_leverage}'
-                    min_size = ''
-                    if min_qty and min_notional:
-                        min_size = f'{min_qty} {symbol_tuple[0]}/{min_notional} {symbol_tuple[1]}'
-                    maker_taker = ''
-                    if maker and taker:
-                        maker_taker = f'{maker}/{taker}'
-                    volume_24h_fstring = '{0:.2f}{1}'.format(*format_si_number(volume_24h,
-                                                                               multiple_min=1000,
-                                                                               submultiple_max=None))
-                    markets_data.append({
-                        'type': symbol_tuple[2],
-                        'symbol': symbol,
-                        'last_trend': last_trend,
-                        'open_price_24h': open_price_24h,
-                        'high_price_24h': high_price_24h,
-                        'low_price_24h': low_price_24h,
-                        'close_price_24h': close_price_24h,
-                        'open_close_percent': open_close_percent,
-                        'low_high_percent': low_high_percent,
-                        'volume_24h_fstring': volume_24h_fstring,
-                        'volume_24h': volume_24h,
-                        'launch_timestamp': launch_timestamp,
-                        'launch_datetime': launch_datetime,
-                        'min_leverage': min_leverage,
-                        'max_leverage': max_leverage,
-                        'leverage': leverage,
-                        'min_qty': min_qty,
-                        'min_notional': min_notional,
-                        'min_size': min_size,
-                        'maker': maker,
-                        'taker': taker,
-                        'maker_taker': maker_taker,
-                    })
-            now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-            with self._exchange_market_lock:
-                self._exchange_market_cache = markets_data
-                self._exchange_market_cache_ts = now_timestamp
-            with self._contracts_lock:
-                self._contracts_cache = contracts
-                self._contracts_cache_ts = now_timestamp
+            market_metadata = await self.fetch_market_metadata()
+            markets_info: dict = market_metadata.get('markets_info', dict())
+            categories: dict = market_metadata.get('categories', dict())
+            with self._bad_symbols_lock:
+                bad_symbols = set(self._bad_symbols)
+            endpoints_symbols = dict()  # endpoint: {market id: symbol}
+            for category, symbols in categories.items():
+                endpoint = category.split('_')[-1]
+                endpoints_symbols.setdefault(endpoint, dict()).update(
+                    (markets_info[x]['id'], x) for x in symbols if x not in bad_symbols and x in markets_info)
+            endpoints_symbols = {k: v for k, v in endpoints_symbols.items() if v}
+            ticker_streams = dict()
+            for endpoint, source_symbols in endpoints_symbols.items():
+                ticker_streams[endpoint] = self._get_ticker_stream(endpoint)
+                await ticker_streams[endpoint].set_market_ids(source_symbols)
+            # REST only until a stream has every ticker, afterwards the rows are a snapshot of the streams
+            rest_endpoints = [k for k, v in ticker_streams.items() if not v.is_live()]
+            endpoints_tickers = await asyncio.gather(*(fetch_tickers(k, endpoints_symbols[k])
+                                                       for k in rest_endpoints))
+            for endpoint, tickers in zip(rest_endpoints, endpoints_tickers):
+                ticker_streams[endpoint].seed(tickers)
+            market_rows = dict()
+            for endpoint, source_symbols in endpoints_symbols.items():
+                changed = ticker_streams[endpoint].pop_changes()
+                for market_id, symbol in source_symbols.items():
+                    if market_id not in changed and symbol in self._market_rows:
+                        market_rows[symbol] = self._market_rows[symbol]
+                        continue
+                    ticker = ticker_streams[endpoint].get_ticker(market_id)
+                    if ticker is not None:
+                        market_rows[symbol] = MarketsWorker._get_market_row(symbol, ticker,
+                                                                            markets_info.get(symbol))
+            self._market_rows = market_rows
+            self._cache.put(MarketsWorker.EXCHANGE_MARKET, list(market_rows.values()))
         except ccxt.NetworkError as e:
             traceback.print_exc()
             self._logger.log(*e.args)
@@ -359,23 +357,58 @@ class MarketsWorker(Worker):
             self._logger.log(*e.args)
             raise
 
-    async def force_update_contracts_info(self, *, only_reset=False):
+    @staticmethod
+    def _get_ticker_category(market: dict) -> Union[str, None]:
+        if market['type'] == 'spot':
+            return 'spot'
+        if market['type'] in ('swap', 'future') and market['linear']:
+            return f"{market['type']}_linear"
+        if market['type'] in ('swap', 'future') and market['inverse']:
+            return f"{market['type']}_inverse"
+        return None
+
+    def _put_market_metadata(self, market_metadata: dict, *, timestamp: Union[float, None] = None):
+        self._cache.put(MarketsWorker.MARKET_METADATA, market_metadata, timestamp=timestamp)
+        self._cache.put(MarketsWorker.CONTRACTS, set(market_metadata['markets_info']), timestamp=timestamp)
+
+    async def force_update_market_metadata(self, *, only_reset=False):
         self.check()
         try:
             if only_reset:
-                with self._contracts_lock:
-                    self._contracts_cache_ts = 0
+                self._cache.invalidate(MarketsWorker.MARKET_METADATA)
                 return
-            markets = await self._async_run(self._connection.fetch_markets)
-            contracts = set()
+            markets = await self._request(self._connection.fetch_markets)
+            categories = {x: [] for x in MarketsWorker.TICKER_CATEGORIES}
+            markets_info = dict()
             for x in markets:
-                if x['active'] and not x['option'] and (x['spot'] or x['linear'] or x['inverse']):
-                    source_symbol = x['symbol']
-                    contracts.add(source_symbol)
-            now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-            with self._contracts_lock:
-                self._contracts_cache = contracts
-                self._contracts_cache_ts = now_timestamp
+                if not x['active'] or x['option'] or not (x['spot'] or x['linear'] or x['inverse']):
+                    continue
+                source_symbol = x['symbol']
+                category = MarketsWorker._get_ticker_category(x)
+                if category is not None:
+                    categories[category].append(source_symbol)
+                markets_info[source_symbol] = {  # numbers are strings to survive the json snapshot
+                    'id': x['id'],
+                    'launch_timestamp': int(x['info'].get('launchTime', 0) or 0),
+                    'min_leverage': str(x['info'].get('leverageFilter', dict()).get('minLeverage', 0) or 0),
+                    'max_leverage': str(x['info'].get('leverageFilter', dict()).get('maxLeverage', 0) or 0),
+                    'min_qty': str(x['info'].get('lotSizeFilter', dict()).get('minOrderQty', 0) or 0),
+                    'min_notional': str(x['info'].get('lotSizeFilter', dict()).get('minNotionalValue', 0) or 0),
+                    'maker': str(x.get('maker', 0) or 0),
+                    'taker': str(x.get('taker', 0) or 0),
+                }
+            market_metadata = {
+                'version': MarketsWorker.MARKET_METADATA_VERSION,
+                'categories': categories,
+                'markets_info': markets_info,
+            }
+            self._put_market_metadata(market_metadata)
+            with self._bad_symbols_lock:
+                self._bad_symbols.clear()
+            self._market_rows = dict()
+            if self._market_store is not None:
+                timestamp = TimeStamp.get_local_dt_from_now().timestamp()
+                await self._async_run(self._market_store.save, {**market_metadata, 'timestamp': timestamp})
         except ccxt.NetworkError as e:
             traceback.print_exc()
             self._logger.log(*e.args)
@@ -386,47 +419,59 @@ class MarketsWorker(Worker):
             self._logger.log(*e.args)
             raise
 
-    async def fetch_global_market_info(self, *, force=False, number_of_seconds_to_update=5*60):
-        with self._global_market_lock:
-            if not force and self._global_market_cache:
-                now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-                n_seconds = number_of_seconds_to_update
-                if now_timestamp < self._global_market_cache_ts + n_seconds:
-                    return self._global_market_cache
-            try:
-                await self.force_update_global_market_info()
-            except:
-                pass
-            return self._global_market_cache
-
-    async def fetch_exchange_market_info(self, *, force=False, number_of_seconds_to_update=5*60):
-        with self._exchange_market_lock:
-            if not force and self._exchange_market_cache:
-                now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-                n_seconds = number_of_seconds_to_update
-                if now_timestamp < self._exchange_market_cache_ts + n_seconds:
-                    return self._exchange_market_cache
-            try:
-                await self.force_update_exchange_market_info()
-            except:
-                pass
-            return self._exchange_market_cache
-
-    async def fetch_exchange_contracts(self, *, force=False, number_of_seconds_to_update=5*60) -> set:
-        with self._contracts_lock:
-            if not force and self._contracts_cache:
-                now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-                n_seconds = number_of_seconds_to_update
-                if now_timestamp < self._contracts_cache_ts + n_seconds:
-                    return self._contracts_cache
-            try:
-                await self.force_update_contracts_info()
-            except:
-                pass
-            return self._contracts_cache
+    async def force_update_contracts_info(self, *, only_reset=False):
+        await self.force_update_market_metadata(only_reset=only_reset)
+
+    async def fetch_market_metadata(self, *, force=False, number_of_seconds_to_update=None) -> dict:
+        if self._market_store is not None and MarketsWorker.MARKET_METADATA not in self._cache:
+            market_metadata = await self._async_run(self._market_store.load)
+            if market_metadata and market_metadata.get('markets_info') and \
+                    market_metadata.get('version') == MarketsWorker.MARKET_METADATA_VERSION:
+                timestamp = market_metadata.pop('timestamp', None)
+                self._put_market_metadata(market_metadata, timestamp=timestamp)
+        return await self._cache.get(MarketsWorker.MARKET_METADATA, self.force_update_market_metadata,
+                                     ttl=number_of_seconds_to_update,
+                                     force=force) or dict()
+
+    async def fetch_global_market_info(self, *, force=False, number_of_seconds_to_update=None,
+                                       number_of_stale_seconds=None):
+        return await self._cache.get(MarketsWorker.GLOBAL_MARKET, self.force_update_global_market_info,
+                                     ttl=number_of_seconds_to_update,
+                                     stale_ttl=number_of_stale_seconds,
+                                     force=force) or dict()
+
+    async def fetch_exchange_market_info(self, *, force=False, number_of_seconds_to_update=None,
+                                         number_of_stale_seconds=None):
+        if number_of_seconds_to_update is None and self._is_streaming():
+            number_of_seconds_to_update = MarketsWorker.STREAM_MARKET_TTL
+        return await self._cache.get(MarketsWorker.EXCHANGE_MARKET, self.force_update_exchange_market_info,
+                                     ttl=number_of_seconds_to_update,
+                                     stale_ttl=number_of_stale_seconds,
+                                     force=force) or list()
+
+    async def fetch_exchange_contracts(self, *, force=False, number_of_seconds_to_update=None) -> set:
+        await self.fetch_market_metadata(force=force, number_of_seconds_to_update=number_of_seconds_to_update)
+        return self._cache.peek(MarketsWorker.CONTRACTS, set())
 
     def get_contracts(self):
-        with self._contracts_lock:
-            return self._contracts_cache
+        return self._cache.peek(MarketsWorker.CONTRACTS, set())
+
+    def get_market_id(self, symbol: str) -> Union[str, None]:
+        symbol_info = self._cache.peek(MarketsWorker.MARKET_METADATA, dict()).get('markets_info', dict()).get(symbol)
+        return symbol_info.get('id') if symbol_info else None
+
+    def set_market_store(self, market_store: Union[MarketStore, None]):
+        self._market_store = market_store
+
+    def set_ticker_stream_url(self, url: str):  # '{category}' is replaced by spot, linear or inverse
+        self._ticker_stream_url = url
+        with self._ticker_streams_lock:
+            for endpoint, ticker_stream in self._ticker_streams.items():
+                ticker_stream.set_url(url.format(category=endpoint))
+
+    def detach(self):
+        self._stop_ticker_streams()
+        super().detach()
+
 
 
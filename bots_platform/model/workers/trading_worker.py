@@ -1,10 +1,18 @@
 from typing import Union, Dict, Literal
 from threading import RLock
 from decimal import Decimal
+from functools import partial
 import traceback
+import asyncio
+import heapq
 
 
-from bots_platform.model.utils import decimal_number, TimeStamp, get_symbol, make_brownian_motion
+from bots_platform.model.utils import decimal_number, TimeStamp, OHLCVSeries, get_symbol, make_brownian_motion
+from bots_platform.model.storage import CandleStore, CandleCache, AccountStore
+from bots_platform.model.pnl_engine import PnLEngine
+from bots_platform.model.records import (PositionRecord, OpenOrderRecord, ClosedOrderRecord,
+                                         CanceledOrderRecord, LedgerRecord)
+from bots_platform.model.streams import PrivateStream
 from bots_platform.model.workers import Worker
 import ccxt
 
@@ -15,28 +23,225 @@ class TradingWorker(Worker):
     CLOSED_ORDERS = 'closed_orders'
     CANCELED_ORDERS = 'canceled_orders'
     LEDGER = 'ledger'
+    EXECUTIONS = 'executions'
+    TRADING_DATA = 'trading_data'
+    TRADING_DATA_TTL = 5  # seconds
+    TRADING_DATA_STALE_TTL = 10  # seconds
+    TRADING_DATA_RECONCILE_TTL = 60  # seconds, the private stream keeps positions and open orders current meanwhile
+    HISTORY_SYNC_DELAY = 0.5  # seconds, the events of one fill come in a burst
+    OPEN_ORDER_STATUSES = frozenset({'New', 'PartiallyFilled', 'Untriggered', 'Triggered'})
+    USDC_SETTLE_COIN = 'USDC'
+    USDC_CONTRACT_TTL = 7 * 24 * 60 * 60 * 1000  # ms without activity before a contract is forgotten
+    HISTORY_CURSOR_OVERLAP = 60 * 60 * 1000  # ms, records may be indexed by their creation time
+    HISTORY_WINDOW = 7 * 24 * 60 * 60 * 1000  # ms, the longest range of one history request
+    HISTORY_BACKFILL_PERIOD = 365 * 24 * 60 * 60 * 1000  # ms
+    OHLCV_PAGE_LIMIT = 1000
+    MAX_CONCURRENT_OHLCV_PAGES = 8
 
     def __init__(self):
         super().__init__()
         self._blocks_contracts: Dict[str, Dict[str, float]] = dict()
         self._blocks_balance: Dict[str, Decimal] = dict()
         self._blocks_lock: RLock = RLock()
-        self._pol_lock: RLock = RLock()
-        self._pol_cache: dict = {
-            TradingWorker.POSITIONS: [],
-            TradingWorker.OPEN_ORDERS: [],
-            TradingWorker.CLOSED_ORDERS: [],
-            TradingWorker.CANCELED_ORDERS: [],
-            TradingWorker.LEDGER: []
-        }
-        self._pol_cache_ts: float = 0.
+        self._cache.set_ttl(TradingWorker.TRADING_DATA, ttl=TradingWorker.TRADING_DATA_TTL,
+                            stale_ttl=TradingWorker.TRADING_DATA_STALE_TTL)
         self._max_fee: Decimal = decimal_number('0.0018')
         self._positions_markers: dict = dict()
-        self._closed_orders_data: list = list()
+        self._history_lock: RLock = RLock()
+        self._history: Dict[str, dict] = {
+            name: {'cursors': dict(), 'records': dict(), 'rows': dict(), 'sorted': dict()}
+            for name in (TradingWorker.CLOSED_ORDERS, TradingWorker.CANCELED_ORDERS, TradingWorker.LEDGER,
+                         TradingWorker.EXECUTIONS)
+        }
+        self._history_backfills: Dict[tuple, asyncio.Future] = dict()
+        self._pnl_engine: PnLEngine = PnLEngine()
+        self._account_store: Union[AccountStore, None] = None
+        self._usdc_lock: RLock = RLock()
+        self._usdc_contracts: Dict[str, int] = dict()  # contract id: last activity timestamp
+        self._usdc_closed_orders_ts: int = 0
+        self._usdc_settle_query: bool = True
         self._stop_types = frozenset({'close', 'closing', 'settle', 'stop',
                                       'take', 'liq', 'takeover', 'adl'})
         self._price_types = {}
         self._price_types_init()
+        self._ohlcv_semaphore: asyncio.Semaphore = asyncio.Semaphore(TradingWorker.MAX_CONCURRENT_OHLCV_PAGES)
+        self._candle_store: Union[CandleStore, None] = None
+        self._candle_cache: CandleCache = CandleCache()
+        self._ohlcv_in_flight: Dict[tuple, asyncio.Future] = dict()
+        self._private_stream: Union[PrivateStream, None] = None
+        self._live_lock: RLock = RLock()
+        self._live_positions: dict = dict()  # (contract, position idx): position data
+        self._live_open_orders: dict = dict()  # order id: order data
+        self._finished_orders: Dict[str, int] = dict()  # order id: updated timestamp
+        self._history_sync: Union[asyncio.Future, None] = None
+        self._history_sync_pending: bool = False
+
+    def set_account_store(self, account_store: Union[AccountStore, None]):
+        with self._history_lock:
+            self._account_store = account_store
+            for future in self._history_backfills.values():
+                future.cancel()
+            self._history_backfills.clear()
+            for history in self._history.values():
+                history['cursors'].clear()
+                history['records'].clear()
+                history['rows'].clear()
+                history['sorted'].clear()
+            self._pnl_engine.reset()
+        self._cache.invalidate(TradingWorker.TRADING_DATA)
+
+    def set_private_stream(self, private_stream: Union[PrivateStream, None]):
+        self._private_stream = private_stream
+        with self._live_lock:
+            self._live_positions.clear()
+            self._live_open_orders.clear()
+            self._finished_orders.clear()
+            history_sync = self._history_sync
+            self._history_sync = None
+        if history_sync is not None:
+            history_sync.cancel()
+        if private_stream is not None:
+            private_stream.add_listener('position', self._on_position)
+            private_stream.add_listener('order', self._on_order)
+            private_stream.add_listener('execution', self._on_execution)
+            private_stream.add_authenticated_callback(lambda: self._cache.invalidate(TradingWorker.TRADING_DATA))
+
+    def _is_streaming(self) -> bool:
+        return self._private_stream is not None and self._private_stream.is_live()
+
+    def _get_unified_symbol(self, market_id: str, category: Union[str, None]) -> Union[str, None]:
+        connection = self._connection
+        if connection is None or not connection.markets_by_id:
+            return None
+        for x in connection.markets_by_id.get(market_id) or []:
+            if category is None or (x['spot'] if category == 'spot' else bool(x.get(category))):
+                return x['symbol']
+        return None
+
+    @staticmethod
+    def _get_position_key(position_data) -> tuple:
+        return position_data['symbol'], str(position_data['info'].get('positionIdx'))
+
+    def _seed_live_state(self, positions_data: list, open_orders_data: list, started_timestamp: int) -> tuple:
+        # a REST snapshot replaces the live state, except for events newer than its first request
+        with self._live_lock:
+            positions = {TradingWorker._get_position_key(x): x for x in positions_data}
+            for k, x in self._live_positions.items():
+                if int(x['info']['updatedTime'] or 0) > started_timestamp:
+                    positions[k] = x
+            open_orders = {TradingWorker._get_record_id(x): x for x in open_orders_data}
+            for k, x in self._live_open_orders.items():
+                if int(x['info']['updatedTime'] or 0) > started_timestamp:
+                    open_orders[k] = x
+            for k, timestamp in list(self._finished_orders.items()):
+                if timestamp > started_timestamp:
+                    open_orders.pop(k, None)
+                else:
+                    self._finished_orders.pop(k)
+            self._live_positions = positions
+            self._live_open_orders = open_orders
+            return list(positions.values()), list(open_orders.values())
+
+    def _apply_live_state(self):
+        trading_data = self._cache.peek(TradingWorker.TRADING_DATA)
+        if trading_data is None:  # the first snapshot comes from REST
+            return
+        with self._live_lock:
+            positions_data = list(self._live_positions.values())
+            open_orders_data = list(self._live_open_orders.values())
+        self._cache.update(TradingWorker.TRADING_DATA, {
+            **trading_data,
+            TradingWorker.POSITIONS: self._parse_positions(positions_data),
+            TradingWorker.OPEN_ORDERS: self._parse_open_orders(open_orders_data, positions_data)
+        })
+
+    def _on_position(self, positions: list):
+        with self._live_lock:
+            for x in positions:
+                symbol = self._get_unified_symbol(x['symbol'], x.get('category'))
+                if symbol is None:
+                    continue
+                info = dict(x)
+                info.setdefault('avgPrice', info.get('entryPrice'))  # the stream names it entryPrice
+                position_data = {'symbol': symbol, 'info': info}
+                self._live_positions[TradingWorker._get_position_key(position_data)] = position_data
+        self._apply_live_state()
+
+    def _on_order(self, orders: list):
+        is_finished = False
+        with self._live_lock:
+            for x in orders:
+                symbol = self._get_unified_symbol(x['symbol'], x.get('category'))
+                if symbol is None:
+                    continue
+                order_id = x['orderId']
+                if x['orderStatus'] in TradingWorker.OPEN_ORDER_STATUSES:
+                    self._live_open_orders[order_id] = {'id': order_id, 'symbol': symbol, 'info': dict(x)}
+                else:
+                    self._live_open_orders.pop(order_id, None)
+                    self._finished_orders[order_id] = int(x['updatedTime'] or 0)
+                    is_finished = True
+        self._apply_live_state()
+        if is_finished:
+            self._schedule_history_sync()
+
+    def _on_execution(self, executions: list):
+        if executions:
+            self._schedule_history_sync()
+
+    def _schedule_history_sync(self):
+        with self._live_lock:
+            if self._history_sync is not None:
+                self._history_sync_pending = True
+                return
+            self._history_sync_pending = False
+            self._history_sync = asyncio.ensure_future(self._sync_live_history())
+
+    async def _sync_live_history(self):
+        # only the history changes on a fill, its endpoints are synced incrementally from their cursors
+        while True:
+            await asyncio.sleep(TradingWorker.HISTORY_SYNC_DELAY)
+            with self._live_lock:
+                self._history_sync_pending = False
+            try:
+                closed_orders, canceled_orders, ledger, _ = await asyncio.gather(
+                    self._fetch_closed_orders(),
+                    self._fetch_canceled_orders(),
+                    self._fetch_ledger(),
+                    self._fetch_executions_data())
+                trading_data = self._cache.peek(TradingWorker.TRADING_DATA)
+                if trading_data is not None:
+                    self._cache.update(TradingWorker.TRADING_DATA, {
+                        **trading_data,
+                        TradingWorker.CLOSED_ORDERS: closed_orders,
+                        TradingWorker.CANCELED_ORDERS: canceled_orders,
+                        TradingWorker.LEDGER: ledger
+                    })
+            except asyncio.CancelledError:
+                raise
+            except ccxt.NetworkError as e:
+                traceback.print_exc()
+                self._logger.log(*e.args)
+                with self._live_lock:
+                    self._history_sync = None
+                await self._connection_aborted_callback()
+                return
+            except BaseException as e:
+                traceback.print_exc()
+                self._logger.log(*e.args)
+            with self._live_lock:
+                if not self._history_sync_pending:
+                    self._history_sync = None
+                    return
+
+    def get_pnl_engine(self) -> PnLEngine:
+        return self._pnl_engine
+
+    def set_candle_store(self, candle_store: Union[CandleStore, None]):
+        self._candle_store = candle_store
+
+    def set_candle_cache(self, candle_cache: CandleCache):
+        self._candle_cache = candle_cache
 
     def get_max_fee(self) -> Decimal:
         return self._max_fee
@@ -48,17 +253,17 @@ class TradingWorker(Worker):
         return list(self._price_types)
 
     def _price_types_init(self):
-        def fetch_ohlcv(symbol, timeframe, since, limit):
-            return self._connection.fetch_ohlcv(symbol, timeframe, since, limit)
+        def fetch_ohlcv(symbol, timeframe, since, limit, params=None):
+            return self._connection.fetch_ohlcv(symbol, timeframe, since, limit, params or {})
 
-        def fetch_mark_ohlcv(symbol, timeframe, since, limit):
-            return self._connection.fetch_mark_ohlcv(symbol, timeframe, since, limit)
+        def fetch_mark_ohlcv(symbol, timeframe, since, limit, params=None):
+            return self._connection.fetch_mark_ohlcv(symbol, timeframe, since, limit, params or {})
 
-        def fetch_index_ohlcv(symbol, timeframe, since, limit):
-            return self._connection.fetch_index_ohlcv(symbol, timeframe, since, limit)
+        def fetch_index_ohlcv(symbol, timeframe, since, limit, params=None):
+            return self._connection.fetch_index_ohlcv(symbol, timeframe, since, limit, params or {})
 
-        def fetch_premium_index_ohlcv(symbol, timeframe, since, limit):
-            return self._connection.fetch_premium_index_ohlcv(symbol, timeframe, since, limit)
+        def fetch_premium_index_ohlcv(symbol, timeframe, since, limit, params=None):
+            return self._connection.fetch_premium_index_ohlcv(symbol, timeframe, since, limit, params or {})
 
         self._price_types = {
             'OHLCV': fetch_ohlcv,
@@ -89,38 +294,265 @@ class TradingWorker(Worker):
             }
         return positions_markers
 
-    async def _fetch_positions(self, *, usdc=True, _save_markers=False, _load_closed_orders_data=False):
-        positions = []
-        positions_data = await self._async_run(self._connection.fetch_positions,
-                                               None, {'type': 'swap'})
+    @staticmethod
+    def _get_record_id(record) -> str:
+        return record.get('id') or str(sorted(record['info'].items()))
+
+    @staticmethod
+    def _get_cursor_key(params: dict) -> str:
+        return ','.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+    async def _load_history(self, name: str, cursor_key: str):
+        with self._history_lock:
+            if cursor_key in self._history[name]['records']:
+                return
+        records = dict()
+        cursor = None
+        account_store = self._account_store
+        if account_store is not None:
+            cursor, _ = await self._async_run(account_store.get_cursor, name, cursor_key)
+            for x in await self._async_run(account_store.get_records, name, cursor_key):
+                records[TradingWorker._get_record_id(x)] = x
+        with self._history_lock:
+            history = self._history[name]
+            if cursor_key not in history['records']:
+                history['records'][cursor_key] = records
+                if cursor is not None:
+                    history['cursors'][cursor_key] = cursor
+
+    async def _merge_history(self, name: str, cursor_key: str, new_records: list, timestamp_key: str, *,
+                             cursor: Union[int, None] = None) -> list:
+        # the cursor is the time up to which the history is complete, it is kept as is if None
+        # the records are kept sorted newest first, only the changed ones are merged in
+        changed_records = []
+        replaced_records = set()
+        with self._history_lock:
+            history = self._history[name]
+            records = history['records'].setdefault(cursor_key, dict())
+            for x in new_records:
+                record_id = TradingWorker._get_record_id(x)
+                old_record = records.get(record_id)
+                if old_record is not None and old_record['info'] == x['info']:
+                    continue
+                if old_record is not None:
+                    replaced_records.add(id(old_record))
+                records[record_id] = x
+                history['rows'].pop(record_id, None)  # parse again
+                timestamp = int(x['info'][timestamp_key] or 0)
+                changed_records.append((record_id, timestamp, x.get('symbol') or x['info'].get('symbol'), x))
+            if cursor is not None:
+                cursor = max(history['cursors'].get(cursor_key) or 0, cursor)
+                history['cursors'][cursor_key] = cursor
+            sorted_records = history['sorted'].get(cursor_key)
+            if sorted_records is None:
+                sorted_records = sorted(records.values(), key=lambda x: int(x['info'][timestamp_key] or 0),
+                                        reverse=True)
+            elif changed_records:
+                if replaced_records:
+                    sorted_records = [x for x in sorted_records if id(x) not in replaced_records]
+                merged_records = [x[-1] for x in sorted(changed_records, key=lambda x: x[1], reverse=True)
+                                  if id(x[-1]) not in replaced_records]
+                sorted_records = list(heapq.merge(sorted_records, merged_records,
+                                                  key=lambda x: int(x['info'][timestamp_key] or 0), reverse=True))
+            history['sorted'][cursor_key] = sorted_records
+        account_store = self._account_store
+        if account_store is not None:
+            if changed_records:
+                await self._async_run(account_store.put_records, name, cursor_key, changed_records)
+            if cursor is not None:
+                await self._async_run(partial(account_store.set_cursor, name, cursor_key, cursor=cursor))
+        return sorted_records
+
+    async def _backfill_history(self, name: str, fetch_func, params: dict, timestamp_key: str):
+        # older records are requested window by window in parallel and kept on disk
+        account_store = self._account_store
+        cursor_key = TradingWorker._get_cursor_key(params)
         try:
-            if usdc:
-                if _load_closed_orders_data:
-                    closed_orders_data = self._closed_orders_data
-                else:
-                    swap_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                               None, None, None, {'type': 'swap'})
-                    spot_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                               None, None, None, {'type': 'spot'})
-                    closed_orders_data = swap_closed_orders + spot_closed_orders
-                perp_contracts = set()
-                for x in closed_orders_data:
-                    if x['info']['symbol'].endswith('PERP'):
-                        perp_contracts.add(x['info']['symbol'])
-                perp_contracts = list(perp_contracts)
-                for symbol in perp_contracts:
-                    try:
-                        ps = await self._async_run(self._connection.fetch_positions,
-                                                   symbol, {'type': 'swap'})
-                        positions_data.extend(ps)
-                    except BaseException as e:
-                        traceback.print_exc()
-                        self._logger.log(*e.args)
+            _, backfilled_from = await self._async_run(account_store.get_cursor, name, cursor_key)
+            now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+            target_timestamp = now_timestamp - TradingWorker.HISTORY_BACKFILL_PERIOD
+            date_to = backfilled_from if backfilled_from is not None else now_timestamp
+            windows = []
+            while date_to > target_timestamp:
+                windows.append((max(target_timestamp, date_to - TradingWorker.HISTORY_WINDOW), date_to))
+                date_to -= TradingWorker.HISTORY_WINDOW
+            results = await asyncio.gather(*(self._request(fetch_func, None, x, None,
+                                                           dict(params, endTime=y, paginate=True))
+                                             for x, y in windows), return_exceptions=True)
+            backfilled_from = None
+            for (window_from, _), r in zip(windows, results):  # only the contiguous part from the newest window
+                if isinstance(r, BaseException):
+                    traceback.print_exception(r)
+                    self._logger.log(*r.args)
+                    break
+                await self._merge_history(name, cursor_key, r, timestamp_key)
+                backfilled_from = window_from
+            if backfilled_from is not None:
+                await self._async_run(partial(account_store.set_cursor, name, cursor_key,
+                                              backfilled_from=backfilled_from))
         except BaseException as e:
             traceback.print_exc()
             self._logger.log(*e.args)
-        if _save_markers:
-            self._positions_markers = TradingWorker._get_positions_markers(positions_data)
+
+    async def _forward_fill_history(self, name: str, fetch_func, params: dict, timestamp_key: str,
+                                    date_from: int, date_to: int) -> int:
+        # full windows from a stale cursor (e.g. after a restart), the cursor is kept after every contiguous window
+        cursor_key = TradingWorker._get_cursor_key(params)
+        windows = []
+        while date_to - date_from > TradingWorker.HISTORY_WINDOW:
+            windows.append((date_from, date_from + TradingWorker.HISTORY_WINDOW))
+            date_from += TradingWorker.HISTORY_WINDOW
+        results = await asyncio.gather(*(self._request(fetch_func, None, x, None, dict(params, endTime=y, paginate=True))
+                                         for x, y in windows), return_exceptions=True)
+        for (_, window_to), r in zip(windows, results):
+            if isinstance(r, BaseException):
+                raise r
+            await self._merge_history(name, cursor_key, r, timestamp_key,
+                                      cursor=window_to + TradingWorker.HISTORY_CURSOR_OVERLAP)
+        return date_from
+
+    async def _sync_history(self, name: str, fetch_func, params: dict, timestamp_key: str) -> list:
+        # only records newer than the cursor are requested and merged into the cached history,
+        # one request covers at most HISTORY_WINDOW so a longer gap is filled forward first
+        cursor_key = TradingWorker._get_cursor_key(params)
+        await self._load_history(name, cursor_key)
+        with self._history_lock:
+            cursor = self._history[name]['cursors'].get(cursor_key)
+        started_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+        if cursor is None:  # the last window
+            new_records = await self._request(fetch_func, None, None, None, dict(params, endTime=started_timestamp))
+        else:
+            date_from = max(cursor - TradingWorker.HISTORY_CURSOR_OVERLAP,
+                            started_timestamp - TradingWorker.HISTORY_BACKFILL_PERIOD)
+            if started_timestamp - date_from > TradingWorker.HISTORY_WINDOW:
+                date_from = await self._forward_fill_history(name, fetch_func, params, timestamp_key,
+                                                             date_from, started_timestamp)
+            new_records = await self._request(fetch_func, None, date_from, None,
+                                              dict(params, endTime=started_timestamp, paginate=True))
+        if self._account_store is not None and (name, cursor_key) not in self._history_backfills:
+            self._history_backfills[(name, cursor_key)] = asyncio.ensure_future(
+                self._backfill_history(name, fetch_func, params, timestamp_key))
+        return await self._merge_history(name, cursor_key, new_records, timestamp_key, cursor=started_timestamp)
+
+    async def _fetch_executions_data(self) -> list:  # kept in the account store only
+        if self._account_store is None:
+            return []
+        swap_executions, spot_executions = await asyncio.gather(
+            self._sync_history(TradingWorker.EXECUTIONS, self._connection.fetch_my_trades,
+                               {'type': 'swap'}, 'execTime'),
+            self._sync_history(TradingWorker.EXECUTIONS, self._connection.fetch_my_trades,
+                               {'type': 'spot'}, 'execTime'))
+        return swap_executions + spot_executions
+
+    def _parse_history(self, name: str, records: list, parse_func) -> list:
+        with self._history_lock:
+            rows = self._history[name]['rows']
+            result = []
+            for x in records:
+                record_id = TradingWorker._get_record_id(x)
+                if record_id not in rows:
+                    rows[record_id] = parse_func(x)
+                if rows[record_id] is not None:
+                    result.append(rows[record_id])
+            return result
+
+    async def _fetch_closed_orders_data(self) -> list:
+        swap_closed_orders, spot_closed_orders = await asyncio.gather(
+            self._sync_history(TradingWorker.CLOSED_ORDERS, self._connection.fetch_closed_orders,
+                               {'type': 'swap'}, 'updatedTime'),
+            self._sync_history(TradingWorker.CLOSED_ORDERS, self._connection.fetch_closed_orders,
+                               {'type': 'spot'}, 'updatedTime'))
+        return swap_closed_orders + spot_closed_orders
+
+    @staticmethod
+    def _is_usdc_contract(data_item) -> bool:
+        return data_item['info']['symbol'].endswith('PERP') or \
+            f':{TradingWorker.USDC_SETTLE_COIN}' in str(data_item.get('symbol') or '')
+
+    def _update_usdc_contracts(self, closed_orders_data: list, active_data: list) -> list:
+        now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+        with self._usdc_lock:
+            last_timestamp = self._usdc_closed_orders_ts
+            for x in closed_orders_data:  # only orders closed since the previous update
+                timestamp = int(x['info']['updatedTime'] or 0)
+                if timestamp <= last_timestamp or not TradingWorker._is_usdc_contract(x):
+                    continue
+                self._usdc_closed_orders_ts = max(self._usdc_closed_orders_ts, timestamp)
+                contract = x['info']['symbol']
+                self._usdc_contracts[contract] = max(self._usdc_contracts.get(contract, 0), timestamp)
+            for x in active_data:
+                self._usdc_contracts[x['info']['symbol']] = now_timestamp
+            for contract, timestamp in list(self._usdc_contracts.items()):
+                if timestamp < now_timestamp - TradingWorker.USDC_CONTRACT_TTL:
+                    self._usdc_contracts.pop(contract)
+            return list(self._usdc_contracts)
+
+    async def _fetch_usdc_settle_data(self) -> Union[list, None]:  # one request per endpoint for all contracts
+        params = {'type': 'swap', 'settleCoin': TradingWorker.USDC_SETTLE_COIN}
+        try:
+            return await asyncio.gather(
+                self._request(self._connection.fetch_positions, None, params),
+                self._request(self._connection.fetch_open_orders, None, None, None, params))
+        except ccxt.NetworkError:
+            raise
+        except ccxt.ExchangeError as e:
+            traceback.print_exc()
+            self._logger.log(*e.args)
+            self._usdc_settle_query = False  # fall back to per contract requests
+        return None
+
+    async def _fetch_usdc_contract_data(self, contract: str) -> list:
+        return await asyncio.gather(
+            self._request(self._connection.fetch_positions, contract, {'type': 'swap'}),
+            self._request(self._connection.fetch_open_orders, contract, None, None, {'type': 'swap'}))
+
+    async def _fetch_usdc_data(self, closed_orders_data=None) -> dict:
+        positions_data, open_orders_data = [], []
+        try:
+            if closed_orders_data is None:
+                closed_orders_data = self._fetch_closed_orders_data()
+            settle_data = None
+            if self._usdc_settle_query:
+                settle_data, closed_orders_data = await asyncio.gather(self._fetch_usdc_settle_data(),
+                                                                       closed_orders_data)
+            else:
+                closed_orders_data = await closed_orders_data
+            if settle_data is not None:
+                positions_data, open_orders_data = settle_data
+            else:
+                contracts = self._update_usdc_contracts(closed_orders_data, [])
+                results = await asyncio.gather(*(self._fetch_usdc_contract_data(x) for x in contracts),
+                                               return_exceptions=True)
+                for r in results:
+                    if isinstance(r, BaseException):
+                        traceback.print_exception(r)
+                        self._logger.log(*r.args)
+                        continue
+                    positions_data.extend(r[0])
+                    open_orders_data.extend(r[1])
+            active_data = [x for x in positions_data if decimal_number(x['info']['size'] or 0)]
+            self._update_usdc_contracts(closed_orders_data, active_data + open_orders_data)
+        except BaseException as e:
+            traceback.print_exc()
+            self._logger.log(*e.args)
+        return {
+            TradingWorker.POSITIONS: positions_data,
+            TradingWorker.OPEN_ORDERS: open_orders_data
+        }
+
+    async def _fetch_positions_data(self, *, usdc=True, usdc_data=None) -> list:
+        if not usdc:
+            return await self._request(self._connection.fetch_positions, None, {'type': 'swap'})
+        if usdc_data is None:
+            usdc_data = self._fetch_usdc_data()
+        positions_data, usdc_data = await asyncio.gather(
+            self._request(self._connection.fetch_positions, None, {'type': 'swap'}),
+            usdc_data)
+        return positions_data + usdc_data[TradingWorker.POSITIONS]
+
+    def _parse_positions(self, positions_data: list) -> list:
+        positions = []
+        self._positions_markers = TradingWorker._get_positions_markers(positions_data)
         for position in positions_data:
             contracts = decimal_number(position['info']['size'] or 0)
             if not contracts:
@@ -130,11 +562,8 @@ class TradingWorker(Worker):
             if not symbol:
                 continue
             updated_timestamp = int(position['info']['updatedTime'])
-            datetime_string = TimeStamp.format_datetime(
-                TimeStamp.get_local_dt_from_timestamp(updated_timestamp))
             value = decimal_number(position['info']['positionValue'] or 0)
             real_size = round(value, 4)
-            size = f"{contracts}/{real_size}"
             side = 'Long' if position['info']['side'] == 'buy' else 'Short'
             leverage = decimal_number(position['info']['leverage'] or 1)
             status = position['info']['positionStatus']
@@ -146,84 +575,46 @@ class TradingWorker(Worker):
             liquidation_price = decimal_number(position['info']['liqPrice'] or 0)
             take_profit_price = decimal_number(position['info']['takeProfit'] or 0)
             stop_loss_price = decimal_number(position['info']['stopLoss'] or 0)
-            tp_sl = f'{take_profit_price or "-"}/{stop_loss_price or "-"}'
             trailing_stop = decimal_number(position['info']['trailingStop']) or '-'
             leverage = round(leverage, 2)
             pnl = round(pnl, 4)
             unrealized_pnl = round(unrealized_pnl, 4)
             realized_pnl = round(realized_pnl, 4)
-            positions.append({
-                'timestamp': updated_timestamp,
-                'datetime': datetime_string,
-                'contract': contract,
-                'real_size': real_size,
-                'size': size,
-                'side': side,
-                'leverage': leverage,
-                'status': status,
-                'pnl': pnl,
-                'unrealized_pnl': unrealized_pnl,
-                'realized_pnl': realized_pnl,
-                'entry_price': entry_price,
-                'mark_price': mark_price,
-                'liquidation_price': liquidation_price,
-                'tp_sl': tp_sl,
-                'trailing_stop': trailing_stop,
-                'type': symbol[-1]
-            })
+            positions.append(PositionRecord(
+                timestamp=updated_timestamp,
+                contract=contract,
+                contracts=contracts,
+                real_size=real_size,
+                side=side,
+                leverage=leverage,
+                status=status,
+                pnl=pnl,
+                unrealized_pnl=unrealized_pnl,
+                realized_pnl=realized_pnl,
+                entry_price=entry_price,
+                mark_price=mark_price,
+                liquidation_price=liquidation_price,
+                take_profit_price=take_profit_price,
+                stop_loss_price=stop_loss_price,
+                trailing_stop=trailing_stop,
+                type=symbol[-1]
+            ))
         return positions
 
-    async def _fetch_open_orders(self, *, usdc=True, _load_markers=False, _load_closed_orders_data=False):
-        open_orders = []
-        positions_data = []
-        if not _load_markers:
-            positions_data = await self._async_run(self._connection.fetch_positions,
-                                                   None, {'type': 'swap'})
-        swap_open_orders = await self._async_run(self._connection.fetch_open_orders,
-                                                   None, None, None, {'type': 'swap'})
-        spot_open_orders = await self._async_run(self._connection.fetch_open_orders,
-                                                   None, None, None, {'type': 'spot'})
+    async def _fetch_open_orders_data(self, *, usdc=True, usdc_data=None) -> list:
+        if usdc and usdc_data is None:
+            usdc_data = self._fetch_usdc_data()
+        swap_open_orders, spot_open_orders = await asyncio.gather(
+            self._request(self._connection.fetch_open_orders, None, None, None, {'type': 'swap'}),
+            self._request(self._connection.fetch_open_orders, None, None, None, {'type': 'spot'}))
         open_orders_data = swap_open_orders + spot_open_orders
-        try:
-            if usdc:
-                if _load_closed_orders_data:
-                    closed_orders_data = self._closed_orders_data
-                else:
-                    swap_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                               None, None, None, {'type': 'swap'})
-                    spot_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                               None, None, None, {'type': 'spot'})
-                    closed_orders_data = swap_closed_orders + spot_closed_orders
-                perp_contracts = set()
-                for x in closed_orders_data:
-                    if x['info']['symbol'].endswith('PERP'):
-                        perp_contracts.add(x['info']['symbol'])
-                perp_contracts = list(perp_contracts)
-                for symbol in perp_contracts:
-                    if not _load_markers:
-                        try:
-                            ps = await self._async_run(self._connection.fetch_positions,
-                                                       symbol, {'type': 'swap'})
-                            positions_data.extend(ps)
-                        except BaseException as e:
-                            traceback.print_exc()
-                            self._logger.log(*e.args)
-                    try:
-                        swap_open_orders = await self._async_run(self._connection.fetch_open_orders,
-                                                                 symbol, None, None, {'type': 'swap'})
-                        spot_open_orders = await self._async_run(self._connection.fetch_open_orders,
-                                                                 symbol, None, None, {'type': 'spot'})
-                        open_orders_data.extend(swap_open_orders + spot_open_orders)
-                    except BaseException as e:
-                        traceback.print_exc()
-                        self._logger.log(*e.args)
-        except BaseException as e:
-            traceback.print_exc()
-            self._logger.log(*e.args)
-        if _load_markers:
-            positions_markers = self._positions_markers
-        else:
-            positions_markers = TradingWorker._get_positions_markers(positions_data)
+        if usdc:
+            open_orders_data.extend((await usdc_data)[TradingWorker.OPEN_ORDERS])
+        return open_orders_data
+
+    def _parse_open_orders(self, open_orders_data: list, positions_data: list) -> list:
+        open_orders = []
+        positions_markers = TradingWorker._get_positions_markers(positions_data)
         for open_order in open_orders_data:
             contracts = decimal_number(open_order['info']['leavesQty'] or 0)
             if not contracts:
@@ -233,8 +624,6 @@ class TradingWorker(Worker):
             if not symbol:
                 continue
             updated_timestamp = int(open_order['info']['updatedTime'])
-            datetime_string = TimeStamp.format_datetime(
-                TimeStamp.get_local_dt_from_timestamp(updated_timestamp))
             status = open_order['info']['orderStatus']
             take_profit_price = decimal_number(open_order['info']['takeProfit'] or 0)
             take_profit_limit_price = decimal_number(open_order['info']['tpLimitPrice'] or 0)
@@ -279,7 +668,6 @@ class TradingWorker(Worker):
                 position_contracts = marker['contracts']
                 value = marker['value']
             real_size = contracts * mark_price
-            size = f"{contracts}/{round(real_size, 3)}"
             tp_sl = ''
             if trigger_price:
                 p = (price / entry_price - 1) * contracts / position_contracts * (-1 if side == 'Short' else 1)
@@ -304,278 +692,247 @@ class TradingWorker(Worker):
                     tp_sl += f" / {round(tmp, 2):+}% * L ({stop_loss_trigger})"
                 else:
                     tp_sl += " / -"
-            real_price = price
-            price = f"{price} ({trigger_by if trigger_by else 'Last'})"
-            open_orders.append({
-                'timestamp': updated_timestamp,
-                'datetime': datetime_string,
-                'contract': contract,
-                'real_size': real_size,
-                'size': size,
-                'side': side,
-                'order': order_type,
-                'status': status,
-                'real_price': real_price,
-                'price': price,
-                'tp_sl': tp_sl,
-                'reduce_only': reduce_only,
-                'time_in_force': time_in_force,
-                'type': symbol[-1]
-            })
+            open_orders.append(OpenOrderRecord(
+                timestamp=updated_timestamp,
+                contract=contract,
+                contracts=contracts,
+                real_size=real_size,
+                side=side,
+                order=order_type,
+                status=status,
+                real_price=price,
+                trigger_by=trigger_by,
+                tp_sl=tp_sl,
+                reduce_only=reduce_only,
+                time_in_force=time_in_force,
+                type=symbol[-1]
+            ))
         return open_orders
 
-    async def _fetch_closed_orders(self, *, _save_closed_orders_data=False):
-        closed_orders = []
-        swap_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                   None, None, None, {'type': 'swap'})
-        spot_closed_orders = await self._async_run(self._connection.fetch_closed_orders,
-                                                   None, None, None, {'type': 'spot'})
-        closed_orders_data = swap_closed_orders + spot_closed_orders
-        if _save_closed_orders_data:
-            self._closed_orders_data = closed_orders_data
-        for closed_order in closed_orders_data:
-            contracts = decimal_number(closed_order['info']['cumExecQty'] or 0)
-            if not contracts:
-                continue
-            contract = closed_order['symbol']
-            symbol = get_symbol(contract)
-            if not symbol:
-                continue
-            updated_timestamp = int(closed_order['info']['updatedTime'])
-            datetime_string = TimeStamp.format_datetime(
-                TimeStamp.get_local_dt_from_timestamp(updated_timestamp))
-            status = closed_order['info']['orderStatus']
-            average_price = decimal_number(closed_order['info']['avgPrice'] or 0)
-            trigger_price = decimal_number(closed_order['info']['triggerPrice'] or 0)
-            price = decimal_number(average_price or trigger_price or closed_order['info']['price'] or 0)
-            trigger_by = closed_order['info']['triggerBy'].replace('Price', '')
-            create_type = closed_order['info'].get('createType', '').replace('CreateBy', '')
-            create_type = create_type.replace('Closing', 'Close')
-            if create_type == 'User':
-                create_type = 'Open'
-            side = closed_order['info']['side']
-            stop_order_type = closed_order['info']['stopOrderType']
-            is_stop_type = False
-            if not create_type and symbol[-1] == 'spot':
-                create_type = 'Open' if side == 'Buy' else 'Close'
-                if any(x in create_type.lower() for x in self._stop_types):
-                    is_stop_type = True
-            elif stop_order_type or any(x in create_type.lower() for x in self._stop_types):
-                side = 'Short' if side == 'Buy' else 'Long'
+    def _parse_closed_order(self, closed_order) -> Union[ClosedOrderRecord, None]:
+        contracts = decimal_number(closed_order['info']['cumExecQty'] or 0)
+        if not contracts:
+            return None
+        contract = closed_order['symbol']
+        symbol = get_symbol(contract)
+        if not symbol:
+            return None
+        updated_timestamp = int(closed_order['info']['updatedTime'])
+        status = closed_order['info']['orderStatus']
+        average_price = decimal_number(closed_order['info']['avgPrice'] or 0)
+        trigger_price = decimal_number(closed_order['info']['triggerPrice'] or 0)
+        price = decimal_number(average_price or trigger_price or closed_order['info']['price'] or 0)
+        trigger_by = closed_order['info']['triggerBy'].replace('Price', '')
+        create_type = closed_order['info'].get('createType', '').replace('CreateBy', '')
+        create_type = create_type.replace('Closing', 'Close')
+        if create_type == 'User':
+            create_type = 'Open'
+        side = closed_order['info']['side']
+        stop_order_type = closed_order['info']['stopOrderType']
+        is_stop_type = False
+        if not create_type and symbol[-1] == 'spot':
+            create_type = 'Open' if side == 'Buy' else 'Close'
+            if any(x in create_type.lower() for x in self._stop_types):
                 is_stop_type = True
-            else:
-                side = 'Long' if side == 'Buy' else 'Short'
-            order_price_type = closed_order['info']['orderType']
-            order_type = create_type + bool(order_price_type) * (' ' + order_price_type)
-            mark_price = price
-            fee_cost = decimal_number(closed_order['fee']['cost'] or 0)
-            fee_currency = closed_order['fee']['currency']
-            if symbol[0] == fee_currency:
-                commission = price * fee_cost
-            else:
-                commission = fee_cost
-            commission = round(commission, 4)
-            reduce_only = closed_order['info']['reduceOnly']
-            time_in_force = closed_order['info']['timeInForce']
-            if time_in_force == 'GTC':
-                time_in_force = 'Good-Till-Canceled'
-            elif time_in_force == 'IOC':
-                time_in_force = 'Immediate-Or-Cancel'
-            elif time_in_force == 'FOK':
-                time_in_force = 'Fill-Or-Kill'
-            real_size = contracts * mark_price
-            size = f"{contracts}/{round(real_size, 2)}"
-            real_price = price
-            price = f"{price} ({trigger_by if trigger_by else 'Last'})"
-            closed_orders.append({
-                'timestamp': updated_timestamp,
-                'datetime': datetime_string,
-                'contract': contract,
-                'real_size': real_size,
-                'size': size,
-                'side': side,
-                'order': order_type,
-                'status': status,
-                'real_price': real_price,
-                'price': price,
-                'tp_sl': '',
-                'commission': commission,
-                'reduce_only': reduce_only,
-                'time_in_force': time_in_force,
-                'contracts': contracts,
-                'is_stop_type': is_stop_type,
-                'symbol': symbol,
-                'type': symbol[-1]
-            })
+        elif stop_order_type or any(x in create_type.lower() for x in self._stop_types):
+            side = 'Short' if side == 'Buy' else 'Long'
+            is_stop_type = True
+        else:
+            side = 'Long' if side == 'Buy' else 'Short'
+        order_price_type = closed_order['info']['orderType']
+        order_type = create_type + bool(order_price_type) * (' ' + order_price_type)
+        mark_price = price
+        fee_cost = decimal_number(closed_order['fee']['cost'] or 0)
+        fee_currency = closed_order['fee']['currency']
+        if symbol[0] == fee_currency:
+            commission = price * fee_cost
+        else:
+            commission = fee_cost
+        commission = round(commission, 4)
+        reduce_only = closed_order['info']['reduceOnly']
+        time_in_force = closed_order['info']['timeInForce']
+        if time_in_force == 'GTC':
+            time_in_force = 'Good-Till-Canceled'
+        elif time_in_force == 'IOC':
+            time_in_force = 'Immediate-Or-Cancel'
+        elif time_in_force == 'FOK':
+            time_in_force = 'Fill-Or-Kill'
+        real_size = contracts * mark_price
+        return ClosedOrderRecord(
+            id=TradingWorker._get_record_id(closed_order),
+            timestamp=updated_timestamp,
+            contract=contract,
+            contracts=contracts,
+            real_size=real_size,
+            side=side,
+            order=order_type,
+            status=status,
+            real_price=price,
+            trigger_by=trigger_by,
+            tp_sl='',
+            commission=commission,
+            reduce_only=reduce_only,
+            time_in_force=time_in_force,
+            is_stop_type=is_stop_type,
+            symbol=symbol,
+            type=symbol[-1]
+        )
+
+    async def _fetch_closed_orders(self, *, closed_orders_data=None):
+        if closed_orders_data is None:
+            closed_orders_data = self._fetch_closed_orders_data()
+        closed_orders_data = await closed_orders_data
+        closed_orders = self._parse_history(TradingWorker.CLOSED_ORDERS, closed_orders_data,
+                                            self._parse_closed_order)
+        closed_orders.sort(key=lambda x: (x['timestamp'], x['is_stop_type']))
         try:
-            closed_orders.sort(key=lambda x: (x['timestamp'], x['is_stop_type']))
-            d = dict()
-            for closed_order in closed_orders:
-                if closed_order['symbol'][-1] == 'spot':
-                    contract = closed_order['contract']
-                else:
-                    contract = (closed_order['contract'], closed_order['side'])
-                price = closed_order['real_price']
-                side = closed_order['side']
-                contracts = closed_order['contracts']
-                commission = closed_order['commission']
-                real_size = closed_order['real_size']
+            for closed_order, result in self._pnl_engine.apply(closed_orders):  # new or parsed again fills
                 base_currency = closed_order['symbol'][1]
+                if result is None:
+                    closed_order['tp_sl'] = '-' if closed_order['is_stop_type'] else ''
+                    continue
+                pnl = result['pnl']
                 if closed_order['is_stop_type']:
-                    old_price, old_contracts = d.get(contract, [0, 0])
-                    if old_contracts == 0:
-                        d[contract] = [0, 0]
-                        closed_order['tp_sl'] = '-'
-                        continue
-                    new_contracts = max(0, old_contracts - contracts)
-                    if new_contracts > 0:
-                        d[contract] = [old_price, new_contracts]
-                    elif contract in d:
-                        d.pop(contract)
-                    real_size = min(real_size, price * old_contracts)
-                    p = old_price / price
-                    real_base_value = real_size * (1 - p) * (-1 if side == 'Short' else 1) - commission
-                    tmp = real_base_value * 100 / real_size
-                    tp_sl = f"{round(tmp, 2):+}% ({round(real_base_value, 2):+} {base_currency})"
-                    closed_order['tp_sl'] = any(x in '123456789' for x in tp_sl) and tp_sl or ''
+                    tmp = pnl * 100 / result['real_size']
+                    tp_sl = f"{round(tmp, 2):+}% ({round(pnl, 2):+} {base_currency})"
                 else:
-                    old_price, old_contracts = d.get(contract, [0, 0])
-                    new_price = (old_price * old_contracts + price * contracts) / (old_contracts + contracts)
-                    new_contracts = old_contracts + contracts
-                    d[contract] = [new_price, new_contracts]
-                    tmp = commission / real_size * 100
-                    tp_sl = f"{-round(tmp, 4):+}% ({-round(commission, 4):+} {base_currency})"
-                    closed_order['tp_sl'] = any(x in '123456789' for x in tp_sl) and tp_sl or ''
+                    tmp = -pnl / result['real_size'] * 100
+                    tp_sl = f"{-round(tmp, 4):+}% ({round(pnl, 4):+} {base_currency})"
+                closed_order['tp_sl'] = any(x in '123456789' for x in tp_sl) and tp_sl or ''
         except Exception as e:
             traceback.print_exc()
             self._logger.log(*e.args)
         return closed_orders
 
+    def _parse_canceled_order(self, canceled_order) -> Union[CanceledOrderRecord, None]:
+        contracts = decimal_number(canceled_order['info']['qty'] or 0)
+        if not contracts:
+            return None
+        contract = canceled_order['symbol']
+        symbol = get_symbol(contract)
+        if not symbol:
+            return None
+        updated_timestamp = int(canceled_order['info']['updatedTime'])
+        reason = canceled_order['info']['orderStatus']
+        cancel_type = canceled_order['info']['cancelType'].replace('CancelBy', '')
+        if reason in ('Cancelled', 'Canceled'):
+            if cancel_type == 'UNKNOWN':
+                reason = canceled_order['info']['rejectReason'].replace('EC_', '')
+            else:
+                reason = f"{reason} by {cancel_type}"
+        average_price = decimal_number(canceled_order['info']['avgPrice'] or 0)
+        trigger_price = decimal_number(canceled_order['info']['triggerPrice'] or 0)
+        price = decimal_number(average_price or trigger_price or canceled_order['info']['price'] or 0)
+        trigger_by = canceled_order['info']['triggerBy'].replace('Price', '')
+        create_type = canceled_order['info'].get('createType', '').replace('CreateBy', '')
+        create_type = create_type.replace('Closing', 'Close')
+        if create_type == 'User':
+            create_type = 'Open'
+        side = canceled_order['info']['side']
+        stop_order_type = canceled_order['info']['stopOrderType']
+        if not create_type and symbol[-1] == 'spot':
+            create_type = 'Open' if side == 'Buy' else 'Close'
+        elif stop_order_type or any(x in create_type.lower() for x in self._stop_types):
+            side = 'Short' if side == 'Buy' else 'Long'
+        else:
+            side = 'Long' if side == 'Buy' else 'Short'
+        order_price_type = canceled_order['info']['orderType']
+        order_type = create_type + bool(order_price_type) * (' ' + order_price_type)
+        mark_price = price
+        reduce_only = canceled_order['info']['reduceOnly']
+        time_in_force = canceled_order['info']['timeInForce']
+        if time_in_force == 'GTC':
+            time_in_force = 'Good-Till-Canceled'
+        elif time_in_force == 'IOC':
+            time_in_force = 'Immediate-Or-Cancel'
+        elif time_in_force == 'FOK':
+            time_in_force = 'Fill-Or-Kill'
+        real_size = contracts * mark_price
+        return CanceledOrderRecord(
+            timestamp=updated_timestamp,
+            contract=contract,
+            contracts=contracts,
+            real_size=real_size,
+            side=side,
+            order=order_type,
+            reason=reason,
+            real_price=price,
+            trigger_by=trigger_by,
+            reduce_only=reduce_only,
+            time_in_force=time_in_force,
+            type=symbol[-1]
+        )
+
     async def _fetch_canceled_orders(self):
-        canceled_orders = []
-        swap_canceled_orders = await self._async_run(self._connection.fetch_canceled_orders,
-                                                     None, None, None, {'type': 'swap'})
-        spot_canceled_orders = await self._async_run(self._connection.fetch_canceled_orders,
-                                                     None, None, None, {'type': 'spot'})
+        swap_canceled_orders, spot_canceled_orders = await asyncio.gather(
+            self._sync_history(TradingWorker.CANCELED_ORDERS, self._connection.fetch_canceled_orders,
+                               {'type': 'swap'}, 'updatedTime'),
+            self._sync_history(TradingWorker.CANCELED_ORDERS, self._connection.fetch_canceled_orders,
+                               {'type': 'spot'}, 'updatedTime'))
         canceled_orders_data = swap_canceled_orders + spot_canceled_orders
-        for canceled_order in canceled_orders_data:
-            contracts = decimal_number(canceled_order['info']['qty'] or 0)
-            if not contracts:
-                continue
-            contract = canceled_order['symbol']
-            symbol = get_symbol(contract)
-            if not symbol:
-                continue
-            updated_timestamp = int(canceled_order['info']['updatedTime'])
-            datetime_string = TimeStamp.format_datetime(
-                TimeStamp.get_local_dt_from_timestamp(updated_timestamp))
-            reason = canceled_order['info']['orderStatus']
-            cancel_type = canceled_order['info']['cancelType'].replace('CancelBy', '')
-            if reason in ('Cancelled', 'Canceled'):
-                if cancel_type == 'UNKNOWN':
-                    reason = canceled_order['info']['rejectReason'].replace('EC_', '')
-                else:
-                    reason = f"{reason} by {cancel_type}"
-            average_price = decimal_number(canceled_order['info']['avgPrice'] or 0)
-            trigger_price = decimal_number(canceled_order['info']['triggerPrice'] or 0)
-            price = decimal_number(average_price or trigger_price or canceled_order['info']['price'] or 0)
-            trigger_by = canceled_order['info']['triggerBy'].replace('Price', '')
-            create_type = canceled_order['info'].get('createType', '').replace('CreateBy', '')
-            create_type = create_type.replace('Closing', 'Close')
-            if create_type == 'User':
-                create_type = 'Open'
-            side = canceled_order['info']['side']
-            stop_order_type = canceled_order['info']['stopOrderType']
-            if not create_type and symbol[-1] == 'spot':
-                create_type = 'Open' if side == 'Buy' else 'Close'
-            elif stop_order_type or any(x in create_type.lower() for x in self._stop_types):
-                side = 'Short' if side == 'Buy' else 'Long'
-            else:
-                side = 'Long' if side == 'Buy' else 'Short'
-            order_price_type = canceled_order['info']['orderType']
-            order_type = create_type + bool(order_price_type) * (' ' + order_price_type)
-            mark_price = price
-            reduce_only = canceled_order['info']['reduceOnly']
-            time_in_force = canceled_order['info']['timeInForce']
-            if time_in_force == 'GTC':
-                time_in_force = 'Good-Till-Canceled'
-            elif time_in_force == 'IOC':
-                time_in_force = 'Immediate-Or-Cancel'
-            elif time_in_force == 'FOK':
-                time_in_force = 'Fill-Or-Kill'
-            real_size = contracts * mark_price
-            size = f"{contracts}/{round(real_size, 2)}"
-            real_price = price
-            price = f"{price} ({trigger_by if trigger_by else 'Last'})"
-            canceled_orders.append({
-                'timestamp': updated_timestamp,
-                'datetime': datetime_string,
-                'contract': contract,
-                'real_size': real_size,
-                'size': size,
-                'side': side,
-                'order': order_type,
-                'reason': reason,
-                'real_price': real_price,
-                'price': price,
-                'reduce_only': reduce_only,
-                'time_in_force': time_in_force,
-                'type': symbol[-1]
-            })
-        return canceled_orders
+        return self._parse_history(TradingWorker.CANCELED_ORDERS, canceled_orders_data,
+                                   self._parse_canceled_order)
+
+    def _parse_ledger(self, ledger) -> Union[LedgerRecord, None]:
+        transaction_timestamp = int(ledger['info']['transactionTime'])
+        contract = ledger['info']['symbol']
+        transaction_type = ledger['info']['type']
+        side = ledger['info']['side']
+        quantity = decimal_number(ledger['info']['qty'] or 0)
+        filled_price = decimal_number(ledger['info']['tradePrice'] or 0)
+        funding = decimal_number(ledger['info']['funding'] or 0)
+        fee_paid = 0 if funding else decimal_number(ledger['info']['feeRate'] or 0) * filled_price * quantity
+        cash_flow = decimal_number(ledger['info']['cashFlow'] or 0)
+        change = decimal_number(ledger['info']['change'] or 0)
+        cash_balance = decimal_number(ledger['info']['cashBalance'] or 0)
+        funding = round(funding, 5)
+        fee_paid = round(fee_paid, 5)
+        change = round(change, 5)
+        cash_balance = round(cash_balance, 5)
+        return LedgerRecord(
+            timestamp=transaction_timestamp,
+            contract=contract,
+            type=transaction_type,
+            side=side,
+            quantity=quantity,
+            filled_price=filled_price,
+            funding=funding,
+            fee_paid=fee_paid,
+            cash_flow=cash_flow,
+            change=change,
+            cash_balance=cash_balance
+        )
 
     async def _fetch_ledger(self):
-        ledger_result = []
-        ledger_data = await self._async_run(self._connection.fetch_ledger)
-        for ledger in ledger_data:
-            transaction_timestamp = int(ledger['info']['transactionTime'])
-            datetime_string = TimeStamp.format_datetime(
-                TimeStamp.get_local_dt_from_timestamp(transaction_timestamp))
-            contract = ledger['info']['symbol']
-            transaction_type = ledger['info']['type']
-            side = ledger['info']['side']
-            quantity = decimal_number(ledger['info']['qty'] or 0)
-            filled_price = decimal_number(ledger['info']['tradePrice'] or 0)
-            funding = decimal_number(ledger['info']['funding'] or 0)
-            fee_paid = 0 if funding else decimal_number(ledger['info']['feeRate'] or 0) * filled_price * quantity
-            cash_flow = decimal_number(ledger['info']['cashFlow'] or 0)
-            change = decimal_number(ledger['info']['change'] or 0)
-            cash_balance = decimal_number(ledger['info']['cashBalance'] or 0)
-            funding = round(funding, 5)
-            fee_paid = round(fee_paid, 5)
-            change = round(change, 5)
-            cash_balance = round(cash_balance, 5)
-            ledger_result.append({
-                'timestamp': transaction_timestamp,
-                'datetime': datetime_string,
-                'contract': contract,
-                'type': transaction_type,
-                'side': side,
-                'quantity': quantity,
-                'filled_price': filled_price,
-                'funding': funding,
-                'fee_paid': fee_paid,
-                'cash_flow': cash_flow,
-                'change': change,
-                'cash_balance': cash_balance
-            })
-        return ledger_result
+        ledger_data = await self._sync_history(TradingWorker.LEDGER, self._connection.fetch_ledger,
+                                               {}, 'transactionTime')
+        return self._parse_history(TradingWorker.LEDGER, ledger_data, self._parse_ledger)
 
     async def force_update_trading_data(self, *, only_reset=False):
         self.check()
         try:
             if only_reset:
-                with self._pol_lock:
-                    self._pol_cache_ts = 0
+                self._cache.invalidate(TradingWorker.TRADING_DATA)
                 return
-            closed_orders = await self._fetch_closed_orders(_save_closed_orders_data=True)
-            positions = await self._fetch_positions(usdc=True, _save_markers=True,
-                                                    _load_closed_orders_data=True)
-            open_orders = await self._fetch_open_orders(usdc=True, _load_markers=True,
-                                                        _load_closed_orders_data=True)
-            canceled_orders = await self._fetch_canceled_orders()
-            ledger = await self._fetch_ledger()
-            now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
+            started_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+            # independent endpoints are requested concurrently, shared data is fetched once
+            closed_orders_data = asyncio.ensure_future(self._fetch_closed_orders_data())
+            usdc_data = asyncio.ensure_future(self._fetch_usdc_data(closed_orders_data))
+            try:
+                closed_orders, positions_data, open_orders_data, canceled_orders, ledger, _ = await asyncio.gather(
+                    self._fetch_closed_orders(closed_orders_data=closed_orders_data),
+                    self._fetch_positions_data(usdc=True, usdc_data=usdc_data),
+                    self._fetch_open_orders_data(usdc=True, usdc_data=usdc_data),
+                    self._fetch_canceled_orders(),
+                    self._fetch_ledger(),
+                    self._fetch_executions_data())
+            finally:
+                for future in (closed_orders_data, usdc_data):
+                    future.cancel()
+            positions_data, open_orders_data = self._seed_live_state(positions_data, open_orders_data,
+                                                                     started_timestamp)
+            positions = self._parse_positions(positions_data)
+            open_orders = self._parse_open_orders(open_orders_data, positions_data)
             trading_data = {
                 TradingWorker.POSITIONS: positions,
                 TradingWorker.OPEN_ORDERS: open_orders,
@@ -583,9 +940,7 @@ class TradingWorker(Worker):
                 TradingWorker.CANCELED_ORDERS: canceled_orders,
                 TradingWorker.LEDGER: ledger
             }
-            with self._pol_lock:
-                self._pol_cache = trading_data
-                self._pol_cache_ts = now_timestamp
+            self._cache.put(TradingWorker.TRADING_DATA, trading_data)
         except ccxt.NetworkError as e:
             traceback.print_exc()
             self._logger.log(*e.args)
@@ -596,18 +951,20 @@ class TradingWorker(Worker):
             self._logger.log(*e.args)
             raise
 
-    async def fetch_trading_data(self, *, force=False, number_of_seconds_to_update=5) -> dict:
-        with self._pol_lock:
-            if not force and self._pol_cache:
-                now_timestamp = TimeStamp.get_local_dt_from_now().timestamp()
-                n_seconds = number_of_seconds_to_update
-                if now_timestamp < self._pol_cache_ts + n_seconds:
-                    return self._pol_cache
-            try:
-                await self.force_update_trading_data()
-            except:
-                pass
-            return self._pol_cache
+    async def fetch_trading_data(self, *, force=False, number_of_seconds_to_update=None,
+                                 number_of_stale_seconds=None) -> dict:
+        if number_of_seconds_to_update is None and self._is_streaming():
+            number_of_seconds_to_update = TradingWorker.TRADING_DATA_RECONCILE_TTL
+        return await self._cache.get(TradingWorker.TRADING_DATA, self.force_update_trading_data,
+                                     ttl=number_of_seconds_to_update,
+                                     stale_ttl=number_of_stale_seconds,
+                                     force=force) or {
+            TradingWorker.POSITIONS: [],
+            TradingWorker.OPEN_ORDERS: [],
+            TradingWorker.CLOSED_ORDERS: [],
+            TradingWorker.CANCELED_ORDERS: [],
+            TradingWorker.LEDGER: []
+        }
 
     async def block(self, *,
                     name: str,
@@ -661,22 +1018,22 @@ class TradingWorker(Worker):
             return set(contracts.keys()), balance
 
     async def _fetch_data_by_name(self, name: str, data_type: str):
-        with self._pol_lock:
-            if name is None:
-                trading_data = await self.fetch_trading_data()
-                return trading_data[data_type]
-            data = []
-            contracts_dict = self._blocks_contracts.get(name, dict())
-            if not contracts_dict:
-                return data
+        if name is None:
             trading_data = await self.fetch_trading_data()
-            current_data = trading_data[data_type]
-            for data_item in current_data:
-                timestamp = TimeStamp.normalize_timestamp(data_item['timestamp'])
-                contract = data_item['contract']
-                if contract in contracts_dict and timestamp >= contracts_dict[contract]:
-                    data.append(data_item)
+            return trading_data[data_type]
+        data = []
+        with self._blocks_lock:
+            contracts_dict = dict(self._blocks_contracts.get(name, dict()))
+        if not contracts_dict:
             return data
+        trading_data = await self.fetch_trading_data()
+        current_data = trading_data[data_type]
+        for data_item in current_data:
+            timestamp = TimeStamp.normalize_timestamp(data_item['timestamp'])
+            contract = data_item['contract']
+            if contract in contracts_dict and timestamp >= contracts_dict[contract]:
+                data.append(data_item)
+        return data
 
     async def fetch_positions(self, name: Union[str, None]):
         await self._fetch_data_by_name(name, TradingWorker.POSITIONS)
@@ -717,38 +1074,37 @@ class TradingWorker(Worker):
         if candles_needed == 0:
             return old_ohlc_data, old_volume_data, date_from_timestamp
 
-        full_data = []
         current_timestamp = TimeStamp.convert_local_to_utc_timestamp(
             old_ohlc_data[-1][0] if old_ohlc_data else date_from_timestamp)
-        while True:
-            if contract.lower() != 'random':
-                data = method_func(symbol=contract,
-                                   timeframe=timeframe,
-                                   since=current_timestamp,
-                                   limit=candles_needed)
-            else:
-                data = make_brownian_motion(date_from_ts=current_timestamp,
-                                            timeframe=timeframe,
-                                            count=candles_needed)
-            if not data:
-                break
-            if not full_data and not old_ohlc_data and date_from_timestamp < data[0][0]:
-                date_from_timestamp = data[0][0]
-                candles = TimeStamp.get_number_of_candles(timeframe,
-                                                          date_from_timestamp,
-                                                          date_to_timestamp)
-                candles_needed = candles - len(old_ohlc_data) + bool(len(old_ohlc_data) == candles) + 1
-                if candles_needed == 0:
-                    return old_ohlc_data, old_volume_data, date_from_timestamp
-                continue
-            full_data.extend(data)
-            candles_needed -= len(data)
-            if candles_needed <= 0:
-                break
-            timestamp = current_timestamp
-            current_timestamp = data[-1][0]
-            if timestamp == current_timestamp:
-                break
+        if contract.lower() != 'random':
+            full_data = await self._fetch_cached_ohlcv(method_func,
+                                                       contract=contract,
+                                                       timeframe=timeframe,
+                                                       price_type=price_type,
+                                                       since=current_timestamp,
+                                                       count=candles_needed)
+        else:
+            full_data = await self._async_run(partial(make_brownian_motion,
+                                                      date_from_ts=current_timestamp,
+                                                      timeframe=timeframe,
+                                                      count=candles_needed))
+        if full_data and not old_ohlc_data and date_from_timestamp < full_data[0][0]:
+            date_from_timestamp = full_data[0][0]
+        new_candles, new_volumes = await self._async_run(TradingWorker._stitch_ohlcv_pages, full_data)
+        if not in_place:
+            old_ohlc_data = old_ohlc_data.copy()
+            old_volume_data = old_volume_data.copy()
+        if old_ohlc_data and new_candles and old_ohlc_data[-1][0] == new_candles[0][0]:
+            old_ohlc_data.pop(-1)
+            old_volume_data.pop(-1)
+        old_ohlc_data.extend(new_candles)
+        old_volume_data.extend(new_volumes)
+        real_date_from_timestamp = date_from_timestamp
+        return old_ohlc_data, old_volume_data, real_date_from_timestamp
+
+    @staticmethod
+    def _stitch_ohlcv_pages(full_data: list) -> tuple[list, list]:
+        full_data.sort(key=lambda x: x[0])
         tmp_data = []
         for x in full_data:
             if not tmp_data or tmp_data[-1][0] < x[0]:
@@ -762,16 +1118,195 @@ class TradingWorker(Worker):
             open, high, low, close, volume = map(decimal_number, ohlcv)
             new_candles.append([timestamp, open, high, low, close])
             new_volumes.append([timestamp, volume])
-        if not in_place:
-            old_ohlc_data = old_ohlc_data.copy()
-            old_volume_data = old_volume_data.copy()
-        if old_ohlc_data and new_candles and old_ohlc_data[-1][0] == new_candles[0][0]:
-            old_ohlc_data.pop(-1)
-            old_volume_data.pop(-1)
-        old_ohlc_data.extend(new_candles)
-        old_volume_data.extend(new_volumes)
-        real_date_from_timestamp = date_from_timestamp
-        return old_ohlc_data, old_volume_data, real_date_from_timestamp
+        return new_candles, new_volumes
+
+    async def _fetch_ohlcv_pages(self, method_func, *,
+                                 contract: str,
+                                 timeframe: str,
+                                 since: int,
+                                 count: int) -> list:
+
+        async def fetch_page(page_since, page_limit):
+            async with self._ohlcv_semaphore:
+                page_until = TimeStamp.shift_timeframe_timestamp(timeframe, page_since, page_limit - 1)
+                return await self._request(method_func, contract, timeframe, page_since, page_limit,
+                                           {'until': page_until})
+
+        page_size = TradingWorker.OHLCV_PAGE_LIMIT
+        pages = []
+        for offset in range(0, count, page_size):
+            pages.append(fetch_page(TimeStamp.shift_timeframe_timestamp(timeframe, since, offset),
+                                    min(page_size, count - offset)))
+        full_data = []
+        for data in await asyncio.gather(*pages):
+            full_data.extend(data)
+        return full_data
+
+    async def _fetch_ohlcv_interval(self, method_func, *,
+                                    contract: str,
+                                    timeframe: str,
+                                    date_from: int,
+                                    date_to: int) -> list:
+        first_candle_timestamp = TimeStamp.ceil_timeframe_timestamp(timeframe, date_from)
+        last_candle_timestamp = TimeStamp.floor_timeframe_timestamp(timeframe, date_to)
+        if first_candle_timestamp > last_candle_timestamp:
+            return []
+        timeframe_ms = TimeStamp.convert_timeframe_to_seconds(timeframe) * 1000
+        return await self._fetch_ohlcv_pages(method_func,
+                                             contract=contract,
+                                             timeframe=timeframe,
+                                             since=first_candle_timestamp,
+                                             count=round((last_candle_timestamp - first_candle_timestamp) /
+                                                         timeframe_ms) + 1)
+
+    def _get_launch_timestamp(self, contract: str) -> Union[int, None]:
+        connection = self._connection
+        market = (connection.markets or dict()).get(contract) if connection is not None else None
+        launch_timestamp = int(market['info'].get('launchTime') or 0) if market else 0
+        return launch_timestamp or None
+
+    def _get_covered_to(self, contract: str, timeframe: str, data: list,
+                        interval_from: int, interval_to: int) -> Union[int, None]:
+        # an empty or truncated tail is requested again next time, except before the listing
+        if data:
+            last_timestamp = max(int(x[0]) for x in data)
+            return min(interval_to, TimeStamp.shift_timeframe_timestamp(timeframe, last_timestamp, 1) - 1)
+        launch_timestamp = self._get_launch_timestamp(contract)
+        if launch_timestamp is not None and interval_from < launch_timestamp:
+            return min(interval_to, launch_timestamp - 1)
+        return None
+
+    async def _fetch_stored_ohlcv(self, method_func, *,
+                                  contract: str,
+                                  timeframe: str,
+                                  price_type: str,
+                                  date_from: int,
+                                  date_to: int) -> list:
+
+        async def fetch_interval(interval_from, interval_to):
+            now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+            data = await self._fetch_ohlcv_interval(method_func,
+                                                    contract=contract,
+                                                    timeframe=timeframe,
+                                                    date_from=interval_from,
+                                                    date_to=interval_to)
+            open_candle_timestamp = TimeStamp.floor_timeframe_timestamp(timeframe, now_timestamp)
+            covered_to = self._get_covered_to(contract, timeframe, data, interval_from, interval_to)
+            if covered_to is not None:
+                covered_to = min(covered_to, open_candle_timestamp - 1)  # the open candle is never covered
+            await self._async_run(partial(candle_store.put_candles, key, data,
+                                          covered_from=interval_from,
+                                          covered_to=covered_to))
+
+        candle_store = self._candle_store
+        if candle_store is None:
+            return await self._fetch_ohlcv_interval(method_func,
+                                                    contract=contract,
+                                                    timeframe=timeframe,
+                                                    date_from=date_from,
+                                                    date_to=date_to)
+        key = (contract, timeframe, price_type)
+        missing_intervals = await self._async_run(candle_store.get_missing_intervals, key, date_from, date_to)
+        await asyncio.gather(*(fetch_interval(x, y) for x, y in missing_intervals))
+        return await self._async_run(candle_store.get_candles, key, date_from, date_to)
+
+    @staticmethod
+    def _resample_ohlcv(data: list, timeframe: str, date_from: int, date_to: int) -> list:
+        return [x for x in OHLCVSeries.from_rows(data).resample(timeframe).list() if date_from <= x[0] <= date_to]
+
+    async def _fetch_derived_ohlcv(self, method_func, *,
+                                   contract: str,
+                                   timeframe: str,
+                                   price_type: str,
+                                   date_from: int,
+                                   date_to: int) -> Union[list, None]:
+        now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+        bucket_from = TimeStamp.ceil_timeframe_timestamp(timeframe, date_from)
+        bucket_to = TimeStamp.shift_timeframe_timestamp(timeframe,
+                                                        TimeStamp.floor_timeframe_timestamp(timeframe, date_to)) - 1
+        bucket_to = min(bucket_to, now_timestamp)
+        if bucket_from > bucket_to:
+            return None
+        open_candle_timestamp = TimeStamp.floor_timeframe_timestamp(timeframe, now_timestamp)
+        base_timeframes = [x for x in self.get_timeframes() if TimeStamp.is_timeframe_divisible(timeframe, x)]
+        base_timeframes.sort(key=TimeStamp.convert_timeframe_to_seconds, reverse=True)
+        for base_timeframe in base_timeframes:
+            base_key = (contract, base_timeframe, price_type)
+            missing_intervals = self._candle_cache.get_missing_intervals(base_key, bucket_from, bucket_to)
+            if missing_intervals == [(bucket_from, bucket_to)]:
+                continue
+            if any(x < open_candle_timestamp for x, _ in missing_intervals):  # only the open candle may be refreshed
+                continue
+            base_data = await self._fetch_cached_ohlcv_interval(method_func,
+                                                                contract=contract,
+                                                                timeframe=base_timeframe,
+                                                                price_type=price_type,
+                                                                date_from=bucket_from,
+                                                                date_to=bucket_to)
+            return await self._async_run(TradingWorker._resample_ohlcv, base_data, timeframe, date_from, date_to)
+        return None
+
+    async def _fetch_cached_ohlcv_interval(self, method_func, *,
+                                           contract: str,
+                                           timeframe: str,
+                                           price_type: str,
+                                           date_from: int,
+                                           date_to: int) -> list:
+
+        async def fetch_interval(interval_from, interval_to):
+            in_flight_key = (key, interval_from, interval_to)
+            future = self._ohlcv_in_flight.get(in_flight_key)
+            if future is None:
+                future = asyncio.ensure_future(self._fetch_stored_ohlcv(method_func,
+                                                                        contract=contract,
+                                                                        timeframe=timeframe,
+                                                                        price_type=price_type,
+                                                                        date_from=interval_from,
+                                                                        date_to=interval_to))
+                self._ohlcv_in_flight[in_flight_key] = future
+                future.add_done_callback(lambda *_: self._ohlcv_in_flight.pop(in_flight_key, None))
+            data = await asyncio.shield(future)
+            now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+            self._candle_cache.put_candles(key, data,
+                                           covered_from=interval_from,
+                                           covered_to=self._get_covered_to(contract, timeframe, data,
+                                                                           interval_from, interval_to),
+                                           closed_to=TimeStamp.floor_timeframe_timestamp(timeframe, now_timestamp) - 1)
+
+        key = (contract, timeframe, price_type)
+        missing_intervals = self._candle_cache.get_missing_intervals(key, date_from, date_to)
+        if missing_intervals:
+            derived_data = await self._fetch_derived_ohlcv(method_func,
+                                                           contract=contract,
+                                                           timeframe=timeframe,
+                                                           price_type=price_type,
+                                                           date_from=date_from,
+                                                           date_to=date_to)
+            if derived_data is not None:
+                return derived_data
+        await asyncio.gather(*(fetch_interval(x, y) for x, y in missing_intervals))
+        return self._candle_cache.get_candles(key, date_from, date_to)
+
+    async def _fetch_cached_ohlcv(self, method_func, *,
+                                  contract: str,
+                                  timeframe: str,
+                                  price_type: str,
+                                  since: int,
+                                  count: int) -> list:
+        if count <= 0:
+            return []
+        since = int(since)
+        date_to = TimeStamp.shift_timeframe_timestamp(timeframe,
+                                                      TimeStamp.floor_timeframe_timestamp(timeframe, since),
+                                                      count - 1)
+        now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+        date_to = max(since, min(date_to, now_timestamp))  # candles after the open one do not exist yet
+        return await self._fetch_cached_ohlcv_interval(method_func,
+                                                       contract=contract,
+                                                       timeframe=timeframe,
+                                                       price_type=price_type,
+                                                       date_from=since,
+                                                       date_to=date_to)
 
     async def fetch_ohlcv(self, *,
                           contract: str,
@@ -1,11 +1,13 @@
 import asyncio
 import inspect
-from urllib.request import Request, urlopen
 from typing import Union
 
 
 import ccxt
 from bots_platform.model.logger import Logger
+from bots_platform.model.cache import TTLCache
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.request_scheduler import RequestScheduler
 
 
 class Worker:
@@ -13,6 +15,9 @@ class Worker:
         self._connection: Union[ccxt.bybit, None] = None
         self._logger: Union[Logger, None] = None
         self._connection_aborted_callback: callable = None
+        self._scheduler: Union[RequestScheduler, None] = None
+        self._cache: TTLCache = TTLCache(type(self).__name__)
+        self._http_client: Union[HttpClient, None] = None
 
     def detach(self):
         self._logger = None
@@ -23,12 +28,21 @@ class Worker:
         if self._connection is None or self._logger is None or self._connection_aborted_callback is None:
             raise Exception(f'{self.__class__.__name__} There is no connection.')
 
+    def get_cache(self) -> TTLCache:
+        return self._cache
+
     def set_connection(self, connection: ccxt.Exchange):
         self._connection = connection
 
     def set_logger(self, logger: Logger):
         self._logger = logger
 
+    def set_http_client(self, http_client: HttpClient):
+        self._http_client = http_client
+
+    def set_scheduler(self, scheduler: RequestScheduler):
+        self._scheduler = scheduler
+
     def set_connection_aborted_callback(self, func: callable):
         async def awaitable_func():
             return self._await_or_run(func)
@@ -38,6 +52,9 @@ class Worker:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, func, *args)
 
+    async def _request(self, func, *args):  # exchange calls are rate limited and prioritized by the scheduler
+        return await self._get_scheduler().run(func, *args)
+
     async def _await_or_run(self, obj, *args, **kwargs):
         b1 = inspect.isawaitable(obj)
         b2 = callable(obj)
@@ -48,7 +65,15 @@ class Worker:
         elif b2:
             obj(*args, **kwargs)
 
+    def _get_scheduler(self) -> RequestScheduler:
+        if self._scheduler is None:
+            self._scheduler = RequestScheduler()
+        return self._scheduler
+
+    def _get_http_client(self) -> HttpClient:
+        if self._http_client is None:
+            self._http_client = HttpClient()
+        return self._http_client
+
     async def _load_text(self, url: str, headers: dict) -> str:
-        request_site = Request(url, headers=headers)
-        data = await self._async_run(urlopen, request_site)
-        return data.read().decode('utf-8')
+        return await self._get_http_client().get_text(url, headers)
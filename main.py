@@ -1,6 +1,7 @@
 import argparse
 
 
+from nicegui import app
 from bots_platform import ui, PlatformGui, ExchangeModel
 
 
@@ -33,6 +34,7 @@ def main(host, port):
     platform_gui = PlatformGui(TITLE)
     exchange_model = ExchangeModel()
     platform_gui.set_exchange_model(exchange_model)
+    app.on_shutdown(exchange_model.close)
     platform_gui.init()
     ui.run(host=host, port=port, title=TITLE, dark=True, language='en-US',
            reload=False, endpoint_documentation='none',
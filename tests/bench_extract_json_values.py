@@ -0,0 +1,37 @@
+import json
+import timeit
+
+from bots_platform.model.utils import extract_json_values
+from tests.test_extract_json_values import BRACKETS, load_page, extract_json_value
+
+# offline: the saved page after about 3 MB of other scripts, as the full page has before its page data,
+# then with a long top list, python -m tests.bench_extract_json_values
+
+NUMBER = 5
+
+
+def build_page(*, top_cryptos: int = 0) -> str:
+    page = load_page()
+    if top_cryptos:
+        top = json.dumps([{'id': i, 'name': f'Coin [{i}]', 'symbol': f'C{i}', 'dominance': 0.01}
+                          for i in range(top_cryptos)])
+        page = page.replace('"topCryptos":[', f'"topCryptos":{top[:-1]},', 1)
+    filler = json.dumps({'quotes': [{'id': i, 'name': f'coin {i}', 'tags': ['[a]', '{b}'], 'price': i * 1.5}
+                                    for i in range(40_000)]})
+    p = page.index('<script id="__NEXT_DATA__"')
+    return page[:p] + f'<script type="application/json">{filler}</script>' + page[p:]
+
+
+def main():
+    for text in (build_page(), build_page(top_cryptos=20_000)):
+        expected = {x: extract_json_value(text, x) for x in BRACKETS}
+        assert extract_json_values(text, BRACKETS) == expected
+        previous = timeit.timeit(lambda: {x: extract_json_value(text, x) for x in BRACKETS}, number=NUMBER)
+        current = timeit.timeit(lambda: extract_json_values(text, BRACKETS), number=NUMBER)
+        print(f"page: {len(text) / 1e6:.1f} MB, top cryptos: {len(expected['topCryptos'])}")
+        print(f'previous: {previous / NUMBER * 1000:.2f} ms')
+        print(f'current: {current / NUMBER * 1000:.2f} ms ({previous / current:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+from typing import Union, Callable
+from pathlib import Path
+import asyncio
+import hashlib
+import hmac
+import json
+
+from aiohttp import web, WSMsgType
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def load_fixture(name: str):
+    with open(FIXTURES_DIR / name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+async def wait_for(predicate: Callable, timeout: float = 3.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            raise TimeoutError('condition is not met')
+        await asyncio.sleep(0.01)
+
+
+class StandInServer:
+    # a local bybit v5 websocket: answers auth, subscribe and ping, replays recorded frames of a subscribed topic
+    def __init__(self, frames: Union[dict, None] = None, *, api_key: str = '', api_secret: Union[str, None] = None):
+        self._frames = frames or dict()  # path: {topic: frames}
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._runner: Union[web.AppRunner, None] = None
+        self._sockets: set = set()
+        self.url = ''
+        self.received: list = list()  # (path, message)
+        self.connections: int = 0
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'ws://{host}:{port}'
+        return self.url
+
+    async def stop(self):
+        await self.drop()
+        await self._runner.cleanup()
+
+    async def drop(self):  # clients reconnect
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def push(self, frame: dict):
+        for ws in list(self._sockets):
+            await ws.send_json(frame)
+
+    def get_subscriptions(self, path: str) -> list:
+        return [m['args'] for p, m in self.received if p == path and m.get('op') == 'subscribe']
+
+    async def _authenticate(self, ws: web.WebSocketResponse, path: str) -> bool:
+        message = await ws.receive_json()
+        self.received.append((path, message))
+        api_key, expires, signature = message['args']
+        expected = hmac.new(self._api_secret.encode(), f'GET/realtime{expires}'.encode(), hashlib.sha256).hexdigest()
+        success = message.get('op') == 'auth' and api_key == self._api_key and hmac.compare_digest(signature, expected)
+        await ws.send_json({'op': 'auth', 'success': success, 'ret_msg': '' if success else 'Invalid signature'})
+        return success
+
+    async def _handler(self, request: web.Request) -> web.WebSocketResponse:
+        path = '/' + request.match_info['path']
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        if self._api_secret is not None and not await self._authenticate(ws, path):
+            await ws.close()
+            return ws
+        self._sockets.add(ws)
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                message = json.loads(message.data)
+                self.received.append((path, message))
+                if message.get('op') == 'ping':
+                    await ws.send_json({'op': 'pong', 'success': True})
+                elif message.get('op') in ('subscribe', 'unsubscribe'):
+                    await ws.send_json({'op': message['op'], 'success': True})
+                    if message['op'] == 'subscribe':
+                        for topic in message['args']:
+                            for frame in self._frames.get(path, dict()).get(topic, []):
+                                await ws.send_json(frame)
+        finally:
+            self._sockets.discard(ws)
+        return ws
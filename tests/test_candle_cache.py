@@ -0,0 +1,43 @@
+from bots_platform.model.storage import CandleCache
+
+KEY = ('BTC/USDT:USDT', '1m', 'OHLCV')
+MINUTE = 60_000
+
+
+def make_candles(timestamps, close: float = 1.) -> list:
+    return [[t, 1., 2., 0.5, close, 10.] for t in timestamps]
+
+
+def put(cache: CandleCache, candles: list):
+    cache.put_candles(KEY, candles, covered_from=candles[0][0], covered_to=candles[-1][0] + MINUTE - 1,
+                      closed_to=candles[-1][0] - 1)
+
+
+def test_streamed_candles_are_written_in_place():
+    cache = CandleCache()
+    put(cache, make_candles(range(0, 100 * MINUTE, MINUTE)))
+    entry = cache._entries.peek(KEY)
+    timestamps = entry._timestamps
+    last_timestamp = 99 * MINUTE
+    put(cache, make_candles([last_timestamp], close=2.))  # the open candle changes
+    assert entry._timestamps is timestamps  # no copy of the cached series
+    put(cache, make_candles([last_timestamp + MINUTE], close=3.))  # the next one opens, the capacity grows
+    timestamps = entry._timestamps
+    put(cache, make_candles([last_timestamp + MINUTE], close=4.))
+    put(cache, make_candles([last_timestamp + 2 * MINUTE], close=5.))
+    assert entry._timestamps is timestamps
+    candles = cache.get_candles(KEY, last_timestamp - MINUTE, last_timestamp + 2 * MINUTE)
+    assert [(x[0], x[4]) for x in candles] == [(98 * MINUTE, 1.), (99 * MINUTE, 2.), (100 * MINUTE, 4.),
+                                               (101 * MINUTE, 5.)]
+    assert len(cache.get_candles(KEY, 0, 200 * MINUTE)) == 102
+
+
+def test_older_ranges_are_merged():
+    cache = CandleCache()
+    put(cache, make_candles(range(50 * MINUTE, 60 * MINUTE, MINUTE)))
+    put(cache, make_candles(range(40 * MINUTE, 55 * MINUTE, MINUTE), close=2.))  # a REST range before the tail
+    candles = cache.get_candles(KEY, 0, 100 * MINUTE)
+    assert [x[0] for x in candles] == list(range(40 * MINUTE, 60 * MINUTE, MINUTE))
+    assert [x[4] for x in candles] == [2.] * 15 + [1.] * 5  # the newer values win
+    put(cache, make_candles([59 * MINUTE, 60 * MINUTE], close=3.))
+    assert [x[4] for x in cache.get_candles(KEY, 58 * MINUTE, 60 * MINUTE)] == [1., 3., 3.]
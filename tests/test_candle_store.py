@@ -0,0 +1,47 @@
+from bots_platform.model.storage import CandleStore
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+KEY = ('BTC/USDT:USDT', '1m', 'OHLCV')
+
+
+def test_merge_adjacent_and_overlapping_intervals():
+    assert CandleStore.merge_intervals([]) == []
+    assert CandleStore.merge_intervals([(0, 9), (10, 19)]) == [(0, 19)]  # adjacent
+    assert CandleStore.merge_intervals([(10, 30), (0, 15), (20, 25)]) == [(0, 30)]  # overlapping, unsorted
+    assert CandleStore.merge_intervals([(0, 9), (11, 19)]) == [(0, 9), (11, 19)]  # one millisecond apart
+    assert CandleStore.merge_intervals([(5, 5), (0, 4), (6, 6)]) == [(0, 6)]
+
+
+def test_subtract_intervals():
+    assert CandleStore.subtract_intervals([], 0, 10 * MINUTE - 1, '1m') == [(0, 10 * MINUTE - 1)]
+    assert CandleStore.subtract_intervals([(0, 10 * MINUTE - 1)], 0, 10 * MINUTE - 1, '1m') == []
+    covered = [(2 * MINUTE, 4 * MINUTE - 1), (4 * MINUTE, 6 * MINUTE - 1), (8 * MINUTE, 20 * MINUTE)]
+    assert CandleStore.subtract_intervals(covered, 0, 10 * MINUTE - 1, '1m') == \
+        [(0, 2 * MINUTE - 1), (6 * MINUTE, 8 * MINUTE - 1)]
+    assert CandleStore.subtract_intervals(covered, 3 * MINUTE, 5 * MINUTE, '1m') == []
+    assert CandleStore.subtract_intervals([(0, HOUR - 1)], 2 * HOUR, 3 * HOUR, '1m') == [(2 * HOUR, 3 * HOUR)]
+
+
+def test_subtract_intervals_is_aligned_to_the_timeframe():
+    # a gap without a candle open is not missing
+    covered = [(0, HOUR), (2 * HOUR, 3 * HOUR - 1)]
+    assert CandleStore.subtract_intervals(covered, 0, 3 * HOUR - 1, '1h') == []
+    assert CandleStore.subtract_intervals(covered, 0, 3 * HOUR - 1, '1m') == [(HOUR + 1, 2 * HOUR - 1)]
+    assert CandleStore.subtract_intervals([(0, HOUR - 1)], 0, HOUR + 30 * MINUTE, '1h') == [(HOUR, HOUR + 30 * MINUTE)]
+    assert CandleStore.subtract_intervals([(0, HOUR)], 0, 2 * HOUR - 1, '1h') == []  # the rest opens no candle
+
+
+def test_truncated_coverage_is_missing_again(tmp_path):
+    candle_store = CandleStore(tmp_path / 'candles.sqlite3')
+    candles = [[t, 1, 2, 0.5, 1.5, 10] for t in range(0, 30 * MINUTE, MINUTE)]  # half of the requested hour
+    candle_store.put_candles(KEY, candles, covered_from=0, covered_to=30 * MINUTE - 1)
+    assert candle_store.get_missing_intervals(KEY, 0, HOUR - 1) == [(30 * MINUTE, HOUR - 1)]
+    candle_store.put_candles(KEY, [], covered_from=30 * MINUTE, covered_to=None)  # nothing is covered
+    assert candle_store.get_missing_intervals(KEY, 0, HOUR - 1) == [(30 * MINUTE, HOUR - 1)]
+    candle_store.put_candles(KEY, [[30 * MINUTE, 1, 2, 0.5, 1.5, 10]], covered_from=30 * MINUTE,
+                             covered_to=HOUR - 1)
+    assert candle_store.get_coverage(KEY) == [(0, HOUR - 1)]
+    assert candle_store.get_missing_intervals(KEY, 0, HOUR - 1) == []
+    assert len(candle_store.get_candles(KEY, 0, HOUR - 1)) == 31
+    candle_store.close()
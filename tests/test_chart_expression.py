@@ -0,0 +1,35 @@
+import numpy as np
+
+from bots_platform.model import ChartExpression, OHLCVSeries
+
+BTC, ETH = 'BTC/USDT:USDT', 'ETH/USDT:USDT'
+
+
+def make_series(count: int, seed: int) -> OHLCVSeries:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=count))
+    timestamps = np.arange(count, dtype=np.int64) * 60_000
+    return OHLCVSeries(timestamps, np.vstack([close, close + 1, close - 1, close, rng.random(count)]))
+
+
+def test_lookback_of_windowed_expressions():
+    assert ChartExpression.compile(f'{BTC} / {ETH}').lookback == 0
+    assert ChartExpression.compile(f'{BTC} - shift({ETH}, 3)').lookback == 3
+    assert ChartExpression.compile(f'sma(shift({BTC}, 2), 5) * 2').lookback == 6
+    assert ChartExpression.compile(f'rolling_max({BTC}, 4) + log(sma({ETH}, 20))').lookback == 19
+    assert ChartExpression.compile(f'ema({BTC}, 1)').lookback == 0
+    assert ChartExpression.compile(f'ema({BTC}, 10) - {ETH}').lookback is None
+
+
+def test_tail_matches_the_full_evaluation():
+    series = {BTC: make_series(500, 1), ETH: make_series(500, 2)}
+    for expression in (f'sma({BTC}, 5) - shift({ETH}, 3)', f'rolling_min({BTC} / {ETH}, 7)',
+                       f'sma(shift({BTC}, 2), 5) * rolling_max({ETH}, 4)'):
+        expression = ChartExpression.compile(expression)
+        full = expression.evaluate(series)
+        for new_candles in (1, 3):
+            count = expression.lookback + new_candles
+            tail = expression.evaluate({k: OHLCVSeries(v.timestamps[-count:], v.values[:, -count:])
+                                        for k, v in series.items()})
+            assert np.array_equal(tail.timestamps, full.timestamps[-new_candles:])
+            assert np.allclose(tail.values, full.values[:, -new_candles:])
@@ -0,0 +1,55 @@
+import asyncio
+
+from bots_platform.model.logger import Logger
+from bots_platform.model.storage import CandleCache
+from bots_platform.model.utils import TimeStamp
+from bots_platform.model.workers import ChartsWorker
+from tests.test_ohlcv_coverage import CONTRACT, MINUTE, Connection, create_worker, get_interval
+
+
+def test_charts_of_a_leg_share_its_fetch():
+    async def main():
+        date_from, date_to = get_interval()
+        connection = Connection(date_to)
+        trading_worker = create_worker(connection)
+        trading_worker.set_logger(Logger())
+        candle_cache = CandleCache()
+        trading_worker.set_candle_cache(candle_cache)
+        charts_worker = ChartsWorker()
+        charts_worker.set_trading_worker(trading_worker)
+        charts_worker.set_candle_cache(candle_cache)
+        fetches = []
+        aux_fetch_leg = charts_worker._aux_fetch_leg
+
+        async def count_fetch_leg(**kwargs):
+            fetches.append((kwargs['date_from'], kwargs['is_tail']))
+            return await aux_fetch_leg(**kwargs)
+
+        charts_worker._aux_fetch_leg = count_fetch_leg
+        local_from = TimeStamp.convert_utc_to_local_timestamp(date_from)
+        local_to = TimeStamp.convert_utc_to_local_timestamp(date_to)
+        expressions = (CONTRACT, f'sma({CONTRACT}, 5)', f'shift({CONTRACT}, 12) * 2')
+
+        async def update(data_list):
+            return await asyncio.gather(*(charts_worker.update_chart_data(contract=x,
+                                                                          date_from=local_from,
+                                                                          date_to=local_to,
+                                                                          timeframe='1m',
+                                                                          price_type='OHLCV',
+                                                                          data=data)
+                                          for x, data in zip(expressions, data_list)))
+
+        try:
+            full_results = await update([[], [], []])
+            assert fetches == [(local_from, False)]
+            assert [len(x['data']) for x in full_results] == [60, 56, 48]
+            fetches.clear()
+            tail_results = await update([[*x['data']] for x in full_results])
+            assert fetches == [(TimeStamp.convert_utc_to_local_timestamp(date_to - MINUTE + 1), True)]
+            for full_result, tail_result in zip(full_results, tail_results):
+                assert tail_result['date_from'] == full_result['date_from']
+                assert tail_result['data'] == full_result['data']
+        finally:
+            trading_worker._get_scheduler().close()
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import json
+
+from bots_platform.model.utils import extract_json_values
+from tests.stand_in_server import FIXTURES_DIR
+
+BRACKETS = {'topCryptos': '[', 'globalMetrics': '{', 'fearGreedIndexData': '{'}
+
+
+def load_page() -> str:
+    with open(FIXTURES_DIR / 'coinmarketcap_charts_trimmed.html', encoding='utf-8') as f:
+        return f.read()
+
+
+def parse_json_line(string: str, *, is_array: bool = False) -> str:  # the previous per character extraction
+    b_start = '{['[is_array]
+    b_end = '}]'[is_array]
+    depth = 0
+    json_line = ''
+    for x in string:
+        if depth > 0 or x == b_start and depth == 0:
+            json_line += x
+        if x == b_start:
+            depth += 1
+        elif x == b_end:
+            depth -= 1
+            if depth == 0:
+                break
+    return json_line
+
+
+def extract_json_value(text: str, key: str) -> object:
+    start_text = f'"{key}"'
+    p = text.find(start_text)
+    return json.loads(parse_json_line(text[p + len(start_text):], is_array=BRACKETS[key] == '['))
+
+
+def test_page_values_are_extracted():
+    values = extract_json_values(load_page(), BRACKETS)
+    assert [x['symbol'] for x in values['topCryptos']] == ['BTC', 'ETH', 'USDT', 'BNB', 'SOL', 'Others']
+    assert values['globalMetrics']['numMarkets'] == 10350
+    assert values['globalMetrics']['etherscanGas']['fastPrice'] == '9'
+    assert values['fearGreedIndexData']['currentIndex']['name'] == 'Greed'
+
+
+def test_page_values_match_the_previous_extraction():
+    text = load_page()
+    values = extract_json_values(text, BRACKETS)
+    assert values == {x: extract_json_value(text, x) for x in BRACKETS}
+
+
+def test_missing_and_broken_values_are_skipped():
+    text = '{"topCryptos": [{"symbol": "BTC ]"}], "globalMetrics": null, "fearGreedIndexData": {"score": '
+    values = extract_json_values(text, BRACKETS)
+    assert values == {'topCryptos': [{'symbol': 'BTC ]'}]}  # brackets inside strings are kept
+    assert extract_json_values(text, dict()) == dict()
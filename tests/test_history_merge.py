@@ -0,0 +1,38 @@
+import asyncio
+import random
+
+from bots_platform.model.workers import TradingWorker
+
+NAME = TradingWorker.CLOSED_ORDERS
+
+
+def make_record(record_id: int, timestamp: int, status: str = 'Filled') -> dict:
+    return {'id': str(record_id), 'info': {'updatedTime': str(timestamp), 'orderStatus': status}}
+
+
+def merge(worker: TradingWorker, records: list) -> list:
+    return asyncio.run(worker._merge_history(NAME, 'type=swap', records, 'updatedTime'))
+
+
+def get_ids(records: list) -> list:
+    return [x['id'] for x in records]
+
+
+def test_history_is_merged_in_order():
+    rng = random.Random(1)
+    worker = TradingWorker()
+    all_records = dict()
+    result = []
+    for _ in range(20):
+        records = [make_record(rng.randrange(200), rng.randrange(10_000), rng.choice(('New', 'Filled')))
+                   for _ in range(rng.randrange(30))]
+        for x in records:
+            all_records[x['id']] = x
+        result = merge(worker, records)
+        assert sorted(get_ids(result)) == sorted(all_records)
+        assert [int(x['info']['updatedTime']) for x in result] == \
+            sorted((int(x['info']['updatedTime']) for x in all_records.values()), reverse=True)
+        assert all(x is all_records[x['id']] for x in result)
+    assert merge(worker, []) is result
+    assert merge(worker, [make_record(int(x['id']), int(x['info']['updatedTime']), x['info']['orderStatus'])
+                          for x in result[:5]]) is result  # nothing changed
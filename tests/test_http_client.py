@@ -0,0 +1,26 @@
+import asyncio
+
+from bots_platform.model.http_client import HttpClient
+from tests.stand_in_server import StandInServer
+
+
+def test_websockets_are_not_limited_per_host():
+    async def main():
+        server = StandInServer()
+        url = await server.start()
+        http_client = HttpClient()
+        count = HttpClient.MAX_CONNECTIONS_PER_HOST + 2
+        try:
+            sockets = await asyncio.wait_for(asyncio.gather(*(http_client.ws_connect(f'{url}/v5/public/linear')
+                                                              for _ in range(count))), timeout=5)
+            for ws in sockets:
+                await ws.send_json({'op': 'ping'})
+                assert (await ws.receive_json())['op'] == 'pong'
+            for ws in sockets:
+                await ws.close()
+            assert server.connections == count
+        finally:
+            await http_client.close()
+            await server.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import asyncio
+
+from bots_platform.model.storage import CandleCache, CandleStore
+from bots_platform.model.utils import TimeStamp
+from bots_platform.model.workers import TradingWorker
+
+CONTRACT = 'BTC/USDT:USDT'
+MINUTE = 60_000
+
+
+class Connection:
+    # returns the candles up to the last one the exchange has, like a truncated page
+    timeframes = {'1m': '1', '5m': '5', '1h': '60'}
+
+    def __init__(self, last_timestamp: int, launch_timestamp: int = 0):
+        self.markets = {CONTRACT: {'info': {'launchTime': str(launch_timestamp)}}}
+        self.last_timestamp = last_timestamp
+        self.launch_timestamp = launch_timestamp
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit, params):
+        self.calls.append((since, params['until']))
+        return [[t, 1, 2, 0.5, 1.5, 10] for t in range(max(since, self.launch_timestamp), params['until'] + 1, MINUTE)
+                if t <= self.last_timestamp]
+
+
+def create_worker(connection: Connection, candle_store=None) -> TradingWorker:
+    worker = TradingWorker()
+    worker.set_connection(connection)
+    worker.set_logger(None)
+    worker.set_connection_aborted_callback(lambda: None)
+    worker.set_candle_cache(CandleCache())
+    worker.set_candle_store(candle_store)
+    return worker
+
+
+def get_interval() -> tuple:  # an hour of closed candles
+    now_timestamp = int(TimeStamp.get_utc_dt_from_now().timestamp() * 1000)
+    date_from = TimeStamp.floor_timeframe_timestamp('1h', now_timestamp) - 2 * 60 * MINUTE
+    return date_from, date_from + 60 * MINUTE - 1
+
+
+async def fetch(worker: TradingWorker, date_from: int, date_to: int) -> list:
+    return await worker._fetch_cached_ohlcv_interval(worker._price_types['OHLCV'],
+                                                     contract=CONTRACT,
+                                                     timeframe='1m',
+                                                     price_type='OHLCV',
+                                                     date_from=date_from,
+                                                     date_to=date_to)
+
+
+def check_truncated_tail_is_requested_again(candle_store=None):
+    async def main():
+        date_from, date_to = get_interval()
+        connection = Connection(date_from + 29 * MINUTE)
+        worker = create_worker(connection, candle_store)
+        try:
+            assert len(await fetch(worker, date_from, date_to)) == 30
+            connection.calls.clear()
+            connection.last_timestamp = date_to
+            assert len(await fetch(worker, date_from, date_to)) == 60
+            assert connection.calls == [(date_from + 30 * MINUTE, date_to - MINUTE + 1)]
+            connection.calls.clear()
+            assert len(await fetch(worker, date_from, date_to)) == 60
+            assert connection.calls == []
+        finally:
+            worker._get_scheduler().close()
+
+    asyncio.run(main())
+
+
+def test_truncated_tail_is_requested_again():
+    check_truncated_tail_is_requested_again()
+
+
+def test_truncated_tail_is_requested_again_with_a_store(tmp_path):
+    candle_store = CandleStore(tmp_path / 'candles.sqlite3')
+    check_truncated_tail_is_requested_again(candle_store)
+    candle_store.close()
+
+
+def test_empty_response_covers_only_the_range_before_the_launch():
+    async def main():
+        date_from, date_to = get_interval()
+        connection = Connection(date_from - 1)  # nothing yet
+        worker = create_worker(connection)
+        try:
+            assert await fetch(worker, date_from, date_to) == []
+            connection.calls.clear()
+            assert await fetch(worker, date_from, date_to) == []
+            assert connection.calls == [(date_from, date_to - MINUTE + 1)]  # nothing is covered
+
+            launch_timestamp = date_from + 20 * MINUTE
+            connection.launch_timestamp = launch_timestamp
+            connection.markets[CONTRACT]['info']['launchTime'] = str(launch_timestamp)
+            assert await fetch(worker, date_from, date_to) == []
+            connection.calls.clear()
+            connection.last_timestamp = date_to
+            assert len(await fetch(worker, date_from, date_to)) == 40
+            assert connection.calls == [(launch_timestamp, date_to - MINUTE + 1)]
+        finally:
+            worker._get_scheduler().close()
+
+    asyncio.run(main())
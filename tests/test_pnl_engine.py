@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from bots_platform.model import PnLEngine
+
+SYMBOL = ('BTC', 'USDT', 'USDT', 'linear')
+
+
+def make_fill(fill_id: str, timestamp: int, *, contract: str = 'BTC/USDT:USDT', side: str = 'Long',
+              price: str = '100', contracts: str = '1', is_stop_type: bool = False) -> dict:
+    price, contracts = Decimal(price), Decimal(contracts)
+    return {
+        'id': fill_id,
+        'timestamp': timestamp,
+        'contract': contract,
+        'side': side,
+        'contracts': contracts,
+        'real_price': price,
+        'real_size': price * contracts,
+        'commission': Decimal('0.1'),
+        'is_stop_type': is_stop_type,
+        'symbol': SYMBOL
+    }
+
+
+def make_fills() -> list:
+    return [make_fill('1', 1000, price='100'),
+            make_fill('2', 2000, price='110', contracts='2'),
+            make_fill('3', 3000, price='120', contracts='3', is_stop_type=True),
+            make_fill('4', 1500, contract='ETH/USDT:USDT', price='10', contracts='5')]
+
+
+def get_state(engine: PnLEngine) -> tuple:
+    return (engine.get_realized_pnl(), engine.get_position('BTC/USDT:USDT', 'Long'),
+            engine.get_position('ETH/USDT:USDT', 'Long'))
+
+
+def test_parsed_again_fills_are_not_applied_again():
+    engine = PnLEngine()
+    results = {x['id']: result for x, result in engine.apply(make_fills())}
+    state = get_state(engine)
+    assert engine.apply(make_fills()[:2]) == [(x, results[x['id']]) for x in make_fills()[:2]]  # same results
+    assert [x['id'] for x, _ in engine.apply(make_fills())] == ['1', '2', '3', '4']
+    assert get_state(engine) == state
+
+
+def test_older_fills_replay_only_their_position():
+    fills = make_fills()
+    full_engine = PnLEngine()
+    full_engine.apply(fills)
+    engine = PnLEngine()
+    engine.apply([fills[2], fills[3]])
+    results = engine.apply([fills[0], fills[1], fills[3]])  # backfilled older fills
+    assert sorted(x['id'] for x, _ in results) == ['1', '2', '3']
+    assert get_state(engine) == get_state(full_engine)
+    assert engine.get_realized_pnl('BTC/USDT:USDT') == full_engine.get_realized_pnl('BTC/USDT:USDT')
+
+
+def test_changed_fills_are_replayed():
+    engine = PnLEngine()
+    fills = make_fills()
+    engine.apply(fills)
+    fills[1] = make_fill('2', 2000, side='Short', price='110', contracts='2')
+    results = engine.apply(fills)
+    assert sorted(x['id'] for x, _ in results) == ['1', '2', '3']
+    expected_engine = PnLEngine()
+    expected_engine.apply(fills)
+    assert get_state(engine) == get_state(expected_engine)
+    assert engine.get_position('BTC/USDT:USDT', 'Short') == expected_engine.get_position('BTC/USDT:USDT', 'Short')
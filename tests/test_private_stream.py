@@ -0,0 +1,210 @@
+import asyncio
+import copy
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.streams import PrivateStream, WebSocketStream
+from bots_platform.model.workers import TradingWorker, BalanceWorker
+from tests.stand_in_server import StandInServer, load_fixture, wait_for
+
+FIXTURE = load_fixture('bybit_private_frames.json')
+FRAMES = FIXTURE['frames']
+REST = FIXTURE['rest']
+FILLED_ORDER, NEW_ORDER = FRAMES['order']
+PRIVATE_PATH = '/v5/private'
+
+
+class Logger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, *args):
+        self.messages.append(args)
+
+
+class Connection:
+    # the REST view of the account, 'before' or 'after' the recorded fill
+    markets_by_id = {
+        'BTCUSDT': [
+            {'id': 'BTCUSDT', 'symbol': 'BTC/USDT', 'spot': True, 'linear': None, 'inverse': None},
+            {'id': 'BTCUSDT', 'symbol': 'BTC/USDT:USDT', 'spot': False, 'linear': True, 'inverse': False},
+        ]
+    }
+
+    def __init__(self, state: str):
+        self.state = state
+        self.calls = []
+
+    def _get(self, name: str, params: dict) -> list:
+        self.calls.append(f'fetch_{name}')
+        if params.get('type') == 'spot' or 'settleCoin' in params:
+            return []
+        return copy.deepcopy(REST[self.state][name])
+
+    def fetch_positions(self, symbol, params):
+        return self._get('positions', params)
+
+    def fetch_open_orders(self, symbol, since, limit, params):
+        return self._get('open_orders', params)
+
+    def fetch_closed_orders(self, symbol, since, limit, params):
+        return self._get('closed_orders', params)
+
+    def fetch_canceled_orders(self, symbol, since, limit, params):
+        self.calls.append('fetch_canceled_orders')
+        return []
+
+    def fetch_ledger(self, code, since, limit, params):
+        self.calls.append('fetch_ledger')
+        return []
+
+    def fetch_balance(self):
+        self.calls.append('fetch_balance')
+        return {'info': {'retMsg': 'OK', 'result': {'list': copy.deepcopy(REST[self.state]['wallet_balance'])}}}
+
+    def is_unified_enabled(self):
+        return False, True
+
+
+def create_worker(worker_class, state: str):
+    worker = worker_class()
+    connection = Connection(state)
+    worker.set_connection(connection)
+    worker.set_logger(Logger())
+    worker.set_connection_aborted_callback(lambda: None)
+    return worker, connection
+
+
+def get_rows(trading_data: dict, name: str) -> list:
+    return [x.to_row() for x in trading_data[name]]
+
+
+async def start_stream(server: StandInServer, logger: Logger, api_secret: str = 'secret') -> PrivateStream:
+    url = await server.start()
+    stream = PrivateStream('key', api_secret, url + PRIVATE_PATH, http_client=HttpClient())
+    stream.set_logger(logger)
+    return stream
+
+
+async def stop_stream(server: StandInServer, stream: PrivateStream, *workers):
+    stream.stop()
+    await server.stop()
+    await stream._http_client.close()
+    for worker in workers:
+        worker._get_scheduler().close()
+
+
+def test_auth_failure_keeps_the_rest_path(monkeypatch):
+    monkeypatch.setattr(WebSocketStream, 'RECONNECT_DELAY', 0.05)
+
+    async def main():
+        server = StandInServer(api_key='key', api_secret='secret')
+        logger = Logger()
+        stream = await start_stream(server, logger, api_secret='wrong')
+        worker, _ = create_worker(TradingWorker, 'before')
+        worker.set_private_stream(stream)
+        try:
+            stream.start()
+            await wait_for(lambda: ('PrivateStream:', 'Auth failed (Invalid signature)') in logger.messages)
+            assert not stream.is_live()
+            assert not worker._is_streaming()
+            assert server.get_subscriptions(PRIVATE_PATH) == []  # never subscribed without auth
+        finally:
+            await stop_stream(server, stream, worker)
+
+    asyncio.run(main())
+
+
+def test_seed_keeps_live_events_newer_than_the_snapshot():
+    asyncio.run(check_seed())
+
+
+async def check_seed():  # a finished order schedules a history sync on the running loop
+    worker, _ = create_worker(TradingWorker, 'before')
+    stale_order = dict(NEW_ORDER['data'][0], orderId='stale', updatedTime='1672363000000')
+    old_finished_order = dict(FILLED_ORDER['data'][0], orderId='old', updatedTime='1672363000000')
+    worker._on_order([stale_order, old_finished_order])
+    worker._on_order(FILLED_ORDER['data'])
+    worker._on_position(FRAMES['position'][0]['data'])
+    assert worker._live_positions[('BTC/USDT:USDT', '0')]['info']['avgPrice'] == '16800.00'  # from entryPrice
+
+    # the snapshot requests started before the fill, only the events older than them are replaced
+    positions_data, open_orders_data = worker._seed_live_state(
+        REST['before']['positions'], REST['before']['open_orders'], 1672364174000)
+    assert [x['info']['updatedTime'] for x in positions_data] == ['1672364174449']
+    assert open_orders_data == []  # the filled order is gone, the stale one is not on the exchange
+    assert set(worker._finished_orders) == {FILLED_ORDER['data'][0]['orderId']}
+
+    # a snapshot newer than every event replaces the live state
+    positions_data, open_orders_data = worker._seed_live_state(
+        REST['after']['positions'], REST['after']['open_orders'], 1672364200000)
+    assert positions_data == REST['after']['positions']
+    assert open_orders_data == REST['after']['open_orders']
+    assert worker._finished_orders == dict()
+    worker.set_private_stream(None)  # cancels the history sync
+
+
+def test_live_rows_match_rest_rows(monkeypatch):
+    monkeypatch.setattr(TradingWorker, 'HISTORY_SYNC_DELAY', 0.05)
+
+    async def main():
+        server = StandInServer(api_key='key', api_secret='secret')
+        stream = await start_stream(server, Logger())
+        rest_worker, _ = create_worker(TradingWorker, 'after')
+        live_worker, connection = create_worker(TradingWorker, 'before')
+        live_worker.set_private_stream(stream)
+        try:
+            stream.start()
+            await wait_for(live_worker._is_streaming)
+            await wait_for(lambda: len(server.get_subscriptions(PRIVATE_PATH)) == 1)
+            assert set(server.get_subscriptions(PRIVATE_PATH)[0]) == set(PrivateStream.TOPICS)
+            await rest_worker.force_update_trading_data()
+            await live_worker.force_update_trading_data()
+            expected = rest_worker.get_cache().peek(TradingWorker.TRADING_DATA)
+            seeded = live_worker.get_cache().peek(TradingWorker.TRADING_DATA)
+            assert get_rows(seeded, TradingWorker.POSITIONS) == []
+            assert len(get_rows(seeded, TradingWorker.OPEN_ORDERS)) == 1
+
+            connection.state = 'after'
+            connection.calls.clear()
+            for frame in (FILLED_ORDER, FRAMES['execution'][0], FRAMES['position'][0], NEW_ORDER):
+                await server.push(frame)
+            await wait_for(lambda: get_rows(live_worker.get_cache().peek(TradingWorker.TRADING_DATA),
+                                            TradingWorker.CLOSED_ORDERS))
+            actual = live_worker.get_cache().peek(TradingWorker.TRADING_DATA)
+            for name in (TradingWorker.POSITIONS, TradingWorker.OPEN_ORDERS, TradingWorker.CLOSED_ORDERS):
+                assert get_rows(actual, name) == get_rows(expected, name), name
+            # positions and open orders come from the stream, a fill syncs the history only
+            assert 'fetch_positions' not in connection.calls
+            assert 'fetch_open_orders' not in connection.calls
+            assert 'fetch_closed_orders' in connection.calls
+        finally:
+            await stop_stream(server, stream, rest_worker, live_worker)
+
+    asyncio.run(main())
+
+
+def test_wallet_frames_match_the_rest_balance():
+    async def main():
+        server = StandInServer(api_key='key', api_secret='secret')
+        stream = await start_stream(server, Logger())
+        worker, connection = create_worker(BalanceWorker, 'before')
+        worker.set_private_stream(stream)
+        try:
+            stream.start()
+            await wait_for(worker._is_streaming)
+            await worker.force_update_balance_info()
+            balance = worker.get_cache().peek(BalanceWorker.BALANCE)
+            assert balance['coins'] == BalanceWorker._parse_coins(REST['before']['wallet_balance'])
+
+            connection.calls.clear()
+            await server.push(FRAMES['wallet'][0])
+            expected = BalanceWorker._parse_coins(REST['after']['wallet_balance'])
+            await wait_for(lambda: worker.get_cache().peek(BalanceWorker.BALANCE)['coins'] == expected)
+            balance = worker.get_cache().peek(BalanceWorker.BALANCE)
+            assert balance['margin_mode'] == 'cross'
+            assert balance['unified_account'] is True
+            assert connection.calls == []
+        finally:
+            await stop_stream(server, stream, worker)
+
+    asyncio.run(main())
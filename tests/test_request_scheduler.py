@@ -0,0 +1,176 @@
+from threading import Event, Lock, Semaphore
+import asyncio
+import time
+
+import ccxt
+import pytest
+
+from bots_platform.model.request_scheduler import TokenBucket, RequestScheduler
+from tests.stand_in_server import wait_for
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(10)
+    now = bucket._timestamp
+    assert [bucket.take(now) for _ in range(10)] == [0.0] * 10  # the burst is the rate
+    assert bucket.take(now) == pytest.approx(0.1)
+    assert bucket.take(now + 0.05) == pytest.approx(0.05)
+    assert bucket.take(now + 0.1) == 0.0
+    assert bucket.take(now + 0.1) > 0
+    assert bucket.take(now + 100) == 0.0
+    assert bucket._tokens == pytest.approx(9)  # refilled up to the burst only
+
+
+def test_token_bucket_limit_pause_and_rate():
+    bucket = TokenBucket(10)
+    now = bucket._timestamp
+    bucket.limit(2, 5, now)  # the exchange reports 2 requests left
+    assert [bucket.take(now) for _ in range(2)] == [0.0, 0.0]
+    assert 0 < bucket.take(now) <= 0.1
+    bucket.limit(0, 5, now)
+    assert bucket.take(now + 1) == pytest.approx(4)
+    assert bucket.take(now + 5) == 0.0
+    bucket.pause(2, now + 5)
+    assert bucket.take(now + 6) == pytest.approx(1)
+    bucket.set_rate(2, now + 7)
+    assert bucket.get_rate() == 2
+    assert bucket.take(now + 7) == 0.0
+    assert bucket.take(now + 7) == 0.0  # the burst is the new rate
+    assert bucket.take(now + 7) == pytest.approx(0.5)
+
+
+def test_groups_by_method_name():
+    def fetch_ohlcv():
+        pass
+
+    def create_order():
+        pass
+
+    assert RequestScheduler.get_group(fetch_ohlcv) == 'market'
+    assert RequestScheduler.get_group(create_order) == 'trade'
+    assert RequestScheduler.get_group(lambda: None) == RequestScheduler.DEFAULT_GROUP
+
+
+class Calls:
+    # exchange methods which wait until they are released, named like the ccxt ones to get their group
+    def __init__(self):
+        self.released = Event()
+        self.lock = Lock()
+        self.calls = []
+
+    def record(self, name: str):
+        with self.lock:
+            self.calls.append(name)
+        self.released.wait(5)
+        return name
+
+    def fetch_ohlcv(self):
+        return self.record('fetch_ohlcv')
+
+    def create_order(self):
+        return self.record('create_order')
+
+    def fetch_my_trades(self):
+        return self.record('fetch_my_trades')
+
+
+def test_workers_are_reserved_for_trade_and_account_requests():
+    async def main():
+        scheduler = RequestScheduler()
+        calls = Calls()
+        try:
+            background = [asyncio.ensure_future(scheduler.run(calls.fetch_my_trades))
+                          for _ in range(RequestScheduler.MAX_WORKERS)]
+            await wait_for(lambda: len(calls.calls) == RequestScheduler.MAX_WORKERS - RequestScheduler.RESERVED_WORKERS)
+            market = asyncio.ensure_future(scheduler.run(calls.fetch_ohlcv))
+            trade = asyncio.ensure_future(scheduler.run(calls.create_order))
+            await wait_for(lambda: 'create_order' in calls.calls)
+            await asyncio.sleep(0.05)
+            assert 'fetch_ohlcv' not in calls.calls  # queued behind the reserved workers
+            assert scheduler.get_queue_size() == RequestScheduler.RESERVED_WORKERS + 1
+            calls.released.set()
+            assert await trade == 'create_order'
+            assert await market == 'fetch_ohlcv'
+            assert await asyncio.gather(*background) == ['fetch_my_trades'] * RequestScheduler.MAX_WORKERS
+        finally:
+            calls.released.set()
+            scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_queued_requests_start_by_priority():
+    async def main():
+        scheduler = RequestScheduler()
+        calls = []
+        finished = Semaphore(0)
+
+        def fetch_positions():  # holds a worker until it is released
+            finished.acquire(timeout=5)
+
+        def fetch_ohlcv():
+            calls.append('fetch_ohlcv')
+
+        def fetch_balance():
+            calls.append('fetch_balance')
+
+        def create_order():
+            calls.append('create_order')
+
+        try:
+            running = [asyncio.ensure_future(scheduler.run(fetch_positions))
+                       for _ in range(RequestScheduler.MAX_WORKERS)]
+            await asyncio.sleep(0.05)
+            queued = [asyncio.ensure_future(scheduler.run(x)) for x in (fetch_ohlcv, fetch_balance, create_order)]
+            await asyncio.sleep(0.05)
+            assert calls == []
+            finished.release()  # one worker frees up
+            await wait_for(lambda: len(calls) == 2)
+            await asyncio.sleep(0.05)
+            assert calls == ['create_order', 'fetch_balance']  # the market request waits for a reserved worker
+            for _ in running:
+                finished.release()
+            await asyncio.gather(*running, *queued)
+            assert calls == ['create_order', 'fetch_balance', 'fetch_ohlcv']
+        finally:
+            for _ in range(RequestScheduler.MAX_WORKERS):
+                finished.release()
+            scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_rate_limit_errors_pause_the_group():
+    async def main():
+        scheduler = RequestScheduler()
+
+        def fetch_ledger():
+            raise ccxt.RateLimitExceeded('too many visits')
+
+        try:
+            with pytest.raises(ccxt.RateLimitExceeded):
+                await scheduler.run(fetch_ledger)
+            assert scheduler._buckets['history'].take(time.monotonic()) > 0
+            assert scheduler._buckets['account'].take(time.monotonic()) == 0
+        finally:
+            scheduler.close()
+
+    asyncio.run(main())
+
+
+def test_limit_headers_adapt_the_bucket_of_the_running_group():
+    scheduler = RequestScheduler()
+    try:
+        scheduler._on_response({'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '5'})  # outside of a request
+        assert scheduler._buckets['account'].get_rate() == RequestScheduler.RATE_LIMITS['account']
+        scheduler._local.group = 'account'
+        reset_timestamp = int((time.time() + 2) * 1000)
+        scheduler._on_response({'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '5',
+                                'X-Bapi-Limit-Reset-Timestamp': str(reset_timestamp)})
+        bucket = scheduler._buckets['account']
+        assert bucket.get_rate() == 5
+        assert 1 < bucket.take(time.monotonic()) <= 2
+        scheduler._on_response({'X-Bapi-Limit-Status': '3', 'X-Bapi-Limit': '100'})  # never raised
+        assert bucket.get_rate() == 5
+    finally:
+        scheduler.close()
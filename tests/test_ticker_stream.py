@@ -0,0 +1,168 @@
+import asyncio
+
+from bots_platform.model.http_client import HttpClient
+from bots_platform.model.streams import TickerStream, WebSocketStream
+from bots_platform.model.workers import MarketsWorker
+from tests.stand_in_server import StandInServer, load_fixture, wait_for
+
+FRAMES = load_fixture('bybit_ticker_frames.json')
+LINEAR_FRAMES = FRAMES['/v5/public/linear']['tickers.BTCUSDT']
+
+
+class Logger:
+    def __init__(self):
+        self.messages = []
+
+    def log(self, *args):
+        self.messages.append(args)
+
+
+async def start_stream(server: StandInServer, category: str = 'linear') -> TickerStream:
+    url = await server.start()
+    stream = TickerStream(category, url + '/v5/public/{category}', http_client=HttpClient())
+    stream.set_logger(Logger())
+    stream.start()
+    return stream
+
+
+async def stop_stream(server: StandInServer, stream: TickerStream):
+    stream.stop()
+    await server.stop()
+    await stream._http_client.close()
+
+
+def test_snapshot_and_deltas_are_merged():
+    async def main():
+        server = StandInServer(FRAMES)
+        stream = await start_stream(server)
+        try:
+            await stream.set_market_ids(['BTCUSDT'])
+            await wait_for(lambda: (stream.get_ticker('BTCUSDT') or dict()).get('lastPrice') == '17217.00')
+            ticker = stream.get_ticker('BTCUSDT')
+            assert ticker['bid1Price'] == '17216.50'  # first delta
+            assert ticker['markPrice'] == '17217.80'  # second delta
+            assert ticker['highPrice24h'] == '17281.50'  # kept from the snapshot
+            assert stream.is_live()
+            assert stream.pop_changes() == {'BTCUSDT'}
+            assert stream.pop_changes() == set()
+
+            snapshot = dict(LINEAR_FRAMES[0], data={'symbol': 'BTCUSDT', 'lastPrice': '17300.00'})
+            await server.push(snapshot)  # a snapshot replaces the whole ticker
+            await wait_for(lambda: stream.get_ticker('BTCUSDT')['lastPrice'] == '17300.00')
+            assert 'highPrice24h' not in stream.get_ticker('BTCUSDT')
+
+            await server.push(dict(LINEAR_FRAMES[1], topic='tickers.ETHUSDT',
+                                   data={'symbol': 'ETHUSDT', 'lastPrice': '1'}))
+            await server.push(dict(LINEAR_FRAMES[1], data={'symbol': 'BTCUSDT', 'lastPrice': '17301.00'}))
+            await wait_for(lambda: stream.get_ticker('BTCUSDT')['lastPrice'] == '17301.00')
+            assert stream.get_ticker('ETHUSDT') is None  # not subscribed
+        finally:
+            await stop_stream(server, stream)
+
+    asyncio.run(main())
+
+
+def test_topics_are_subscribed_again_after_reconnect(monkeypatch):
+    monkeypatch.setattr(WebSocketStream, 'RECONNECT_DELAY', 0.05)
+
+    async def main():
+        server = StandInServer(FRAMES)
+        stream = await start_stream(server)
+        try:
+            await stream.set_market_ids(['BTCUSDT'])
+            await wait_for(stream.is_live)
+            await server.drop()
+            await wait_for(lambda: server.connections == 2 and stream.is_connected())
+            await wait_for(lambda: len(server.get_subscriptions('/v5/public/linear')) == 2)
+            assert server.get_subscriptions('/v5/public/linear') == [['tickers.BTCUSDT'], ['tickers.BTCUSDT']]
+            await wait_for(stream.is_live)
+            assert stream.get_ticker('BTCUSDT')['lastPrice'] == '17217.00'
+
+            await stream.set_market_ids([])
+            await wait_for(lambda: ('/v5/public/linear', {'op': 'unsubscribe', 'args': ['tickers.BTCUSDT']})
+                           in server.received)
+            assert stream.get_ticker('BTCUSDT') is None
+        finally:
+            await stop_stream(server, stream)
+
+    asyncio.run(main())
+
+
+def test_rest_seed_is_replaced_by_the_stream():
+    async def main():
+        server = StandInServer(FRAMES)
+        url = await server.start()
+        stream = TickerStream('linear', url + '/v5/public/{category}', http_client=HttpClient())
+        try:
+            stream.seed({'BTCUSDT': {'symbol': 'BTCUSDT', 'lastPrice': '17000.00'}})
+            assert stream.get_ticker('BTCUSDT')['lastPrice'] == '17000.00'
+            assert not stream.is_live()
+            stream.start()
+            await stream.set_market_ids(['BTCUSDT'])
+            await wait_for(lambda: stream.get_ticker('BTCUSDT')['lastPrice'] == '17217.00')
+            stream.seed({'BTCUSDT': {'symbol': 'BTCUSDT', 'lastPrice': '17000.00'},
+                         'ETHUSDT': {'symbol': 'ETHUSDT', 'lastPrice': '1200.00'}})
+            assert stream.get_ticker('BTCUSDT')['lastPrice'] == '17217.00'  # a live ticker is newer than REST
+            assert stream.get_ticker('ETHUSDT')['lastPrice'] == '1200.00'
+        finally:
+            await stop_stream(server, stream)
+
+    asyncio.run(main())
+
+
+class Connection:
+    MARKETS = [
+        {'id': 'BTCUSDT', 'symbol': 'BTC/USDT', 'type': 'spot', 'spot': True, 'linear': None, 'inverse': None},
+        {'id': 'BTCUSDT', 'symbol': 'BTC/USDT:USDT', 'type': 'swap', 'spot': False, 'linear': True, 'inverse': False},
+    ]
+    TICKERS = {'spot': {'BTC/USDT': 'BTCUSDT'}, 'linear': {'BTC/USDT:USDT': 'BTCUSDT'}}
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch_markets(self):
+        self.calls.append('fetch_markets')
+        return [dict(x, active=True, option=False, maker=0.0002, taker=0.00055, info={
+            'launchTime': '1700000000000',
+            'leverageFilter': {'minLeverage': '1', 'maxLeverage': '100'},
+            'lotSizeFilter': {'minOrderQty': '0.001', 'minNotionalValue': '5'},
+        }) for x in Connection.MARKETS]
+
+    def fetch_tickers(self, symbols, params):
+        category = params.get('subType') or 'spot'
+        self.calls.append(('fetch_tickers', category))
+        return {symbol: {'info': {'symbol': market_id, 'lastPrice': '17000.00', 'prevPrice24h': '16900.00',
+                                  'highPrice24h': '17100.00', 'lowPrice24h': '16800.00',
+                                  'turnover24h': '1000', 'volume24h': '0.06'}}
+                for symbol, market_id in Connection.TICKERS.get(category, dict()).items()}
+
+
+def test_markets_worker_hands_over_from_rest_to_stream():
+    async def main():
+        server = StandInServer(FRAMES)
+        url = await server.start()
+        worker = MarketsWorker()
+        connection = Connection()
+        worker.set_connection(connection)
+        worker.set_logger(Logger())
+        worker.set_connection_aborted_callback(lambda: None)
+        worker.set_ticker_stream_url(url + '/v5/public/{category}')
+        try:
+            rows = await worker.fetch_exchange_market_info()
+            assert {str(x['close_price_24h']) for x in rows} == {'17000.00'}
+            assert ('fetch_tickers', 'linear') in connection.calls
+            # the REST tickers seed the streams, wait for the recorded snapshots
+            await wait_for(lambda: len(worker._ticker_streams) == 2 and all(
+                x.is_live() and x.get_ticker('BTCUSDT')['lastPrice'] != '17000.00'
+                for x in worker._ticker_streams.values()))
+            connection.calls.clear()
+            rows = await worker.fetch_exchange_market_info(force=True)
+            assert connection.calls == []  # every category is live, no REST request
+            prices = {x['type']: str(x['close_price_24h']) for x in rows}
+            assert prices == {'spot': '21109.77', 'linear': '17217.00'}
+        finally:
+            worker.detach()
+            await server.stop()
+            await worker._get_http_client().close()
+
+    asyncio.run(main())
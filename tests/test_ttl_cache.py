@@ -0,0 +1,124 @@
+import asyncio
+
+from bots_platform.model.cache import TTLCache
+
+
+class Clock:
+    def __init__(self, monkeypatch):
+        self.now = 1000.
+        monkeypatch.setattr(TTLCache, '_get_now', staticmethod(lambda: self.now))
+
+
+class Source:
+    # a refresh function which stores the number of its call, each call waits until it is released
+    def __init__(self, cache: TTLCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def refresh(self):
+        self.calls += 1
+        call = self.calls
+        await self.released.wait()
+        self.cache.put(self.key, call)
+
+
+def test_get_after_an_invalidation_does_not_join_an_older_refresh():
+    async def main():
+        cache = TTLCache()
+        source = Source(cache, 'a')
+        first = asyncio.ensure_future(cache.get('a', source.refresh))
+        await asyncio.sleep(0.01)
+        joined = asyncio.ensure_future(cache.get('a', source.refresh))
+        await asyncio.sleep(0.01)
+        assert source.calls == 1
+        cache.invalidate('a')  # the first refresh may have read the old data
+        second = asyncio.ensure_future(cache.get('a', source.refresh))
+        await asyncio.sleep(0.01)
+        assert source.calls == 2
+        source.released.set()
+        assert await first == await joined == await second == 2
+        assert source.calls == 2
+
+    asyncio.run(main())
+
+
+def test_forced_get_joins_a_refresh_started_after_the_invalidation():
+    async def main():
+        cache = TTLCache()
+        source = Source(cache, 'a')
+        cache.invalidate()
+        first = asyncio.ensure_future(cache.get('a', source.refresh))
+        await asyncio.sleep(0.01)
+        forced = asyncio.ensure_future(cache.get('a', source.refresh, force=True))
+        await asyncio.sleep(0.01)
+        assert source.calls == 1
+        cache.invalidate()  # the whole cache
+        forced_again = asyncio.ensure_future(cache.get('a', source.refresh, force=True))
+        await asyncio.sleep(0.01)
+        assert source.calls == 2
+        source.released.set()
+        assert await first == await forced == await forced_again == 2
+
+    asyncio.run(main())
+
+
+def test_ttl_and_stale_ttl(monkeypatch):
+    async def main():
+        clock = Clock(monkeypatch)
+        cache = TTLCache(ttl=10, stale_ttl=5)
+        source = Source(cache, 'a')
+        source.released.set()
+        assert await cache.get('a', source.refresh) == 1  # a miss waits for the refresh
+        clock.now += 9
+        assert await cache.get('a', source.refresh) == 1
+        assert source.calls == 1
+        clock.now += 2  # stale, the old value is returned and refreshed in the background
+        assert await cache.get('a', source.refresh) == 1
+        await asyncio.sleep(0.01)
+        assert source.calls == 2
+        assert await cache.get('a', source.refresh) == 2
+        clock.now += 16  # expired
+        assert await cache.get('a', source.refresh) == 3
+        assert await cache.get('a', source.refresh, ttl=100) == 3
+        metrics = cache.get_metrics()
+        assert (metrics['hits'], metrics['stale_hits'], metrics['misses'], metrics['refreshes']) == (3, 1, 2, 3)
+
+    asyncio.run(main())
+
+
+def test_per_key_ttl_and_force(monkeypatch):
+    async def main():
+        clock = Clock(monkeypatch)
+        cache = TTLCache(ttl=10)
+        cache.set_ttl('b', ttl=1, stale_ttl=0)
+        source_a, source_b = Source(cache, 'a'), Source(cache, 'b')
+        source_a.released.set()
+        source_b.released.set()
+        await asyncio.gather(cache.get('a', source_a.refresh), cache.get('b', source_b.refresh))
+        clock.now += 2
+        assert await cache.get('a', source_a.refresh) == 1
+        assert await cache.get('b', source_b.refresh) == 2
+        assert await cache.get('a', source_a.refresh, force=True) == 2  # refreshed even if fresh
+        assert cache.get_ttl('b') == (1, 0)
+
+    asyncio.run(main())
+
+
+def test_failed_refresh_keeps_the_value(monkeypatch):
+    async def main():
+        Clock(monkeypatch)
+        cache = TTLCache(ttl=10)
+        cache.put('a', 'old')
+
+        async def refresh():
+            raise ConnectionError('no connection')
+
+        cache.invalidate('a')
+        assert cache.peek('a') == 'old'
+        assert await cache.get('a', refresh) == 'old'
+        assert await cache.get('b', refresh) is None
+        assert cache.get_metrics()['errors'] == 2
+
+    asyncio.run(main())